@@ -1,28 +1,51 @@
 """
 Verba Backend - FastAPI server for audio transcription, summarization, and session management
 """
-from fastapi import FastAPI, File, UploadFile, HTTPException, Request
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
-import uvicorn
+from typing import Optional, List, Dict
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import hashlib
 import tempfile
+import threading
+import json
 import os
 from pathlib import Path
 from datetime import datetime
 import logging
 
 # Import our modules
-from transcriber import transcribe_audio
-from summarizer import summarize_transcript
-from storage import storage
+from summarizer import summarize_transcript, resolve_options, window_cache_stats
+from storage import storage, import_row, CONFLICT_POLICIES
+from jobs import job_manager, JobCancelled
+from pipeline import (run_process_job, run_transcribe_job, remove_file, warm_up,
+                      submit_checkpointed_job, submit_transcribe_job, resume_jobs, refine_when_idle,
+                      attach_refinement, discard_refinement)
+from audio_probe import probe_duration, size_duration
+from exporter import get_export, etag_matches, stream_zip, stream_ndjson, export_cache
+from uploads import upload_spool, UploadConflict
+from responses import JSONResponse, CompressionMiddleware, RawJSON, dumps
+from retention import retention_loop
+from search import semantic_index, NUMPY_AVAILABLE as SEMANTIC_SEARCH_AVAILABLE
 import settings
+import metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Verba API", version="0.2.0", description="Offline-first meeting assistant")
+# Uploads are streamed to disk (and hashed) in chunks of this size
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# JSONResponse (responses.py) serializes with orjson when it is installed
+app = FastAPI(title="Verba API", version="0.2.0", description="Offline-first meeting assistant",
+              default_response_class=JSONResponse)
+
+if settings.RESPONSE_COMPRESSION:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_BYTES)
 
 # CORS configuration for local network access
 if settings.ALLOW_LOCAL_NETWORK:
@@ -52,6 +75,24 @@ class SummarizeRequest(BaseModel):
     """Request body for summarization endpoint"""
     transcript: str
     save_session: bool = True
+    engine: Optional[str] = None  # Key point engine, defaults to settings.SUMMARIZER_ENGINE
+    mode: Optional[str] = None  # "flat" or "hierarchical", defaults to settings.SUMMARIZER_MODE
+    segments: Optional[List[Dict]] = None  # Timestamped segments: {"start", "end", "text"}
+    refinement_id: Optional[str] = None  # From a two-pass /api/transcribe draft
+
+
+class CreateUploadRequest(BaseModel):
+    """Request body for starting a resumable upload"""
+    filename: str = "recording.webm"
+    length: Optional[int] = None  # Total bytes, if known up front
+
+
+class FinalizeUploadRequest(BaseModel):
+    """Request body for finalizing a resumable upload"""
+    action: str = "process"  # "process" (like POST /api/jobs) or "transcribe"
+    save_session: bool = True
+    engine: Optional[str] = None
+    mode: Optional[str] = None
 
 
 class ErrorResponse(BaseModel):
@@ -61,6 +102,63 @@ class ErrorResponse(BaseModel):
 
 
 # Root endpoints
+# Background warm-up progress, reported by /api/status
+warmup_state = {"status": "disabled" if not settings.WARMUP_ON_STARTUP else "pending", "steps": {}}
+
+
+@app.on_event("startup")
+def start_warm_up():
+    """
+    Load the database, heavy libraries and the model on a background thread
+    The server answers requests immediately; the first transcription only
+    waits for whatever the warm-up hasn't finished yet
+    """
+    if settings.WARMUP_ON_STARTUP:
+        threading.Thread(target=warm_up, args=(warmup_state,), name="verba-warm-up", daemon=True).start()
+
+
+@app.on_event("startup")
+def start_resume_jobs():
+    """Requeue checkpointed jobs a previous server process didn't finish"""
+    def resume():
+        try:
+            resumed = resume_jobs()
+            if resumed:
+                logger.info(f"Resumed {resumed} checkpointed job(s)")
+        except Exception as e:
+            logger.error(f"Could not resume checkpointed jobs: {e}")
+    
+    threading.Thread(target=resume, name="verba-resume-jobs", daemon=True).start()
+
+
+@app.on_event("startup")
+def start_refinement():
+    """Refine two-pass drafts and degraded sessions while the server is idle"""
+    if settings.REFINE_WHEN_IDLE or settings.TWO_PASS:
+        threading.Thread(target=refine_when_idle, name="verba-refine", daemon=True).start()
+
+
+@app.on_event("startup")
+def start_retention():
+    """Purge sessions past the RETENTION_* limits and vacuum in the background"""
+    if settings.RETENTION_INTERVAL_SECONDS > 0:
+        threading.Thread(target=retention_loop, name="verba-retention", daemon=True).start()
+
+
+@app.on_event("startup")
+def start_metrics_flush():
+    """With several workers, share this worker's metrics with the others (see METRICS_DIR)"""
+    if settings.METRICS_DIR:
+        metrics.flush_periodically(settings.METRICS_DIR, settings.METRICS_FLUSH_SECONDS)
+
+
+@app.on_event("startup")
+def start_semantic_index():
+    """Index sessions saved before semantic search was enabled (or while the server was down)"""
+    if settings.SEMANTIC_SEARCH and SEMANTIC_SEARCH_AVAILABLE:
+        semantic_index.start_backfill()
+
+
 @app.get("/")
 def root():
     """Health check endpoint"""
@@ -80,47 +178,94 @@ def get_status():
     return {
         "online_features_enabled": settings.ONLINE_FEATURES_ENABLED,
         "model": settings.WHISPER_MODEL_SIZE,
+        "adaptive_model": settings.ADAPTIVE_MODEL,
         "device": settings.WHISPER_DEVICE,
-        "audio_preprocessing": settings.ENABLE_AUDIO_PREPROCESSING
+        "audio_preprocessing": settings.ENABLE_AUDIO_PREPROCESSING,
+        "summarizer_engine": settings.SUMMARIZER_ENGINE,
+        "summarizer_mode": settings.SUMMARIZER_MODE,
+        "warmup": warmup_state
     }
 
 
+def _cache_requests():
+    """Hit/miss counters of the in-process caches for /metrics"""
+    samples = []
+    caches = (("summary_window", window_cache_stats()), ("export", export_cache.stats()),
+              ("session", storage.session_cache.stats()))
+    for cache, stats in caches:
+        samples.append(({"cache": cache, "result": "hit"}, stats["hits"]))
+        samples.append(({"cache": cache, "result": "miss"}, stats["misses"]))
+    return samples
+
+
+metrics.CounterFunction(
+    "verba_cache_requests_total",
+    "Cache lookups by cache and result (hit/miss)",
+    labels=("cache", "result"),
+    callback=_cache_requests
+)
+
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Prometheus metrics: per-stage latency histograms, real-time factor,
+    queue depth, model load time, cache hit rates and SQLite query latency
+    With several workers the values of every server process are merged
+    """
+    if settings.METRICS_DIR:
+        body = metrics.render_directory(settings.METRICS_DIR)
+    else:
+        body = metrics.render()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+
 # Transcription endpoint
 @app.post("/api/transcribe")
-async def transcribe(audio: UploadFile = File(...)):
+async def transcribe(request: Request, audio: UploadFile = File(...)):
     """
     Transcribe audio file using Whisper
     Accepts: audio/webm, audio/wav, audio/mp3, etc.
     Returns: JSON with transcript text
+    Runs on the job queue; if the client disconnects, decoding is cancelled
+    In two-pass mode the transcript is a fast draft ("draft": true) and
+    "refinement_id" names the background job refining it
     """
-    tmp_path = None
-    
     try:
-        # Validate file
-        if not audio.filename:
+        # Save uploaded file temporarily
+        try:
+            tmp_path, size, digest = await _save_upload(audio)
+        except ValueError as e:
             return JSONResponse(
                 status_code=400,
-                content={"error": "No audio file provided"}
+                content={"error": str(e)}
             )
         
-        # Save uploaded file temporarily
-        suffix = Path(audio.filename).suffix or ".webm"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
-            content = await audio.read()
-            
-            if len(content) == 0:
-                return JSONResponse(
-                    status_code=400,
-                    content={"error": "Audio file is empty"}
-                )
-            
-            tmp_file.write(content)
-            tmp_path = tmp_file.name
+        try:
+            duration = await _admit_upload(tmp_path)
+        except ValueError as e:
+            return JSONResponse(
+                status_code=413,
+                content={"error": "Recording is too long", "detail": str(e)}
+            )
         
-        logger.info(f"Transcribing audio file: {audio.filename} ({len(content)} bytes)")
+        logger.info(f"Transcribing audio file: {audio.filename} ({size} bytes, ~{duration:.0f}s)")
         
-        # Transcribe with preprocessing
-        transcript = transcribe_audio(tmp_path, preprocess=settings.ENABLE_AUDIO_PREPROCESSING)
+        # Transcribe with preprocessing; the temp file is removed when the job ends.
+        # A re-sent copy of a recording still being transcribed joins that job.
+        job = job_manager.submit(
+            "transcribe",
+            run_transcribe_job,
+            tmp_path,
+            preprocess=settings.ENABLE_AUDIO_PREPROCESSING,
+            cleanup=lambda: remove_file(tmp_path),
+            key=_job_key("transcribe", digest, preprocess=settings.ENABLE_AUDIO_PREPROCESSING),
+            cost=duration
+        )
+        if job.waiters > 1:
+            logger.info(f"Duplicate upload attached to in-flight job {job.id}")
+        result = await _await_job(request, job)
+        transcript = result["transcript"]
         
         if not transcript or len(transcript.strip()) == 0:
             return JSONResponse(
@@ -128,16 +273,27 @@ async def transcribe(audio: UploadFile = File(...)):
                 content={
                     "transcript": "",
                     "warning": "No speech detected in audio",
+                    "silence_skipped": result["silence_skipped"],
                     "status": "success"
                 }
             )
         
         logger.info(f"Transcription successful: {len(transcript)} characters")
         
-        return JSONResponse({
+        response = {
             "transcript": transcript,
+            "silence_skipped": result["silence_skipped"],
             "status": "success"
-        })
+        }
+        if settings.TWO_PASS:
+            response.update(draft=True, model=result["model"], refinement_id=result["refinement_id"])
+        return JSONResponse(response)
+    
+    except JobCancelled:
+        return JSONResponse(
+            status_code=409,
+            content={"error": "Transcription was cancelled"}
+        )
     
     except FileNotFoundError as e:
         logger.error(f"File not found: {e}")
@@ -155,14 +311,556 @@ async def transcribe(audio: UploadFile = File(...)):
                 "detail": str(e)
             }
         )
+
+
+async def _await_job(request: Request, job):
+    """
+    Wait for a job's result while watching the client connection
+    If the client goes away the job is cancelled (unless other requests
+    are attached to it) so it stops holding a worker slot; raises
+    JobCancelled in that case
+    """
+    future = asyncio.wrap_future(job.future)
+    while True:
+        done, _ = await asyncio.wait({future}, timeout=settings.DISCONNECT_POLL_SECONDS)
+        if done:
+            return future.result()
+        if await request.is_disconnected():
+            logger.info(f"Client disconnected, detaching from job {job.id}")
+            job_manager.detach(job.id)
+            raise JobCancelled("Client disconnected")
+
+
+async def _save_upload(audio: UploadFile):
+    """
+    Save an uploaded audio file to a temporary file, hashing it on the way
+    Returns (path, size, sha256 hex); raises ValueError for missing or empty uploads
+    """
+    if not audio.filename:
+        raise ValueError("No audio file provided")
     
-    finally:
-        # Clean up temporary file
-        if tmp_path and os.path.exists(tmp_path):
-            try:
-                os.unlink(tmp_path)
-            except Exception as e:
-                logger.warning(f"Could not delete temp file: {e}")
+    suffix = Path(audio.filename).suffix or ".webm"
+    digest = hashlib.sha256()
+    size = 0
+    with metrics.stage("upload"), tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
+        while True:
+            chunk = await audio.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            tmp_file.write(chunk)
+            size += len(chunk)
+    
+    if size == 0:
+        os.unlink(tmp_file.name)
+        raise ValueError("Audio file is empty")
+    
+    return tmp_file.name, size, digest.hexdigest()
+
+
+async def _admit_upload(tmp_path: str, size: Optional[int] = None) -> float:
+    """
+    Probe a saved upload's duration from its container headers, or estimate
+    it from the size when they lack it (MediaRecorder webm)
+    Returns the duration used to schedule the job; raises ValueError and
+    deletes the file if it exceeds MAX_AUDIO_SECONDS (estimates by more than
+    AUDIO_ESTIMATE_MARGIN, as the real bitrate varies)
+    `size` is the final size of a resumable upload still arriving
+    """
+    duration = await run_in_threadpool(probe_duration, tmp_path)
+    limit = settings.MAX_AUDIO_SECONDS
+    about = ""
+    if duration is None:
+        duration = size_duration(tmp_path, size)
+        limit *= settings.AUDIO_ESTIMATE_MARGIN
+        about = "about "
+    if settings.MAX_AUDIO_SECONDS and duration > limit:
+        remove_file(tmp_path)
+        raise ValueError(
+            f"Audio is {about}{duration / 60:.0f} minutes long; the limit is "
+            f"{settings.MAX_AUDIO_SECONDS / 60:.0f} minutes"
+        )
+    return duration
+
+
+def _job_key(kind: str, digest: str, **options):
+    """
+    Single-flight key: identical audio with the same model and options
+    produces the same result, so it only needs to be decoded once
+    """
+    return (kind, digest, settings.WHISPER_MODEL_SIZE, settings.WHISPER_COMPUTE_TYPE,
+            tuple(sorted(options.items())))
+
+
+# Combined transcribe + summarize + save pipeline
+@app.post("/api/process")
+async def process(
+    request: Request,
+    audio: UploadFile = File(...),
+    save_session: bool = Form(True),
+    engine: Optional[str] = Form(None),
+    mode: Optional[str] = Form(None)
+):
+    """
+    Transcribe, summarize and save a recording in one request
+    Saves the client from sending the transcript back to /api/summarize
+    Returns: JSON with session_id, transcript, segments and summary
+    """
+    job = await _submit_process_job(audio, save_session, engine, mode)
+    if isinstance(job, JSONResponse):
+        return job
+    
+    try:
+        result = await _await_job(request, job)
+    except JobCancelled:
+        return JSONResponse(
+            status_code=409,
+            content={"error": "Processing was cancelled"}
+        )
+    except Exception as e:
+        logger.error(f"Processing error: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={
+                "error": "Processing failed. Please try recording again.",
+                "detail": str(e)
+            }
+        )
+    
+    logger.info(f"Processing successful: {len(result['transcript'])} characters, session {result['session_id']}")
+    
+    # Returned as a response so FastAPI doesn't walk every segment through jsonable_encoder
+    return JSONResponse({**result, "status": "success"})
+
+
+@app.post("/api/jobs", status_code=202)
+async def create_job(
+    audio: UploadFile = File(...),
+    save_session: bool = Form(True),
+    engine: Optional[str] = Form(None),
+    mode: Optional[str] = Form(None)
+):
+    """
+    Queue a recording for transcribe + summarize + save and return immediately
+    Poll GET /api/jobs/{job_id} for progress and the result
+    Progress is checkpointed, so the job resumes under the same ID if the
+    server restarts before it finishes
+    """
+    job_id = await _submit_process_job(audio, save_session, engine, mode, checkpointed=True)
+    if isinstance(job_id, JSONResponse):
+        return job_id
+    
+    return await run_in_threadpool(_queued_state, job_id)
+
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Get job status, progress and (once completed) its result
+    """
+    state = _job_state(job_id)
+    
+    if not state:
+        return JSONResponse(
+            status_code=404,
+            content={"error": "Job not found"}
+        )
+    
+    return JSONResponse(state)
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """
+    Server-sent events for a job: a "progress" event whenever its state
+    changes and a final "done" event once it has finished
+    Lets two-pass clients learn when the refined transcript is ready
+    """
+    state = await run_in_threadpool(_job_state, job_id)
+    if not state:
+        return JSONResponse(
+            status_code=404,
+            content={"error": "Job not found"}
+        )
+    
+    async def events():
+        nonlocal state
+        last = None
+        while state and not await request.is_disconnected():
+            data = dumps(state).decode("utf-8")
+            finished = state["status"] in ("completed", "failed", "cancelled")
+            if finished:
+                yield f"event: done\ndata: {data}\n\n"
+                return
+            if data != last:
+                yield f"event: progress\ndata: {data}\n\n"
+                last = data
+            await asyncio.sleep(settings.DISCONNECT_POLL_SECONDS)
+            state = await run_in_threadpool(_job_state, job_id)
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
+def _job_state(job_id: str) -> Optional[Dict]:
+    """
+    Job status for the API, None if unknown
+    Jobs this worker doesn't hold are read from their database record.
+    A refinement waiting for an idle worker (or preempted by other work)
+    only exists as a checkpoint record and reports as queued
+    """
+    job = job_manager.get(job_id)
+    if job and not (job.kind == "refine" and job.status == "cancelled"):
+        return {**job.to_dict(), "eta_seconds": job_manager.eta(job)}
+    
+    # With several workers the job may belong to another one, which shares
+    # its status (and result) through the database
+    record = storage.get_job(job_id)
+    if record and record["kind"] != "refine":
+        return _recorded_state(record)
+    if record:
+        decoded = record["segments"][-1]["end"] if record["segments"] else 0.0
+        return {
+            "job_id": job_id,
+            "kind": "refine",
+            "status": "queued",
+            "progress": {"decoded": round(decoded, 2)},
+            "audio_seconds": round(record["cost"], 2) if record["cost"] is not None else None,
+            "eta_seconds": None
+        }
+    return job.to_dict() if job else None
+
+
+def _recorded_state(record: Dict) -> Dict:
+    """Job status for the API from its database record (see storage.finish_job)"""
+    decoded = record["segments"][-1]["end"] if record["segments"] else 0.0
+    state = {
+        "job_id": record["id"],
+        "kind": record["kind"],
+        "status": record["status"],
+        "created_at": record["created_at"],
+        "started_at": None,
+        "finished_at": record["finished_at"],
+        "progress": {"decoded": round(decoded, 2)} if decoded else {},
+        "audio_seconds": round(record["cost"], 2) if record["cost"] is not None else None,
+        "eta_seconds": None
+    }
+    if record["status"] == "completed":
+        state["result"] = record["result"]
+    if record["status"] == "failed":
+        state["error"] = record["error"]
+    return state
+
+
+def _queued_state(job_id: str) -> Dict:
+    """Response fields for a job just queued (or shared with an identical one)"""
+    state = _job_state(job_id) or {"status": "queued", "eta_seconds": None}
+    return {
+        "job_id": job_id,
+        "status": state["status"],
+        "queue_depth": job_manager.queue_depth(),
+        "eta_seconds": state["eta_seconds"]
+    }
+
+
+@app.delete("/api/jobs/{job_id}")
+def cancel_job(job_id: str):
+    """
+    Cancel a queued or running job
+    Running jobs stop after the segment being decoded ("cancelling" until then)
+    Cancelling a refinement drops it; the draft stays
+    """
+    if discard_refinement(job_id):
+        logger.info(f"Refinement {job_id} discarded")
+        return {"job_id": job_id, "status": "cancelled"}
+    
+    job = job_manager.cancel(job_id)
+    # Other workers read the job's status from its record; if this worker
+    # doesn't run the job, its owner stops at the next checkpoint
+    record = storage.request_cancel(job_id)
+    status = job.status if job else record["status"] if record else None
+    
+    if not status:
+        return JSONResponse(
+            status_code=404,
+            content={"error": "Job not found"}
+        )
+    
+    if status in ("completed", "failed"):
+        return JSONResponse(
+            status_code=409,
+            content={"error": f"Job already {status}"}
+        )
+    
+    logger.info(f"Job {job_id} {status}")
+    
+    return {"job_id": job_id, "status": status}
+
+
+async def _submit_process_job(audio: UploadFile, save_session: bool,
+                              engine: Optional[str], mode: Optional[str],
+                              checkpointed: bool = False):
+    """
+    Validate options, save the upload and queue a processing job
+    Checkpointed jobs spool their audio and survive restarts (see pipeline.resume_jobs)
+    """
+    try:
+        resolved = resolve_options(engine, mode)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Invalid summarization options", "detail": str(e)}
+        )
+    
+    try:
+        tmp_path, size, digest = await _save_upload(audio)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"error": str(e)}
+        )
+    
+    try:
+        duration = await _admit_upload(tmp_path)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=413,
+            content={"error": "Recording is too long", "detail": str(e)}
+        )
+    
+    logger.info(f"Queueing processing job: {audio.filename} ({size} bytes, ~{duration:.0f}s)")
+    
+    return await _queue_process_job(tmp_path, digest, duration, resolved,
+                                    save_session, engine, mode, checkpointed)
+
+
+async def _queue_process_job(audio_path: str, digest: Optional[str], duration: float,
+                             resolved, save_session: bool, engine: Optional[str],
+                             mode: Optional[str], checkpointed: bool = False,
+                             move: bool = True):
+    """
+    Queue a processing job for saved audio
+    Without a digest (an upload still arriving) there is no single-flight key
+    """
+    key = None
+    if digest is not None:
+        key = _job_key(
+            "process",
+            digest,
+            preprocess=settings.ENABLE_AUDIO_PREPROCESSING,
+            save_session=save_session,
+            summarizer=resolved
+        )
+    options = {
+        "preprocess": settings.ENABLE_AUDIO_PREPROCESSING,
+        "save_session": save_session,
+        "engine": engine,
+        "mode": mode
+    }
+    
+    if checkpointed:
+        return await run_in_threadpool(submit_checkpointed_job, audio_path, duration, key,
+                                       move=move, **options)
+    
+    return job_manager.submit(
+        "process",
+        run_process_job,
+        audio_path,
+        cleanup=lambda: remove_file(audio_path),
+        key=key,
+        cost=duration,
+        **options
+    )
+
+
+# Resumable uploads
+@app.post("/api/uploads", status_code=201)
+def create_upload(request: CreateUploadRequest):
+    """
+    Start a resumable upload
+    Send the bytes with PUT /api/uploads/{upload_id} (Content-Range), check
+    the offset with GET after a dropped connection, then finalize
+    """
+    try:
+        return upload_spool.create(request.filename, request.length)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"error": str(e)}
+        )
+
+
+@app.get("/api/uploads/{upload_id}")
+def get_upload(upload_id: str):
+    """
+    Get an upload's offset (bytes received), length and job
+    """
+    state = upload_spool.get(upload_id)
+    
+    if not state:
+        return JSONResponse(
+            status_code=404,
+            content={"error": "Upload not found"}
+        )
+    
+    return state
+
+
+@app.put("/api/uploads/{upload_id}")
+async def put_upload_chunk(upload_id: str, request: Request):
+    """
+    Append a chunk to an upload
+    Content-Range: bytes <first>-<last>/<total or *>; the chunk must start
+    at the upload's offset (409 with the current offset otherwise). Bytes
+    received before a dropped connection are kept, so a retry resumes
+    from GET /api/uploads/{upload_id}'s offset
+    """
+    try:
+        first, last, total = _parse_content_range(request.headers.get("content-range"))
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Invalid Content-Range", "detail": str(e)}
+        )
+    
+    try:
+        with metrics.stage("upload"), upload_spool.writer(upload_id, first, total) as out:
+            async for chunk in request.stream():
+                if out.written + len(chunk) > last - first + 1:
+                    raise ValueError("Chunk is longer than its Content-Range")
+                out.write(chunk)
+    except KeyError:
+        return JSONResponse(
+            status_code=404,
+            content={"error": "Upload not found"}
+        )
+    except UploadConflict as e:
+        return JSONResponse(
+            status_code=409,
+            content={"error": str(e), "offset": e.offset}
+        )
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"error": str(e), "offset": upload_spool.get(upload_id)["offset"]}
+        )
+    
+    return upload_spool.get(upload_id)
+
+
+def _parse_content_range(header: Optional[str]) -> tuple:
+    """Parse "bytes <first>-<last>/<total or *>" into (first, last, total or None)"""
+    if not header:
+        raise ValueError("Content-Range header is required")
+    unit, _, spec = header.strip().partition(" ")
+    span, _, total = spec.partition("/")
+    first, _, last = span.partition("-")
+    if unit != "bytes" or not total:
+        raise ValueError(f"Expected 'bytes <first>-<last>/<total>', got '{header}'")
+    first, last = int(first), int(last)
+    total = None if total == "*" else int(total)
+    if first < 0 or last < first or (total is not None and last >= total):
+        raise ValueError(f"Range {first}-{last} is not valid")
+    return first, last, total
+
+
+@app.post("/api/uploads/{upload_id}/finalize", status_code=202)
+async def finalize_upload(upload_id: str, request: FinalizeUploadRequest):
+    """
+    Queue the upload for processing (action "process", like POST /api/jobs)
+    or transcription only ("transcribe"; the transcript is the job's result)
+    May be called before the last chunk when the length is known: decoding
+    then starts on the bytes received so far and follows the upload
+    """
+    if request.action not in ("process", "transcribe"):
+        return JSONResponse(
+            status_code=400,
+            content={"error": f"Unknown action '{request.action}'", "detail": "Use 'process' or 'transcribe'"}
+        )
+    
+    try:
+        resolved = resolve_options(request.engine, request.mode)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Invalid summarization options", "detail": str(e)}
+        )
+    
+    try:
+        state = upload_spool.finalize(upload_id)
+    except KeyError:
+        return JSONResponse(
+            status_code=404,
+            content={"error": "Upload not found"}
+        )
+    except ValueError as e:
+        return JSONResponse(
+            status_code=409,
+            content={"error": str(e)}
+        )
+    
+    path = upload_spool.path(upload_id)
+    try:
+        duration = await _admit_upload(path, state["length"])
+    except ValueError as e:
+        return JSONResponse(
+            status_code=413,
+            content={"error": "Recording is too long", "detail": str(e)}
+        )
+    
+    # Identical recordings share a job only when all of this one is here to hash
+    digest = await run_in_threadpool(_hash_file, path) if state["complete"] else None
+    logger.info(f"Finalized upload {upload_id}: {state['offset']}/{state['length']} bytes, ~{duration:.0f}s")
+    
+    if request.action == "transcribe":
+        key = None
+        if digest is not None:
+            key = _job_key("transcribe", digest, preprocess=settings.ENABLE_AUDIO_PREPROCESSING)
+        job_id = await run_in_threadpool(submit_transcribe_job, path, duration, key,
+                                         preprocess=settings.ENABLE_AUDIO_PREPROCESSING)
+    else:
+        job_id = await _queue_process_job(path, digest, duration, resolved, request.save_session,
+                                          request.engine, request.mode, checkpointed=True, move=False)
+    upload_spool.attach_job(upload_id, job_id)
+    
+    return {
+        "upload_id": upload_id,
+        "offset": state["offset"],
+        "length": state["length"],
+        **await run_in_threadpool(_queued_state, job_id)
+    }
+
+
+def _hash_file(path: str) -> str:
+    """sha256 hex of a file, read in UPLOAD_CHUNK_SIZE blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@app.delete("/api/uploads/{upload_id}")
+def delete_upload(upload_id: str):
+    """
+    Abort an upload that hasn't been finalized
+    (a finalized upload belongs to its job; cancel that instead)
+    """
+    state = upload_spool.get(upload_id)
+    
+    if not state:
+        return JSONResponse(
+            status_code=404,
+            content={"error": "Upload not found"}
+        )
+    
+    if not upload_spool.delete(upload_id):
+        return JSONResponse(
+            status_code=409,
+            content={"error": "Upload is finalized", "detail": f"Cancel job {state['job_id']} instead"}
+        )
+    
+    return {"upload_id": upload_id, "status": "deleted"}
 
 
 # Summarization endpoint
@@ -181,15 +879,31 @@ async def summarize(request: SummarizeRequest):
         
         logger.info(f"Summarizing transcript: {len(request.transcript)} characters")
         
-        # Generate summary
-        summary = summarize_transcript(request.transcript)
+        # Generate summary (off the event loop, like the save below)
+        try:
+            summary = await run_in_threadpool(
+                summarize_transcript,
+                request.transcript,
+                engine=request.engine,
+                mode=request.mode,
+                segments=request.segments
+            )
+        except ValueError as e:
+            return JSONResponse(
+                status_code=400,
+                content={"error": "Invalid summarization options", "detail": str(e)}
+            )
         
         # Save as session if requested
         session_id = None
         if request.save_session:
             try:
-                session_id = storage.create_session(request.transcript, summary)
+                # Blocks until committed; concurrent requests share a group commit
+                session_id = await run_in_threadpool(storage.create_session, request.transcript, summary)
                 logger.info(f"Session saved: {session_id}")
+                # A two-pass draft: the refined transcript will replace it
+                if request.refinement_id:
+                    await run_in_threadpool(attach_refinement, request.refinement_id, session_id)
             except Exception as e:
                 logger.error(f"Failed to save session: {e}")
                 # Don't fail the request if storage fails
@@ -240,6 +954,166 @@ def list_sessions():
         )
 
 
+@app.get("/api/search/semantic")
+def semantic_search(q: str = "", limit: int = Query(10, ge=1, le=100)):
+    """
+    Sessions whose transcripts are closest in meaning to the query, best first
+    Each result has the best matching segment as its snippet and its cosine score.
+    "embedder" is "model" with a local SEMANTIC_MODEL, else "hashing" (fuzzy
+    keyword matching that can't find paraphrases, with a warning)
+    """
+    if not settings.SEMANTIC_SEARCH or not SEMANTIC_SEARCH_AVAILABLE:
+        return JSONResponse(
+            status_code=503,
+            content={"error": "Semantic search is disabled", "detail": "Set SEMANTIC_SEARCH=true (needs numpy)"}
+        )
+    if not q.strip():
+        return JSONResponse(status_code=400, content={"error": "Empty query", "detail": "Pass the search text as ?q="})
+    
+    try:
+        with metrics.stage("semantic_search"):
+            results = semantic_index.search(q, limit)
+        response = {
+            "query": q,
+            "results": results,
+            "count": len(results),
+            "embedder": semantic_index.embedder.kind,
+            "status": "success"
+        }
+        if semantic_index.embedder.kind == "hashing":
+            response["warning"] = ("No local embedding model is configured (SEMANTIC_MODEL): results "
+                                   "share words with the query, paraphrases are not found")
+        return response
+    except Exception as e:
+        logger.error(f"Semantic search failed: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={"error": "Semantic search failed", "detail": str(e)}
+        )
+
+
+@app.get("/api/sessions/export")
+def export_sessions(
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    format: str = "zip"
+):
+    """
+    Bulk export of all sessions created in [from, to) (ISO 8601 dates)
+    format=zip streams one Markdown file per session, format=ndjson streams
+    one full session JSON per line
+    """
+    if format not in ("zip", "ndjson"):
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Unsupported export format", "detail": "Use 'zip' or 'ndjson'"}
+        )
+    
+    try:
+        start = datetime.fromisoformat(date_from) if date_from else None
+        end = datetime.fromisoformat(date_to) if date_to else None
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Invalid date range", "detail": str(e)}
+        )
+    
+    # NDJSON lines embed the stored summary JSON without re-parsing it
+    sessions = storage.iter_sessions(start, end, batch_size=settings.EXPORT_BATCH_SIZE,
+                                     raw_summary=format == "ndjson")
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    
+    if format == "zip":
+        body, media_type, filename = stream_zip(sessions), "application/zip", f"verba-sessions-{stamp}.zip"
+    else:
+        body, media_type, filename = stream_ndjson(sessions), "application/x-ndjson", f"verba-sessions-{stamp}.ndjson"
+    
+    logger.info(f"Streaming bulk export ({format}) from={date_from} to={date_to}")
+    
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+@app.post("/api/sessions/import")
+async def import_sessions(request: Request, on_conflict: str = "skip"):
+    """
+    Restore sessions from an NDJSON body (the format of /api/sessions/export?format=ndjson)
+    The body is parsed as it streams in and inserted in batched transactions.
+    on_conflict: skip (keep existing), replace (overwrite) or new_id (import as a copy)
+    """
+    if on_conflict not in CONFLICT_POLICIES:
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Invalid conflict policy", "detail": f"Use one of: {', '.join(CONFLICT_POLICIES)}"}
+        )
+    
+    totals = {"imported": 0, "updated": 0, "skipped": 0}
+    errors = []
+    error_count = 0
+    batch = []
+    
+    async def flush():
+        counts = await run_in_threadpool(storage.import_sessions, batch, on_conflict)
+        for key, value in counts.items():
+            totals[key] += value
+        batch.clear()
+    
+    try:
+        line_no = 0
+        async for line in _ndjson_lines(request):
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                # Decoded per line: a corrupt line is rejected like invalid JSON
+                batch.append(import_row(json.loads(line.decode("utf-8", errors="strict"))))
+            except (UnicodeDecodeError, ValueError, TypeError) as e:
+                error_count += 1
+                if len(errors) < 20:
+                    errors.append(f"line {line_no}: {e}")
+                continue
+            if len(batch) >= settings.IMPORT_BATCH_SIZE:
+                await flush()
+        
+        if batch:
+            await flush()
+    
+    except Exception as e:
+        logger.error(f"Session import failed: {e}")
+        return JSONResponse(
+            status_code=500,
+            content={
+                "error": "Failed to import sessions",
+                "detail": str(e),
+                **totals
+            }
+        )
+    
+    logger.info(f"Imported sessions: {totals}, {error_count} invalid lines")
+    
+    return {
+        **totals,
+        "invalid": error_count,
+        "errors": errors,
+        "status": "success"
+    }
+
+
+async def _ndjson_lines(request: Request):
+    """Yield the lines of a streamed request body, as bytes"""
+    pending = b""
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+
 @app.get("/api/sessions/{session_id}")
 def get_session(session_id: str):
     """
@@ -247,18 +1121,19 @@ def get_session(session_id: str):
     Includes complete transcript and summary
     """
     try:
-        session = storage.get_session(session_id)
+        # Cached session JSON is spliced into the response as-is
+        session = storage.get_session_json(session_id)
         
-        if not session:
+        if session is None:
             return JSONResponse(
                 status_code=404,
                 content={"error": "Session not found"}
             )
         
-        return {
-            "session": session,
+        return JSONResponse({
+            "session": RawJSON(session),
             "status": "success"
-        }
+        })
     except Exception as e:
         logger.error(f"Failed to get session {session_id}: {e}")
         return JSONResponse(
@@ -271,62 +1146,35 @@ def get_session(session_id: str):
 
 
 @app.get("/api/sessions/{session_id}/export")
-def export_session(session_id: str):
+def export_session(session_id: str, request: Request):
     """
     Export session as Markdown file
     Returns formatted markdown string
+    Rendered once and cached; repeat downloads with If-None-Match get 304
     """
     try:
-        session = storage.get_session(session_id)
+        export = get_export(session_id)
         
-        if not session:
+        if not export:
             return JSONResponse(
                 status_code=404,
                 content={"error": "Session not found"}
             )
         
-        # Format as Markdown
-        created_date = datetime.fromisoformat(session['created_at']).strftime("%B %d, %Y at %I:%M %p")
-        
-        markdown = f"""# Meeting Summary
-
-**Date:** {created_date}
-
----
-
-## Transcript
-
-{session['transcript']}
-
----
-
-## Summary
-
-### 📌 Key Points
-
-"""
-        
-        for i, point in enumerate(session['summary']['key_points'], 1):
-            markdown += f"{i}. {point}\n"
-        
-        if session['summary']['decisions']:
-            markdown += "\n### ✅ Decisions Made\n\n"
-            for i, decision in enumerate(session['summary']['decisions'], 1):
-                markdown += f"{i}. {decision}\n"
-        
-        if session['summary']['action_items']:
-            markdown += "\n### 🎯 Action Items\n\n"
-            for i, item in enumerate(session['summary']['action_items'], 1):
-                markdown += f"{i}. {item}\n"
+        etag, markdown = export
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "private, no-cache"
+        }
         
-        markdown += "\n---\n\n*Generated by Verba - Offline-first meeting assistant*\n"
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
         
-        return PlainTextResponse(
+        headers["Content-Disposition"] = f"attachment; filename=verba-session-{session_id[:8]}.md"
+        return Response(
             content=markdown,
             media_type="text/markdown",
-            headers={
-                "Content-Disposition": f"attachment; filename=verba-session-{session_id[:8]}.md"
-            }
+            headers=headers
         )
     
     except Exception as e:
@@ -370,8 +1218,15 @@ def delete_session(session_id: str):
 
 
 if __name__ == "__main__":
+    import uvicorn
+    
     logger.info("Starting Verba API server...")
     logger.info(f"Online features: {'enabled' if settings.ONLINE_FEATURES_ENABLED else 'disabled'}")
     logger.info(f"Whisper model: {settings.WHISPER_MODEL_SIZE} on {settings.WHISPER_DEVICE}")
     
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
+    if settings.SERVER_WORKERS > 1:
+        # Prefork mode (see server.py)
+        from server import serve
+        serve(settings.SERVER_WORKERS, settings.SERVER_HOST, settings.SERVER_PORT)
+    else:
+        uvicorn.run(app, host=settings.SERVER_HOST, port=settings.SERVER_PORT, log_level="info")
@@ -0,0 +1,56 @@
+"""
+Cheap audio duration probing from container metadata (no decoding)
+Used for admission control and scheduling before a job is queued
+"""
+import importlib.util
+import os
+import wave
+from typing import Optional
+
+import settings
+
+# av is imported on first probe to keep startup fast
+AV_AVAILABLE = importlib.util.find_spec("av") is not None
+
+
+def probe_duration(audio_path: str) -> Optional[float]:
+    """
+    Read the duration in seconds from container headers
+    Returns None when the container doesn't record it (e.g. MediaRecorder webm)
+    """
+    if AV_AVAILABLE:
+        import av
+        try:
+            with av.open(audio_path) as container:
+                if container.duration:
+                    return container.duration / av.time_base
+                stream = container.streams.audio[0]
+                if stream.duration and stream.time_base:
+                    return float(stream.duration * stream.time_base)
+        except Exception:
+            pass
+    
+    try:
+        with wave.open(audio_path, "rb") as wav:
+            return wav.getnframes() / float(wav.getframerate())
+    except Exception:
+        return None
+
+
+def estimate_duration(audio_path: str, size: Optional[int] = None) -> float:
+    """
+    Duration from headers, or estimated from the file size when missing
+    Browser webm/opus recordings are roughly AUDIO_BITRATE_ESTIMATE bits/s
+    `size` is the final size of a file still being uploaded
+    """
+    duration = probe_duration(audio_path)
+    if duration is not None:
+        return duration
+    return size_duration(audio_path, size)
+
+
+def size_duration(audio_path: str, size: Optional[int] = None) -> float:
+    """Duration estimated from the file size at AUDIO_BITRATE_ESTIMATE bits/s"""
+    if size is None:
+        size = os.path.getsize(audio_path)
+    return size * 8 / settings.AUDIO_BITRATE_ESTIMATE
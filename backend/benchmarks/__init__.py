@@ -0,0 +1,4 @@
+"""
+Offline benchmark suite for Verba (transcription, summarization, storage)
+Run from backend/: python -m benchmarks.run --help
+"""
@@ -0,0 +1,109 @@
+"""
+Semantic search: indexing throughput and query latency at different index sizes
+Each size uses a fresh SQLite file with synthetic ~600 word sessions (about
+ten segments each), embedded with the hashing embedder. Queries are timed
+scoring every row and with the IVF index; IVF recall@10 is measured against
+the exhaustive results.
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from benchmarks import synthetic
+from benchmarks.bench_storage import SUMMARY
+
+import settings
+from search import HashingEmbedder, SemanticIndex
+from storage import StorageManager, import_row
+
+SESSION_WORDS = 600
+# Long enough for the IVF lists to be trained before queries are timed
+IVF_TRAIN_TIMEOUT_SECONDS = 300
+
+
+def run(args) -> List[Dict]:
+    results = []
+    rng = random.Random(11)
+    queries = [" ".join(rng.sample(synthetic.VOCABULARY, 3)) for _ in range(args.search_queries)]
+    
+    for segments in args.search_segments:
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = StorageManager(os.path.join(tmp, "bench.db"))
+            results += _bench_size(manager, segments, queries)
+            manager.engine.dispose()
+    return results
+
+
+def _bench_size(manager: StorageManager, segments: int, queries: List[str]) -> List[Dict]:
+    embedder = HashingEmbedder(settings.SEMANTIC_HASH_DIM)
+    exhaustive = SemanticIndex(manager, embedder, ivf_min_rows=sys.maxsize)
+    ivf = SemanticIndex(manager, embedder, ivf_min_rows=0)
+    
+    # Sessions of ~10 segments each, imported in bulk
+    start_time = datetime(2024, 1, 1)
+    batch = []
+    for i in range(max(1, segments // 10)):
+        batch.append(import_row({
+            "id": str(uuid.uuid4()),
+            "created_at": (start_time + timedelta(seconds=i)).isoformat(),
+            "transcript": synthetic.transcript(SESSION_WORDS, seed=i),
+            "summary": SUMMARY
+        }))
+        if len(batch) >= 5000:
+            manager.import_sessions(batch)
+            batch = []
+    if batch:
+        manager.import_sessions(batch)
+    
+    started = time.perf_counter()
+    exhaustive.backfill()
+    seconds = time.perf_counter() - started
+    indexed = exhaustive.stats()["segments"]
+    results = [{
+        "name": f"search.index.{segments}segments",
+        "seconds": seconds,
+        "throughput": indexed / seconds if seconds else None,
+        "unit": "segments/s"
+    }]
+    
+    expected = [_session_ids(exhaustive.search(query)) for query in queries]
+    results.append(_query_result("exhaustive", segments, exhaustive, queries))
+    
+    ivf.sync()
+    deadline = time.monotonic() + IVF_TRAIN_TIMEOUT_SECONDS
+    while not ivf.stats()["ivf_lists"] and time.monotonic() < deadline:
+        time.sleep(0.1)
+    result = _query_result("ivf", segments, ivf, queries)
+    found = [_session_ids(ivf.search(query)) for query in queries]
+    result["recall_at_10"] = statistics.mean(
+        len(set(a) & set(b)) / len(a) for a, b in zip(expected, found) if a
+    )
+    result["ivf_lists"] = ivf.stats()["ivf_lists"]
+    results.append(result)
+    return results
+
+
+def _query_result(mode: str, segments: int, index: SemanticIndex, queries: List[str]) -> Dict:
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        "name": f"search.query.{mode}.{segments}segments",
+        "seconds": statistics.median(timings),
+        "p95_seconds": timings[int(len(timings) * 0.95) - 1],
+        "throughput": len(timings) / sum(timings),
+        "unit": "queries/s"
+    }
+
+
+def _session_ids(results: List[Dict]) -> List[str]:
+    return [result["session_id"] for result in results]
@@ -0,0 +1,134 @@
+"""
+StorageManager create/list/get/delete at different table sizes
+Each size uses a fresh SQLite file; the bulk of the rows is loaded with
+import_sessions so large tables can be built in seconds
+
+Concurrent creates (inserts/s with N client threads) are measured with one
+transaction per insert and with group commit (--group-commit-ms)
+"""
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from benchmarks import synthetic
+
+from storage import StorageManager, import_row
+
+SUMMARY = {
+    "key_points": ["We decided to ship the release", "John will write the docs"],
+    "decisions": ["We decided to ship the release"],
+    "action_items": ["John will write the docs"]
+}
+
+
+def run(args) -> List[Dict]:
+    results = []
+    transcript = synthetic.transcript(args.session_words)
+    
+    for rows in args.storage_rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = StorageManager(os.path.join(tmp, "bench.db"))
+            results += _bench_size(manager, rows, transcript, args.storage_ops)
+            manager.engine.dispose()
+    
+    for group_commit_ms in (0, args.group_commit_ms):
+        for clients in args.storage_concurrency:
+            with tempfile.TemporaryDirectory() as tmp:
+                manager = StorageManager(os.path.join(tmp, "bench.db"), group_commit_ms=group_commit_ms)
+                results.append(_bench_concurrent_creates(manager, clients, transcript, args.storage_ops))
+                manager.engine.dispose()
+    
+    return results
+
+
+def _bench_concurrent_creates(manager: StorageManager, clients: int, transcript: str, ops: int) -> Dict:
+    """`clients` threads inserting ops sessions between them, as fast as they can"""
+    manager.engine  # Schema creation isn't part of the measurement
+    per_client = max(1, ops // clients)
+    barrier = threading.Barrier(clients + 1)
+    
+    def client():
+        barrier.wait()
+        for _ in range(per_client):
+            manager.create_session(transcript, SUMMARY)
+    
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+    
+    mode = f"group{manager.group_commit_ms:g}ms" if manager.group_commit_ms else "single"
+    return {
+        "name": f"storage.create_concurrent.{mode}.{clients}clients",
+        "seconds": seconds,
+        "throughput": per_client * clients / seconds if seconds else None,
+        "unit": "inserts/s"
+    }
+
+
+def _bench_size(manager: StorageManager, rows: int, transcript: str, ops: int) -> List[Dict]:
+    results = []
+    start_time = datetime(2024, 1, 1)
+    
+    # Bulk load
+    started = time.perf_counter()
+    batch = []
+    for i in range(rows):
+        batch.append(import_row({
+            "id": str(uuid.uuid4()),
+            "created_at": (start_time + timedelta(seconds=i)).isoformat(),
+            "transcript": transcript,
+            "summary": SUMMARY
+        }))
+        if len(batch) >= 5000:
+            manager.import_sessions(batch)
+            batch = []
+    if batch:
+        manager.import_sessions(batch)
+    results.append(_result("import", rows, rows, time.perf_counter() - started))
+    
+    # Individual creates (one transaction each) on top of the loaded table
+    created = []
+    started = time.perf_counter()
+    for _ in range(ops):
+        created.append(manager.create_session(transcript, SUMMARY))
+    results.append(_result("create", rows, ops, time.perf_counter() - started))
+    
+    # Listing the most recent page
+    started = time.perf_counter()
+    for _ in range(ops):
+        manager.list_sessions()
+    results.append(_result("list", rows, ops, time.perf_counter() - started))
+    
+    # Random point reads
+    rng = random.Random(7)
+    started = time.perf_counter()
+    for _ in range(ops):
+        manager.get_session(rng.choice(created))
+    results.append(_result("get", rows, ops, time.perf_counter() - started))
+    
+    # Deletes
+    started = time.perf_counter()
+    for session_id in created:
+        manager.delete_session(session_id)
+    results.append(_result("delete", rows, ops, time.perf_counter() - started))
+    
+    return results
+
+
+def _result(operation: str, rows: int, ops: int, seconds: float) -> Dict:
+    return {
+        "name": f"storage.{operation}.{rows}rows",
+        "seconds": seconds,
+        "throughput": ops / seconds if seconds else None,
+        "unit": "ops/s"
+    }
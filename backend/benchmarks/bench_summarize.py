@@ -0,0 +1,47 @@
+"""
+Summarization throughput on large generated transcripts
+"""
+from typing import Dict, List
+
+from benchmarks import synthetic
+from benchmarks.timing import measure
+
+import summarizer
+
+
+def run(args) -> List[Dict]:
+    results = []
+    for words in args.transcript_words:
+        text = synthetic.transcript(words)
+        segments = synthetic.segments(words)
+        
+        for engine in summarizer.SUMMARIZER_ENGINES:
+            for mode in summarizer.SUMMARIZER_MODES:
+                def summarize():
+                    # Cold run: window cache must not hide the real cost
+                    summarizer.clear_window_cache()
+                    summarizer.summarize_transcript(text, engine=engine, mode=mode, segments=segments)
+                
+                seconds = measure(summarize, args.repeat)
+                results.append({
+                    "name": f"summarize.{engine}.{mode}.{words}w",
+                    "seconds": seconds,
+                    "throughput": words / seconds if seconds else None,
+                    "unit": "words/s"
+                })
+        
+        # Re-summarizing an unchanged transcript should be served from the window cache
+        summarizer.clear_window_cache()
+        summarizer.summarize_transcript(text, mode="hierarchical", segments=segments)
+        seconds = measure(
+            lambda: summarizer.summarize_transcript(text, mode="hierarchical", segments=segments),
+            args.repeat
+        )
+        results.append({
+            "name": f"summarize.hierarchical_cached.{words}w",
+            "seconds": seconds,
+            "throughput": words / seconds if seconds else None,
+            "unit": "words/s"
+        })
+    
+    return results
@@ -0,0 +1,49 @@
+"""
+Transcription real-time factor (audio seconds per wall second) on synthetic audio
+Needs faster-whisper and a locally cached model; set HF_HUB_OFFLINE=1 to make
+sure nothing is downloaded during a run
+"""
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+from benchmarks import synthetic
+
+import transcriber
+
+
+def run(args) -> List[Dict]:
+    if not transcriber.WHISPER_AVAILABLE:
+        print("faster-whisper not available - skipping transcription benchmarks")
+        return [{"name": "transcribe", "skipped": "faster-whisper not available"}]
+    
+    results = []
+    
+    # Model load is measured once, separately from inference
+    started = time.perf_counter()
+    transcriber.get_model()
+    results.append({
+        "name": f"transcribe.model_load.{transcriber.MODEL_SIZE}",
+        "seconds": time.perf_counter() - started,
+        "throughput": None,
+        "unit": None
+    })
+    
+    for seconds in args.audio_seconds:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, f"synthetic-{seconds}s.wav")
+            synthetic.write_audio(path, seconds, speech_sample=args.speech_sample)
+            
+            started = time.perf_counter()
+            transcriber.transcribe_audio(path, preprocess=args.preprocess)
+            elapsed = time.perf_counter() - started
+        
+        results.append({
+            "name": f"transcribe.{transcriber.MODEL_SIZE}.{seconds}s",
+            "seconds": elapsed,
+            "throughput": seconds / elapsed if elapsed else None,
+            "unit": "rtf"
+        })
+    
+    return results
@@ -0,0 +1,60 @@
+"""
+Compare two benchmark result files and flag regressions
+
+Usage (from backend/):
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 0.10]
+
+Exits with status 1 if any benchmark got slower by more than the threshold.
+"""
+import argparse
+import json
+import sys
+
+
+def load(path: str):
+    with open(path) as f:
+        report = json.load(f)
+    return report["meta"], {r["name"]: r for r in report["results"] if "seconds" in r}
+
+
+def compare(baseline: dict, candidate: dict, threshold: float):
+    """Return rows of (name, old seconds, new seconds, relative change, regressed)"""
+    rows = []
+    for name in sorted(set(baseline) & set(candidate)):
+        old, new = baseline[name]["seconds"], candidate[name]["seconds"]
+        change = (new - old) / old if old else 0.0
+        rows.append((name, old, new, change, change > threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare Verba benchmark results")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative slowdown that counts as a regression (default 0.10 = 10%%)")
+    args = parser.parse_args(argv)
+    
+    old_meta, baseline = load(args.baseline)
+    new_meta, candidate = load(args.candidate)
+    print(f"Baseline {old_meta['commit']} ({old_meta['timestamp']}) vs candidate {new_meta['commit']} ({new_meta['timestamp']})")
+    
+    rows = compare(baseline, candidate, args.threshold)
+    width = max((len(r[0]) for r in rows), default=10)
+    for name, old, new, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<{width}}  {old:>10.4f}s  {new:>10.4f}s  {change:+7.1%}{flag}")
+    
+    missing = sorted(set(baseline) - set(candidate))
+    if missing:
+        print(f"Missing from candidate: {', '.join(missing)}")
+    
+    regressions = [r for r in rows if r[4]]
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+        sys.exit(1)
+    print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
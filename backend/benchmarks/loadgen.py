@@ -0,0 +1,195 @@
+"""
+In-process ASGI load generator for capacity planning
+
+Drives /api/transcribe and /api/summarize at a fixed concurrency against the
+app running in this process, with the mock transcriber simulating inference
+cost (MOCK_RTF audio seconds per wall second). No server or Whisper needed.
+
+Usage (from backend/):
+    python -m benchmarks.loadgen --concurrency 8 --requests 200
+    python -m benchmarks.loadgen --rtf 20 --jitter 0.2 --audio-seconds 30,300 --workers 2
+    python -m benchmarks.loadgen --mix transcribe=1 --duration 60 --output load.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+from typing import Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+ENDPOINTS = ("transcribe", "summarize")
+
+
+def _int_list(value: str):
+    return [int(v) for v in value.split(",") if v]
+
+
+def _mix(value: str) -> Dict[str, float]:
+    weights = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Verba in-process load generator")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight at once")
+    parser.add_argument("--requests", type=int, default=100, help="Total requests to send")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="Run for this many seconds instead of a fixed request count")
+    parser.add_argument("--mix", type=_mix, default=_mix("transcribe=1,summarize=1"),
+                        help="Endpoint weights, e.g. transcribe=3,summarize=1")
+    parser.add_argument("--audio-seconds", type=_int_list, default=[10, 60],
+                        help="Upload durations in seconds, picked at random per request")
+    parser.add_argument("--transcript-words", type=int, default=1500,
+                        help="Transcript length sent to /api/summarize")
+    parser.add_argument("--rtf", type=float, default=10.0,
+                        help="Mock real-time factor (audio seconds per wall second)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Mock RTF jitter (+/- fraction)")
+    parser.add_argument("--workers", type=int, default=None, help="TRANSCRIBE_WORKERS for the app")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Write the report as JSON")
+    return parser.parse_args(argv)
+
+
+def _configure(args):
+    """Settings are read at import time, so set them before importing the app"""
+    os.environ["MOCK_TRANSCRIBER"] = "true"
+    os.environ["MOCK_RTF"] = str(args.rtf)
+    os.environ["MOCK_RTF_JITTER"] = str(args.jitter)
+    os.environ["ENABLE_AUDIO_PREPROCESSING"] = "false"
+    os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.gettempdir(), "verba_loadgen_sessions.db"))
+    if args.workers:
+        os.environ["TRANSCRIBE_WORKERS"] = str(args.workers)
+
+
+def _silent_wav(seconds: int) -> bytes:
+    """8 kHz mono WAV; the mock only reads the duration from its header"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(8000)
+        out.writeframes(b"\0\0" * 8000 * seconds)
+    return buffer.getvalue()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def run_load(args) -> Dict:
+    import httpx
+    from app import app
+    from benchmarks import synthetic
+    
+    rng = random.Random(args.seed)
+    uploads = {seconds: _silent_wav(seconds) for seconds in args.audio_seconds}
+    transcript = synthetic.transcript(args.transcript_words)
+    names = list(args.mix)
+    weights = [args.mix[name] for name in names]
+    
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    issued = 0
+    deadline = time.perf_counter() + args.duration if args.duration else None
+    
+    def next_request():
+        nonlocal issued
+        if deadline is not None:
+            if time.perf_counter() >= deadline:
+                return None
+        elif issued >= args.requests:
+            return None
+        issued += 1
+        return rng.choices(names, weights)[0]
+    
+    async def one(client, name):
+        started = time.perf_counter()
+        if name == "transcribe":
+            seconds = rng.choice(args.audio_seconds)
+            response = await client.post(
+                "/api/transcribe",
+                files={"audio": (f"load-{seconds}s.wav", uploads[seconds], "audio/wav")}
+            )
+        else:
+            response = await client.post("/api/summarize", json={"transcript": transcript})
+        elapsed = time.perf_counter() - started
+        if response.status_code == 200:
+            samples[name].append(elapsed)
+        else:
+            errors[name] += 1
+    
+    async def worker(client):
+        while True:
+            name = next_request()
+            if name is None:
+                return
+            try:
+                await one(client, name)
+            except Exception:
+                errors[name] += 1
+    
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadgen", timeout=None) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+        wall = time.perf_counter() - started
+    
+    endpoints = {}
+    for name in names:
+        latencies = samples[name]
+        endpoints[name] = {
+            "completed": len(latencies),
+            "errors": errors[name],
+            "throughput": len(latencies) / wall if wall else None,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies) if latencies else 0.0
+        }
+    
+    return {
+        "meta": {k: v for k, v in vars(args).items() if k != "output"},
+        "wall_seconds": wall,
+        "endpoints": endpoints
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    _configure(args)
+    
+    report = asyncio.run(run_load(args))
+    
+    print(f"Concurrency {args.concurrency}, RTF {args.rtf}, {report['wall_seconds']:.2f}s wall")
+    for name, stats in report["endpoints"].items():
+        print(
+            f"  {name}: {stats['completed']} ok, {stats['errors']} errors, "
+            f"{stats['throughput']:.2f} req/s, p50 {stats['p50']:.3f}s, "
+            f"p95 {stats['p95']:.3f}s, p99 {stats['p99']:.3f}s"
+        )
+    
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Run the benchmark suite and write results to JSON
+
+Usage (from backend/):
+    python -m benchmarks.run                       # quick suite
+    python -m benchmarks.run --full                # 30 min / 3 h audio, up to 1M rows
+    python -m benchmarks.run --only summarize,storage --output results.json
+    python -m benchmarks.compare old.json new.json # flag regressions
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Keep the global StorageManager away from the real database
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.gettempdir(), "verba_bench_sessions.db"))
+sys.path.insert(0, str(BACKEND_DIR))
+
+SUITES = ("startup", "transcribe", "summarize", "storage", "search")
+
+
+def _int_list(value: str):
+    return [int(v) for v in value.split(",") if v]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Verba benchmark suite")
+    parser.add_argument("--only", default=",".join(SUITES),
+                        help=f"Comma-separated suites to run ({', '.join(SUITES)})")
+    parser.add_argument("--full", action="store_true",
+                        help="Use the large sizes (30 min and 3 h audio, up to 1M rows)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (median is kept)")
+    parser.add_argument("--audio-seconds", type=_int_list, default=None,
+                        help="Synthetic audio durations in seconds (default 60, or 60,1800,10800 with --full)")
+    parser.add_argument("--speech-sample", default=None,
+                        help="16 kHz mono WAV looped to build the audio instead of synthetic tones")
+    parser.add_argument("--no-preprocess", dest="preprocess", action="store_false",
+                        help="Skip audio preprocessing when transcribing")
+    parser.add_argument("--transcript-words", type=_int_list, default=None,
+                        help="Generated transcript sizes in words (default 9000,27000)")
+    parser.add_argument("--storage-rows", type=_int_list, default=None,
+                        help="Table sizes for storage benchmarks (default 10000, or 10000,100000,1000000 with --full)")
+    parser.add_argument("--storage-ops", type=int, default=1000,
+                        help="Individual create/list/get/delete calls per table size")
+    parser.add_argument("--storage-concurrency", type=_int_list, default=[1, 4, 16, 64],
+                        help="Client threads for the concurrent create benchmark")
+    parser.add_argument("--group-commit-ms", type=float, default=2,
+                        help="Group commit window compared against one transaction per insert")
+    parser.add_argument("--session-words", type=int, default=300,
+                        help="Transcript length of each stored session")
+    parser.add_argument("--search-segments", type=_int_list, default=None,
+                        help="Semantic index sizes in segments (default 10000, or 10000,100000 with --full)")
+    parser.add_argument("--search-queries", type=int, default=200,
+                        help="Semantic search queries timed per index size")
+    parser.add_argument("--output", default=None, help="Result file (default benchmarks/results/<time>-<commit>.json)")
+    args = parser.parse_args(argv)
+    
+    if args.audio_seconds is None:
+        args.audio_seconds = [60, 1800, 10800] if args.full else [60]
+    if args.transcript_words is None:
+        # ~1 h and ~3 h of speech at 150 words per minute
+        args.transcript_words = [9000, 27000]
+    if args.storage_rows is None:
+        args.storage_rows = [10000, 100000, 1000000] if args.full else [10000]
+    if args.search_segments is None:
+        args.search_segments = [10000, 100000] if args.full else [10000]
+    return args
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    suites = [s.strip() for s in args.only.split(",") if s.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        raise SystemExit(f"Unknown suites: {', '.join(sorted(unknown))}")
+    
+    from benchmarks import bench_transcribe, bench_summarize, bench_storage, bench_search, startup
+    runners = {
+        "startup": startup,
+        "transcribe": bench_transcribe,
+        "summarize": bench_summarize,
+        "storage": bench_storage,
+        "search": bench_search
+    }
+    
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k != "output"}
+        },
+        "results": []
+    }
+    
+    for suite in suites:
+        print(f"Running {suite} benchmarks...")
+        for result in runners[suite].run(args):
+            report["results"].append(result)
+            if "seconds" in result:
+                throughput = f" ({result['throughput']:.1f} {result['unit']})" if result.get("throughput") else ""
+                print(f"  {result['name']}: {result['seconds']:.4f}s{throughput}")
+    
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}-{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Startup cost: how long `import app` takes and which modules it is spent in
+Each measurement runs a fresh interpreter with `python -X importtime`, so
+nothing is cached in sys.modules between runs
+
+Usage (from backend/):
+    python -m benchmarks.startup               # import cost per module
+    python -m benchmarks.startup --top 40 --module pipeline
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def import_times(module: str = "app") -> List[Tuple[int, str, float, float]]:
+    """
+    Import `module` in a fresh interpreter
+    Returns (depth, name, self seconds, cumulative seconds) per imported module
+    """
+    env = dict(os.environ)
+    env.setdefault("DATABASE_PATH", os.path.join(tempfile.gettempdir(), "verba_startup_sessions.db"))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(BACKEND_DIR), env.get("PYTHONPATH")]))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # One space after the bar, then two per nesting level
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        entries.append((depth, name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return entries
+
+
+def direct_imports(entries, module: str):
+    """Entries imported directly by `module` (listed just before it, one level deeper)"""
+    index = next(i for i, entry in enumerate(entries) if entry[0] == 0 and entry[1] == module)
+    children = []
+    for entry in reversed(entries[:index]):
+        if entry[0] == 0:
+            break
+        if entry[0] == 1:
+            children.append(entry)
+    return children
+
+
+def run(args) -> List[Dict]:
+    """Benchmark suite entry point (see benchmarks.run)"""
+    totals = []
+    for _ in range(args.repeat):
+        entries = import_times("app")
+        totals.append(next(cumulative for _, name, _, cumulative in entries if name == "app"))
+    
+    results = [{
+        "name": "startup.import_app",
+        "seconds": statistics.median(totals),
+        "throughput": None,
+        "unit": None
+    }]
+    # Direct imports of app, from the last run
+    for _, name, _, cumulative in direct_imports(entries, "app"):
+        results.append({
+            "name": f"startup.import.{name}",
+            "seconds": cumulative,
+            "throughput": None,
+            "unit": None
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the import cost of each module at startup")
+    parser.add_argument("--module", default="app", help="Module to import (default app)")
+    parser.add_argument("--top", type=int, default=25, help="Slowest modules to list")
+    args = parser.parse_args(argv)
+    
+    entries = import_times(args.module)
+    total = next(cumulative for _, name, _, cumulative in entries if name == args.module)
+    print(f"import {args.module}: {total * 1000:.0f} ms")
+    
+    print(f"\nDirect imports of {args.module} (cumulative):")
+    for _, name, _, cumulative in sorted(direct_imports(entries, args.module), key=lambda e: -e[3]):
+        print(f"  {cumulative * 1000:8.1f} ms  {name}")
+    
+    print("\nSlowest modules (self time):")
+    for depth, name, self_time, _ in sorted(entries, key=lambda e: -e[2])[:args.top]:
+        print(f"  {self_time * 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
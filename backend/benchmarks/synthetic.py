@@ -0,0 +1,101 @@
+"""
+Deterministic synthetic inputs for the benchmarks
+Audio and transcripts are generated from a fixed seed so runs are comparable
+"""
+import random
+import wave
+from typing import Dict, List, Optional
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+VOCABULARY = (
+    "project timeline budget release launch customer feedback design review testing "
+    "deploy server database migration hiring roadmap quarter marketing sales metrics "
+    "onboarding documentation security audit contract vendor pricing support backlog"
+).split()
+FILLERS = ["um", "uh", "like", "you know", "basically", "so", "and", "the", "we", "to"]
+TEMPLATES = [
+    "We decided to {w} the {w} before the {w} review",
+    "{name} will follow up on the {w} and the {w}",
+    "We need to {w} the {w} by next {day}",
+    "The {w} {w} is blocked on {w}",
+    "I think the {w} looks good but the {w} needs more {w}",
+    "Let's {w} the {w} and revisit the {w} next week",
+]
+NAMES = ["Ana", "John", "Priya", "Wei", "Fatima", "Lars"]
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+
+def transcript(words: int, seed: int = 42) -> str:
+    """Generate a meeting-like transcript of roughly `words` words"""
+    rng = random.Random(seed)
+    sentences = []
+    count = 0
+    while count < words:
+        template = rng.choice(TEMPLATES)
+        sentence = template.format(
+            w="{w}", name=rng.choice(NAMES), day=rng.choice(DAYS)
+        )
+        while "{w}" in sentence:
+            sentence = sentence.replace("{w}", rng.choice(VOCABULARY), 1)
+        if rng.random() < 0.3:
+            sentence = f"{rng.choice(FILLERS)} {sentence}"
+        sentences.append(sentence + rng.choice([".", ".", ".", "?", "!"]))
+        count += len(sentence.split())
+    return " ".join(sentences)
+
+
+def segments(words: int, seconds_per_segment: float = 5.0, seed: int = 42) -> List[Dict]:
+    """Split a synthetic transcript into timestamped segments"""
+    text = transcript(words, seed)
+    parts = [p.strip() for p in text.replace("?", ".").replace("!", ".").split(".") if p.strip()]
+    return [
+        {"start": i * seconds_per_segment, "end": (i + 1) * seconds_per_segment, "text": part + "."}
+        for i, part in enumerate(parts)
+    ]
+
+
+def write_audio(path: str, seconds: float, speech_sample: Optional[str] = None, seed: int = 42):
+    """
+    Write a 16 kHz mono WAV of the given duration
+    
+    With speech_sample (a 16 kHz mono WAV), the sample is looped to length.
+    Otherwise a voiced-like signal is synthesised: harmonic tones at a
+    wandering pitch, amplitude-modulated at syllable rate, with pauses.
+    Written in one-second blocks so multi-hour files don't need the RAM.
+    """
+    total = int(seconds * SAMPLE_RATE)
+    rng = np.random.default_rng(seed)
+    
+    loop = None
+    if speech_sample:
+        with wave.open(speech_sample, "rb") as sample:
+            if sample.getframerate() != SAMPLE_RATE or sample.getnchannels() != 1:
+                raise ValueError("Speech sample must be a 16 kHz mono WAV")
+            loop = np.frombuffer(sample.readframes(sample.getnframes()), dtype=np.int16)
+    
+    with wave.open(path, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(SAMPLE_RATE)
+        
+        written = 0
+        phase = 0.0
+        while written < total:
+            n = min(SAMPLE_RATE, total - written)
+            if loop is not None:
+                idx = (np.arange(written, written + n) % len(loop))
+                block = loop[idx]
+            else:
+                t = np.arange(n) / SAMPLE_RATE
+                pitch = 110 + 40 * rng.random()
+                signal = sum(np.sin(2 * np.pi * pitch * k * t + phase) / k for k in range(1, 6))
+                syllables = 0.5 * (1 + np.sin(2 * np.pi * (3 + 2 * rng.random()) * t))
+                speaking = 0.0 if rng.random() < 0.15 else 1.0
+                noise = rng.normal(0, 0.02, n)
+                block = ((signal * syllables * speaking * 0.3 + noise) * 32767 * 0.5).clip(-32768, 32767).astype(np.int16)
+                phase += 2 * np.pi * pitch * n / SAMPLE_RATE
+            out.writeframes(block.tobytes())
+            written += n
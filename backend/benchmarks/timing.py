@@ -0,0 +1,16 @@
+"""
+Timing helpers shared by the benchmarks
+"""
+import statistics
+import time
+from typing import Callable
+
+
+def measure(func: Callable, repeat: int = 3) -> float:
+    """Run func `repeat` times and return the median wall time in seconds"""
+    timings = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
@@ -0,0 +1,247 @@
+"""
+Markdown export for Verba sessions
+Renders a session once and caches the result by session ID with an ETag,
+so repeated downloads can be answered with 304 Not Modified.
+Bulk archives (zip of Markdown files or NDJSON) are streamed session by session.
+"""
+import hashlib
+import threading
+import zipfile
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from storage import storage
+from responses import dumps
+import settings
+
+FOOTER = "*Generated by Verba - Offline-first meeting assistant*"
+
+
+def render_markdown(session: Dict, footer: str = FOOTER) -> str:
+    """
+    Format a full session dict (as returned by storage.get_session) as Markdown
+    Built from a list of lines joined once instead of repeated concatenation
+    """
+    created_date = datetime.fromisoformat(session['created_at']).strftime("%B %d, %Y at %I:%M %p")
+    summary = session['summary']
+    
+    lines = [
+        "# Meeting Summary",
+        "",
+        f"**Date:** {created_date}",
+        "",
+        "---",
+        "",
+        "## Transcript",
+        "",
+        session['transcript'],
+        "",
+        "---",
+        "",
+        "## Summary",
+        "",
+        "### 📌 Key Points",
+        "",
+    ]
+    _numbered(lines, summary['key_points'])
+    
+    if summary['decisions']:
+        lines += ["", "### ✅ Decisions Made", ""]
+        _numbered(lines, summary['decisions'])
+    
+    if summary['action_items']:
+        lines += ["", "### 🎯 Action Items", ""]
+        _numbered(lines, summary['action_items'])
+    
+    if summary.get('sections'):
+        lines += ["", "### 🕒 Sections"]
+        for i, section in enumerate(summary['sections'], 1):
+            lines += ["", f"#### {_section_title(i, section)}", ""]
+            _numbered(lines, section['key_points'])
+    
+    lines += ["", "---", "", footer, ""]
+    return "\n".join(lines)
+
+
+def _numbered(lines: List[str], items: List[str]):
+    """Append items as a numbered Markdown list"""
+    lines.extend(f"{i}. {item}" for i, item in enumerate(items, 1))
+
+
+def _section_title(index: int, section: Dict) -> str:
+    """Section heading with its time range when timestamps are known"""
+    if section.get('start') is None:
+        return f"Part {index}"
+    return f"Part {index} ({_timestamp(section['start'])} - {_timestamp(section['end'])})"
+
+
+def _timestamp(seconds: float) -> str:
+    """Format seconds as H:MM:SS"""
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class ExportCache:
+    """
+    Size-bounded LRU cache of rendered Markdown exports keyed by session ID
+    Entries are dropped when their session is updated or deleted, and can
+    carry the session version they were rendered from
+    """
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[str, bytes, Optional[str]]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, session_id: str, version: Optional[str] = None) -> Optional[Tuple[str, bytes]]:
+        """Return (etag, markdown bytes), or None if missing or (when version is given) from another version"""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or (version is not None and entry[2] != version):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return entry[:2]
+    
+    def put(self, session_id: str, markdown: str, version: Optional[str] = None) -> Tuple[str, bytes]:
+        """Store a rendered export and return (etag, markdown bytes)"""
+        body = markdown.encode("utf-8")
+        entry = (f'"{hashlib.sha1(body).hexdigest()}"', body, version)
+        
+        with self._lock:
+            self._discard(session_id)
+            if len(body) <= self.max_bytes:
+                self._entries[session_id] = entry
+                self._size += len(body)
+                while self._size > self.max_bytes:
+                    _, (_, evicted, _) = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+        return entry[:2]
+    
+    def invalidate(self, session_id: str):
+        """Drop the cached export of a session"""
+        with self._lock:
+            self._discard(session_id)
+    
+    def _discard(self, session_id: str):
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._size
+            }
+
+
+export_cache = ExportCache(settings.EXPORT_CACHE_MAX_BYTES)
+
+
+def _on_session_change(event: str, session_id: str):
+    if event != "created":
+        export_cache.invalidate(session_id)
+
+
+storage.add_listener(_on_session_change)
+
+
+def get_export(session_id: str) -> Optional[Tuple[str, bytes]]:
+    """
+    Get (etag, markdown bytes) for a session, rendering on first request
+    Returns None if the session does not exist
+    """
+    # Other server workers can't invalidate this process's cache, so with
+    # several of them entries are tied to the session's version (a refined
+    # or deleted session misses); a single worker hits without a query
+    version = None
+    if settings.SERVER_WORKERS > 1:
+        version = storage.session_version(session_id)
+        if version is None:
+            export_cache.invalidate(session_id)
+            return None
+    
+    cached = export_cache.get(session_id, version)
+    if cached is not None:
+        return cached
+    
+    session = storage.get_session(session_id)
+    if not session:
+        return None
+    return export_cache.put(session_id, render_markdown(session), version)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+
+class _ZipStream:
+    """Write-only sink for ZipFile that hands written bytes back to a generator"""
+    
+    def __init__(self):
+        self._chunks: List[bytes] = []
+    
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def archive_filename(session: Dict) -> str:
+    """Stable file name of a session inside a bulk archive"""
+    created = datetime.fromisoformat(session['created_at']).strftime("%Y%m%d-%H%M%S")
+    return f"verba-session-{created}-{session['id'][:8]}.md"
+
+
+def stream_zip(sessions: Iterable[Dict]) -> Iterator[bytes]:
+    """
+    Stream a zip archive with one Markdown file per session
+    Only the current session is held in memory; the zip is written without
+    seeking (data descriptors), so it can go straight to the response
+    """
+    sink = _ZipStream()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for session in sessions:
+            archive.writestr(archive_filename(session), render_markdown(session))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    yield sink.drain()
+
+
+def stream_ndjson(sessions: Iterable[Dict], chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """
+    Stream sessions as newline-delimited JSON, one full session per line
+    Sessions may carry their summary as RawJSON (storage.iter_sessions)
+    """
+    buffer = []
+    buffered = 0
+    for session in sessions:
+        line = dumps(session) + b"\n"
+        buffer.append(line)
+        buffered += len(line)
+        if buffered >= chunk_size:
+            yield b"".join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield b"".join(buffer)
@@ -0,0 +1,150 @@
+"""
+Shared inference process for multi-worker servers (see server.py)
+
+One process owns the Whisper model and transcribes for every HTTP worker
+over a Unix socket, so N workers cost one copy of the model weights.
+Protocol: the client sends one JSON line {"audio_path", "preprocess",
+"start_at", "prompt", "language", "profile"} and
+reads JSON lines back until "done" or "error":
+    {"event": "info", "language", "language_probability", "duration"}
+    {"event": "trim", "seconds"}
+    {"event": "segment", "start", "end", "text"}
+    {"event": "done"} | {"event": "error", "type", "message"}
+Closing the connection cancels the transcription after the current segment.
+"""
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterator, Optional
+
+import metrics
+import model_policy
+import settings
+
+# Errors re-raised with their own type on the client side
+REMOTE_ERRORS = {"FileNotFoundError": FileNotFoundError, "ValueError": ValueError}
+
+# How long a worker waits for the inference process to come up
+CONNECT_TIMEOUT = 60.0
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        import transcriber
+        
+        def send(message: Dict):
+            self.wfile.write(json.dumps(message).encode() + b"\n")
+            self.wfile.flush()
+        
+        def on_info(info):
+            send({
+                "event": "info",
+                "language": info.language,
+                "language_probability": info.language_probability,
+                "duration": info.duration
+            })
+        
+        try:
+            request = json.loads(self.rfile.readline())
+            segments = transcriber.iter_segments(
+                request["audio_path"],
+                request.get("preprocess", True),
+                on_info=on_info,
+                on_trim=lambda seconds: send({"event": "trim", "seconds": seconds}),
+                start_at=request.get("start_at", 0.0),
+                prompt=request.get("prompt"),
+                language=request.get("language"),
+                profile=request.get("profile", model_policy.DEFAULT_PROFILE)
+            )
+            for segment in segments:
+                send({"event": "segment", **segment})
+            send({"event": "done"})
+        except (BrokenPipeError, ConnectionResetError):
+            # Client cancelled; leaving the loop closes the generator and
+            # stops decoding
+            pass
+        except Exception as e:
+            try:
+                send({"event": "error", "type": type(e).__name__, "message": str(e)})
+            except OSError:
+                pass
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path: str):
+    """Run the inference server (blocking); the model loads in the background"""
+    import transcriber
+    
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = _Server(socket_path, _Handler)
+    threading.Thread(target=transcriber.get_model, name="verba-model-load", daemon=True).start()
+    if settings.METRICS_DIR:
+        # Inference latency and real-time factor are recorded here
+        metrics.flush_periodically(settings.METRICS_DIR, settings.METRICS_FLUSH_SECONDS)
+    print(f"Inference server listening on {socket_path}")
+    server.serve_forever()
+
+
+def remote_segments(socket_path: str, audio_path: str, preprocess: bool = True,
+                    on_info: Optional[Callable] = None,
+                    on_trim: Optional[Callable[[float], None]] = None,
+                    check_cancel: Optional[Callable[[], None]] = None,
+                    start_at: float = 0.0, prompt: Optional[str] = None,
+                    language: Optional[str] = None,
+                    profile: str = model_policy.DEFAULT_PROFILE) -> Iterator[Dict]:
+    """
+    Client side of the protocol, with the same contract as transcriber.iter_segments
+    check_cancel is called between segments and may raise to stop early
+    """
+    conn = _connect(socket_path)
+    try:
+        request = {
+            "audio_path": audio_path,
+            "preprocess": preprocess,
+            "start_at": start_at,
+            "prompt": prompt,
+            "language": language,
+            "profile": profile
+        }
+        conn.sendall(json.dumps(request).encode() + b"\n")
+        for line in conn.makefile("rb"):
+            message = json.loads(line)
+            event = message.pop("event")
+            if event == "segment":
+                if check_cancel:
+                    check_cancel()
+                yield message
+            elif event == "info" and on_info:
+                on_info(SimpleNamespace(**message))
+            elif event == "trim" and on_trim:
+                on_trim(message["seconds"])
+            elif event == "done":
+                return
+            elif event == "error":
+                raise REMOTE_ERRORS.get(message["type"], RuntimeError)(message["message"])
+        raise RuntimeError("Inference process closed the connection")
+    finally:
+        conn.close()
+
+
+def _connect(socket_path: str) -> socket.socket:
+    """Connect, waiting for the inference process while it starts up"""
+    deadline = time.monotonic() + CONNECT_TIMEOUT
+    while True:
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(socket_path)
+            return conn
+        except (FileNotFoundError, ConnectionRefusedError):
+            conn.close()
+            if time.monotonic() > deadline:
+                raise RuntimeError("Inference process is not available")
+            time.sleep(0.2)
@@ -0,0 +1,324 @@
+"""
+Background job queue for long-running audio work
+A fixed pool of worker threads runs queued jobs, so concurrent uploads
+share a bounded number of inference slots. Jobs can be cancelled: queued
+jobs are dropped, running jobs see job.cancel_event and stop cooperatively.
+Identical submissions (same key) while a job is in flight share that job.
+
+Scheduling is shortest-job-first on the job's cost (audio seconds), with
+aging: every second spent waiting lowers a job's priority value by
+JOB_AGING_RATE, so long recordings still start within a bounded time.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Callable, Dict, Hashable, List, Optional
+
+import settings
+import metrics
+
+
+class JobCancelled(Exception):
+    """Raised from job.future when a job was cancelled"""
+
+
+class Job:
+    """
+    A unit of queued work with status, progress and result
+    Status: queued -> running -> completed | failed
+            queued -> cancelled, running -> cancelling -> cancelled
+    """
+    
+    def __init__(self, kind: str, func: Callable, args: tuple, kwargs: dict,
+                 cleanup: Optional[Callable] = None, key: Optional[Hashable] = None,
+                 cost: Optional[float] = None, job_id: Optional[str] = None):
+        self.id = job_id or str(uuid.uuid4())
+        self.kind = kind
+        self.key = key
+        # Estimated work in audio seconds, used for scheduling and ETAs
+        self.cost = cost
+        # Speed of the job's transcription profile relative to the default one
+        # (see model_policy); keeps the RTF estimate in default-profile terms
+        self.speedup = 1.0
+        self.queued_at = time.monotonic()
+        self.run_started: Optional[float] = None
+        # Requests waiting on this job (> 1 when duplicates were coalesced)
+        self.waiters = 1
+        self.status = "queued"
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.progress: Dict = {}
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.future: Future = Future()
+        # Set to ask a running job to stop at its next checkpoint
+        self.cancel_event = threading.Event()
+        self._func = func
+        self._args = args
+        self._kwargs = kwargs
+        self._cleanup = cleanup
+    
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+    
+    def to_dict(self) -> Dict:
+        """Convert job to dictionary for API responses"""
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "progress": self.progress,
+            "audio_seconds": round(self.cost, 2) if self.cost is not None else None
+        }
+        if self.status == "completed":
+            data["result"] = self.result
+        if self.status == "failed":
+            data["error"] = self.error
+        return data
+
+
+class JobManager:
+    """
+    Runs jobs on a fixed number of worker threads, shortest first (with aging)
+    Finished jobs are kept (up to a limit) so clients can poll for results
+    """
+    
+    def __init__(self, workers: int, history: int = 200, aging_rate: float = 10.0,
+                 rtf: float = 4.0):
+        self.workers = max(1, workers)
+        self.history = history
+        self.aging_rate = aging_rate
+        self._pending: List[Job] = []
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        # key -> queued or running job, for single-flight deduplication
+        self._inflight: Dict[Hashable, Job] = {}
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._threads = []
+        # Audio seconds processed per wall second, smoothed over finished jobs
+        self._rtf = rtf
+    
+    def submit(self, kind: str, func: Callable, *args, cleanup: Optional[Callable] = None,
+               key: Optional[Hashable] = None, cost: Optional[float] = None,
+               job_id: Optional[str] = None, **kwargs) -> Job:
+        """
+        Queue func(job, *args, **kwargs) and return the job immediately
+        The function's return value becomes job.result. cleanup() runs once
+        the job is finished in any state, including cancelled before it started.
+        
+        cost is the estimated work in audio seconds; cheaper jobs run first.
+        With a key (e.g. upload hash + model config), a queued or running job
+        with the same key is returned instead of queueing a duplicate; this
+        submission's cleanup runs right away since its inputs aren't needed.
+        job_id keeps a job's ID when it is resumed from a checkpoint.
+        """
+        if key is not None:
+            with self._lock:
+                existing = self._inflight.get(key)
+                if existing and existing.status in ("queued", "running"):
+                    existing.waiters += 1
+                else:
+                    existing = None
+            if existing:
+                metrics.JOBS_COALESCED.inc(kind=kind)
+                self._run_cleanup(cleanup)
+                return existing
+        
+        job = Job(kind, func, args, kwargs, cleanup, key, cost, job_id)
+        with self._lock:
+            if key is not None:
+                self._inflight[key] = job
+            self._jobs[job.id] = job
+            self._prune()
+            self._start_workers()
+            self._pending.append(job)
+            self._available.notify()
+        return job
+    
+    def get(self, job_id: str) -> Optional[Job]:
+        """Get a job by ID, None if unknown or pruned"""
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancel a queued or running job, None if unknown
+        Queued jobs are cancelled immediately; running jobs are marked
+        "cancelling" until the job function notices job.cancel_event
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job.status not in ("queued", "running"):
+                # Already finished, or cancelling and waiting on its checkpoint
+                return job
+            job.cancel_event.set()
+            if job.status == "running":
+                job.status = "cancelling"
+                return job
+            job.status = "cancelled"
+            job.finished_at = datetime.utcnow()
+            if job in self._pending:
+                self._pending.remove(job)
+        
+        job.future.set_exception(JobCancelled("Job cancelled"))
+        metrics.JOBS_TOTAL.inc(kind=job.kind, status=job.status)
+        self._finish(job)
+        return job
+    
+    def detach(self, job_id: str) -> Optional[Job]:
+        """
+        Drop one waiter from a job (its client went away)
+        The job is only cancelled once nobody is waiting on it any more
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job.finished:
+                return job
+            job.waiters = max(0, job.waiters - 1)
+            if job.waiters:
+                return job
+        return self.cancel(job_id)
+    
+    def queue_depth(self) -> int:
+        """Number of jobs waiting for a worker"""
+        with self._lock:
+            return len(self._pending)
+    
+    def eta(self, job: Job) -> Optional[float]:
+        """
+        Estimated seconds until the job finishes, None if finished or unknown
+        Assumes the current queue order holds and work spreads evenly over
+        the workers at the observed real-time factor
+        """
+        with self._lock:
+            if job.finished or job.cost is None:
+                return None
+            now = time.monotonic()
+            running = [j for j in self._jobs.values() if j.status in ("running", "cancelling")]
+            backlog = sum(self._remaining(j, now) for j in running)
+            if job.status == "queued":
+                ahead = sorted(self._pending, key=lambda j: self._priority(j, now))
+                for queued in ahead:
+                    backlog += queued.cost or 0.0
+                    if queued is job:
+                        break
+                return round(backlog / self._rtf / self.workers, 1)
+            return round(self._remaining(job, now) / self._rtf / job.speedup, 1)
+    
+    def drain_seconds(self) -> float:
+        """
+        Estimated seconds to finish every running and queued job at the
+        observed real-time factor of the default profile
+        """
+        with self._lock:
+            now = time.monotonic()
+            backlog = sum(self._remaining(j, now) for j in self._jobs.values()
+                          if j.status in ("running", "cancelling"))
+            backlog += sum(j.cost or 0.0 for j in self._pending)
+            return backlog / self._rtf / self.workers
+    
+    def running(self) -> int:
+        """Number of jobs currently running"""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status in ("running", "cancelling"))
+    
+    def _start_workers(self):
+        """Start worker threads on first use"""
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"verba-job-worker-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+    
+    def _prune(self):
+        """Forget the oldest finished jobs beyond the history limit"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+    
+    def _priority(self, job: Job, now: float) -> float:
+        """Lower runs first: cost in audio seconds minus credit for time waited"""
+        return (job.cost or 0.0) - self.aging_rate * (now - job.queued_at)
+    
+    def _remaining(self, job: Job, now: float) -> float:
+        """Audio seconds a running job still has to process"""
+        elapsed = now - job.run_started if job.run_started else 0.0
+        return max(0.0, (job.cost or 0.0) - elapsed * self._rtf * job.speedup)
+    
+    def _next_job(self) -> Job:
+        """Block until a job is pending, then take the best one (O(n) scan)"""
+        with self._available:
+            while not self._pending:
+                self._available.wait()
+            now = time.monotonic()
+            job = min(self._pending, key=lambda j: self._priority(j, now))
+            self._pending.remove(job)
+            job.status = "running"
+            job.started_at = datetime.utcnow()
+            job.run_started = now
+            return job
+    
+    def _observe(self, job: Job):
+        """Fold a finished job's throughput into the real-time factor estimate"""
+        elapsed = time.monotonic() - job.run_started
+        if job.cost and elapsed > 0:
+            with self._lock:
+                self._rtf = 0.8 * self._rtf + 0.2 * (job.cost / elapsed / job.speedup)
+    
+    def _finish(self, job: Job):
+        """Remove a finished job from the in-flight map and release its inputs"""
+        with self._lock:
+            if job.key is not None and self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+        self._run_cleanup(job._cleanup)
+    
+    def _run_cleanup(self, cleanup: Optional[Callable]):
+        if cleanup:
+            try:
+                cleanup()
+            except Exception as e:
+                print(f"Job cleanup failed: {e}")
+    
+    def _work(self):
+        while True:
+            job = self._next_job()
+            try:
+                result = job._func(job, *job._args, **job._kwargs)
+                self._observe(job)
+                with self._lock:
+                    job.result = result
+                    job.finished_at = datetime.utcnow()
+                    job.status = "completed"
+                job.future.set_result(result)
+            except Exception as e:
+                error = e
+                with self._lock:
+                    job.finished_at = datetime.utcnow()
+                    if job.cancel_event.is_set():
+                        job.status = "cancelled"
+                        error = JobCancelled("Job cancelled")
+                    else:
+                        job.error = str(e)
+                        job.status = "failed"
+                job.future.set_exception(error)
+            finally:
+                metrics.JOBS_TOTAL.inc(kind=job.kind, status=job.status)
+                self._finish(job)
+
+
+# Global job manager (one inference slot per worker)
+job_manager = JobManager(
+    settings.TRANSCRIBE_WORKERS,
+    history=settings.JOB_HISTORY,
+    aging_rate=settings.JOB_AGING_RATE,
+    rtf=settings.ESTIMATED_RTF
+)
+metrics.QUEUE_DEPTH.set_function(job_manager.queue_depth)
+metrics.JOBS_RUNNING.set_function(job_manager.running)
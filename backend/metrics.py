@@ -0,0 +1,323 @@
+"""
+Prometheus metrics for Verba
+A small dependency-free registry rendered in the Prometheus text format
+at GET /metrics
+
+With several server processes each one writes its values to a shared
+directory (write_snapshot, every few seconds) and /metrics merges them
+(render_directory): counters and histograms are summed over every process
+that has run, gauges over the live ones.
+"""
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Latency buckets in seconds, from fast DB queries to multi-hour transcriptions
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+
+_registry: List["_Metric"] = []
+_registry_lock = threading.Lock()
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """Base class: a named metric family with optional labels"""
+    kind = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+    
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+    
+    def render(self, items: Optional[List] = None) -> List[str]:
+        """Text lines for this process's values, or for merged snapshot items"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples(self.snapshot() if items is None else items))
+        return lines
+    
+    def snapshot(self) -> List:
+        """Current values as JSON-friendly [label values, value] pairs"""
+        raise NotImplementedError
+    
+    def merge(self, left, right):
+        """Combine one series' values from two processes"""
+        return left + right
+    
+    def _samples(self, items: List) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, tuple(k))} {_format_value(v)}" for k, v in items]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    kind = "counter"
+    
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def snapshot(self) -> List:
+        with self._lock:
+            return [[list(k), v] for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    """
+    Value that can go up and down, set directly or read from a callback at scrape time
+    Across processes the values are summed (aggregate="sum", e.g. queue
+    depth) or the largest is kept (aggregate="max", e.g. shared state)
+    """
+    kind = "gauge"
+    
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (),
+                 callback: Optional[Callable[[], float]] = None, aggregate: str = "max"):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback = callback
+        self.aggregate = aggregate
+    
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+    
+    def set_function(self, callback: Callable[[], float]):
+        """Compute the (unlabelled) value when scraped"""
+        self._callback = callback
+    
+    def snapshot(self) -> List:
+        if self._callback is not None:
+            try:
+                return [[[], self._callback()]]
+            except Exception:
+                return []
+        with self._lock:
+            return [[list(k), v] for k, v in self._values.items()]
+    
+    def merge(self, left, right):
+        return left + right if self.aggregate == "sum" else max(left, right)
+
+
+class CounterFunction(_Metric):
+    """
+    Counter whose labelled values are read from a callback at scrape time
+    Used for counters kept elsewhere (e.g. cache hit/miss stats)
+    """
+    kind = "counter"
+    
+    def __init__(self, name: str, documentation: str, labels: Iterable[str],
+                 callback: Callable[[], List[Tuple[Dict, float]]]):
+        super().__init__(name, documentation, labels)
+        self._callback = callback
+    
+    def snapshot(self) -> List:
+        try:
+            items = self._callback()
+        except Exception:
+            return []
+        return [[list(self._key(l)), v] for l, v in items]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+    kind = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: Dict[Tuple[str, ...], List] = {}
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+    
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of a block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+    
+    def snapshot(self) -> List:
+        with self._lock:
+            return [[list(k), [list(s[0]), s[1], s[2]]] for k, s in self._series.items()]
+    
+    def merge(self, left, right):
+        return [[a + b for a, b in zip(left[0], right[0])], left[1] + right[1], left[2] + right[2]]
+    
+    def _samples(self, items: List) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in items:
+            key = tuple(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render() -> str:
+    """Render every registered metric in the Prometheus text exposition format"""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def write_snapshot(directory: str):
+    """Save this process's values as <directory>/<pid>.json (atomically)"""
+    with _registry_lock:
+        metrics = list(_registry)
+    data = {metric.name: metric.snapshot() for metric in metrics}
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+
+def retire_snapshot(directory: str, pid: int):
+    """
+    Keep an exited process's counters and histograms (their totals would
+    otherwise drop) but stop counting its gauges
+    """
+    path = os.path.join(directory, f"{pid}.json")
+    if os.path.exists(path):
+        os.replace(path, os.path.join(directory, f"dead-{pid}.json"))
+
+
+def render_directory(directory: str) -> str:
+    """Render the merged snapshots of every server process, this one's fresh"""
+    write_snapshot(directory)
+    with _registry_lock:
+        metrics = list(_registry)
+    merged: Dict[str, Dict[Tuple[str, ...], object]] = {metric.name: {} for metric in metrics}
+    kinds = {metric.name: metric for metric in metrics}
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        retired = os.path.basename(path).startswith("dead-")
+        for name, items in data.items():
+            metric = kinds.get(name)
+            if metric is None or (retired and isinstance(metric, Gauge)):
+                continue
+            series = merged[name]
+            for key, value in items:
+                key = tuple(key)
+                series[key] = metric.merge(series[key], value) if key in series else value
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render([[k, v] for k, v in merged[metric.name].items()]))
+    return "\n".join(lines) + "\n"
+
+
+def flush_periodically(directory: str, interval: float):
+    """Background thread writing this process's snapshot every interval seconds"""
+    def flush():
+        while True:
+            try:
+                write_snapshot(directory)
+            except OSError as e:
+                print(f"Could not write metrics snapshot: {e}")
+            time.sleep(interval)
+    
+    threading.Thread(target=flush, name="verba-metrics-flush", daemon=True).start()
+
+
+# Pipeline metrics
+STAGE_SECONDS = Histogram(
+    "verba_stage_duration_seconds",
+    "Wall time of each pipeline stage",
+    labels=("stage",)  # upload, decode, preprocess, language_detection, inference, summarization, db_write
+)
+REALTIME_FACTOR = Histogram(
+    "verba_transcription_realtime_factor",
+    "Audio seconds transcribed per wall-clock second",
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128)
+)
+AUDIO_SECONDS = Counter("verba_audio_seconds_total", "Seconds of audio transcribed")
+MODEL_LOAD_SECONDS = Gauge("verba_model_load_seconds", "Time taken to load the Whisper model", labels=("model",))
+QUEUE_DEPTH = Gauge("verba_job_queue_depth", "Jobs waiting for a transcription worker", aggregate="sum")
+JOBS_RUNNING = Gauge("verba_jobs_running", "Jobs currently running", aggregate="sum")
+JOBS_TOTAL = Counter("verba_jobs_total", "Finished jobs by outcome", labels=("kind", "status"))
+JOBS_COALESCED = Counter(
+    "verba_jobs_coalesced_total",
+    "Requests attached to an identical in-flight job instead of starting a new one",
+    labels=("kind",)
+)
+PROFILE_CHOICES = Counter(
+    "verba_transcription_profile_total",
+    "Jobs started per transcription profile (accurate, fast, fallback)",
+    labels=("profile",)
+)
+GROUP_COMMIT_ROWS = Histogram(
+    "verba_db_group_commit_rows",
+    "Session inserts committed per group-commit transaction",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+SESSIONS_PURGED = Counter(
+    "verba_sessions_purged_total",
+    "Sessions deleted by retention, by rule (age, count, size)",
+    labels=("reason",)
+)
+DB_BYTES = Gauge("verba_db_bytes", "Session database size at the last retention pass", labels=("kind",))
+SQLITE_QUERY_SECONDS = Histogram(
+    "verba_sqlite_query_duration_seconds",
+    "SQLite statement latency",
+    labels=("operation",),
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+)
+
+
+def stage(name: str):
+    """Time a pipeline stage: `with metrics.stage("summarization"): ...`"""
+    return STAGE_SECONDS.time(stage=name)
@@ -0,0 +1,66 @@
+"""
+Load-adaptive choice of transcription profile
+A profile is a Whisper model size plus decoding options. Under queue
+pressure new jobs move to greedy decoding, then to FALLBACK_MODEL_SIZE, so
+the backlog drains within LATENCY_SLO_SECONDS; off-peak they use the
+configured model with beam search. The profile a session was transcribed
+with is stored on it (Session.model) so degraded sessions can be refined
+later (see pipeline.refine_when_idle).
+"""
+from typing import Dict
+
+import settings
+
+# Most accurate first
+PROFILES: Dict[str, Dict] = {
+    "accurate": {"model": settings.WHISPER_MODEL_SIZE, "beam_size": 5, "best_of": 5},
+    "fast": {"model": settings.WHISPER_MODEL_SIZE, "beam_size": 1, "best_of": 1},
+    "fallback": {"model": settings.FALLBACK_MODEL_SIZE, "beam_size": 1, "best_of": 1}
+}
+DEFAULT_PROFILE = "accurate"
+
+# Rough relative decoding cost per model size (parameter count ratios)
+MODEL_COST = {"tiny": 1.0, "base": 2.0, "small": 6.0, "medium": 20.0, "large": 40.0}
+# Greedy decoding vs beam search with beam_size=5
+GREEDY_SPEEDUP = 1.8
+
+
+def speedup(profile: str) -> float:
+    """Estimated speed of a profile relative to the accurate profile"""
+    options = PROFILES[profile]
+    base = PROFILES[DEFAULT_PROFILE]
+    ratio = _model_cost(base["model"]) / _model_cost(options["model"])
+    if options["beam_size"] == 1 and base["beam_size"] > 1:
+        ratio *= GREEDY_SPEEDUP
+    return ratio
+
+
+def label(profile: str) -> str:
+    """Model name recorded on sessions, e.g. "base" or "tiny-greedy\""""
+    options = PROFILES[profile]
+    return options["model"] + ("-greedy" if options["beam_size"] == 1 else "")
+
+
+def choose_profile(drain_seconds: float) -> str:
+    """
+    Most accurate profile that would finish the current backlog within
+    LATENCY_SLO_SECONDS, or the fastest one if none would
+    
+    Args:
+        drain_seconds: Estimated seconds to finish every queued and running
+                       job with the accurate profile (JobManager.drain_seconds)
+    """
+    if not settings.ADAPTIVE_MODEL:
+        return DEFAULT_PROFILE
+    for profile in PROFILES:
+        if drain_seconds / speedup(profile) <= settings.LATENCY_SLO_SECONDS:
+            return profile
+    return profile
+
+
+def _model_cost(model: str) -> float:
+    # "large-v3", "base.en", "distil-small.en" etc. cost as their family
+    for name, cost in MODEL_COST.items():
+        if name in model:
+            return cost
+    return MODEL_COST["base"]
@@ -0,0 +1,550 @@
+"""
+Server-side processing pipeline: transcribe -> summarize -> save session
+Runs in one place so the client uploads audio once instead of sending
+the transcript back for summarization
+"""
+import hashlib
+import importlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import metrics
+import model_policy
+import settings
+from jobs import job_manager, JobCancelled
+from transcriber import iter_segments, get_model, STREAM_DECODE_AVAILABLE, PROMPT_CHARS
+from summarizer import (summarize_transcript, summarize_window, summarize_sentences, resolve_options,
+                        SentenceCollector, WindowBuilder)
+from storage import storage
+
+
+def process_audio(audio_path: str, preprocess: bool = True, save_session: bool = True,
+                  engine: Optional[str] = None, mode: Optional[str] = None,
+                  progress: Optional[Dict] = None,
+                  cancel: Optional[threading.Event] = None,
+                  resume: Optional[Dict] = None,
+                  on_checkpoint: Optional[Callable[[List[Dict], Dict], None]] = None,
+                  profile: str = model_policy.DEFAULT_PROFILE) -> Dict:
+    """
+    Transcribe, summarize and (optionally) save a recording
+    
+    Summarization overlaps with decoding on a side thread: in hierarchical
+    mode every time window is summarized as soon as transcription moves past
+    it; in flat mode each segment's sentences are cleaned and split as they
+    arrive. Only ranking (and the last window) is left when decoding finishes.
+    
+    Args:
+        audio_path: Path to audio file
+        preprocess: Whether to preprocess audio before transcription
+        save_session: Store the result as a session
+        engine, mode: Summarizer options (see summarizer.summarize_transcript)
+        progress: Optional dict updated with decoded/total seconds while running
+        cancel: Optional event; when set, stops between segments
+                (raises transcriber.TranscriptionCancelled)
+        resume: Checkpoint to continue from ({"segments", "language"})
+        on_checkpoint: Called as on_checkpoint(segments, progress) at most every
+                       CHECKPOINT_SECONDS while decoding
+        profile: Transcription profile (see model_policy)
+    
+    Returns:
+        Dict with transcript, segments, summary, session_id (None if not saved)
+        and the model label recorded on the session
+    """
+    engine, mode = resolve_options(engine, mode)
+    progress = progress if progress is not None else {}
+    
+    def on_info(info):
+        progress["duration"] = round(info.duration, 2)
+        progress["language"] = info.language
+    
+    def on_trim(seconds):
+        progress["silence_skipped"] = seconds
+    
+    segments = list(resume["segments"]) if resume else []
+    builder = WindowBuilder() if mode == "hierarchical" else None
+    collector = SentenceCollector() if mode == "flat" else None
+    collecting = []
+    
+    # A resumed job continues after its last saved segment, with the end of
+    # the saved text as decoder context
+    start_at = segments[-1]["end"] if segments else 0.0
+    prompt = " ".join(s["text"] for s in segments)[-PROMPT_CHARS:] or None
+    language = resume.get("language") if resume else None
+    if segments:
+        progress["resumed_from"] = round(start_at, 2)
+        progress["decoded"] = round(start_at, 2)
+        for segment in segments:
+            if builder:
+                builder.add(segment)
+            if collector:
+                collector.add(segment["text"])
+    
+    last_checkpoint = time.monotonic()
+    with ThreadPoolExecutor(max_workers=1) as prefetch:
+        for segment in iter_segments(audio_path, preprocess, on_info=on_info, cancel=cancel, on_trim=on_trim,
+                                     start_at=start_at, prompt=prompt, language=language, profile=profile):
+            segments.append(segment)
+            progress["decoded"] = round(segment["end"], 2)
+            
+            if builder:
+                window = builder.add(segment)
+                if window:
+                    # Warm the window cache while decoding continues
+                    prefetch.submit(summarize_window, window["text"], engine)
+            if collector:
+                # Runs in submission order: the executor has one thread
+                collecting.append(prefetch.submit(collector.add, segment["text"]))
+            
+            if on_checkpoint and time.monotonic() - last_checkpoint >= settings.CHECKPOINT_SECONDS:
+                on_checkpoint(segments, progress)
+                last_checkpoint = time.monotonic()
+    
+    transcript = " ".join(s["text"] for s in segments if s["text"])
+    model = model_policy.label(profile)
+    
+    if not transcript.strip():
+        return {
+            "transcript": "",
+            "segments": [],
+            "summary": None,
+            "session_id": None,
+            "model": model,
+            "silence_skipped": progress.get("silence_skipped"),
+            "warning": "No speech detected in audio"
+        }
+    
+    if collector:
+        for future in collecting:
+            future.result()
+        with metrics.stage("summarization"):
+            summary = summarize_sentences(collector.finish(), engine)
+    else:
+        summary = summarize_transcript(transcript, engine=engine, mode=mode, segments=segments)
+    
+    session_id = None
+    if save_session:
+        try:
+            session_id = storage.create_session(transcript, summary, model=model)
+        except Exception as e:
+            # Don't lose the transcript if storage fails
+            print(f"Failed to save session: {e}")
+    
+    return {
+        "transcript": transcript,
+        "segments": segments,
+        "summary": summary,
+        "session_id": session_id,
+        "model": model,
+        "silence_skipped": progress.get("silence_skipped")
+    }
+
+
+def run_process_job(job, audio_path: str, **options) -> Dict:
+    """
+    Job entry point for process_audio (see jobs.JobManager.submit)
+    Reports progress on the job and stops early when the job is cancelled
+    """
+    profile = choose_profile(job)
+    result = process_audio(audio_path, progress=job.progress, cancel=job.cancel_event,
+                           profile=profile, **options)
+    result["refinement_id"] = _schedule_refinement(job, result, profile, audio_path, options)
+    return result
+
+
+def choose_profile(job) -> str:
+    """
+    Pick a starting job's transcription profile and record it on the job:
+    DRAFT_PROFILE in two-pass mode, otherwise by the current backlog
+    (see model_policy.choose_profile)
+    """
+    if settings.TWO_PASS:
+        profile = settings.DRAFT_PROFILE
+    else:
+        profile = model_policy.choose_profile(job_manager.drain_seconds())
+    job.speedup = model_policy.speedup(profile)
+    job.progress["model"] = model_policy.label(profile)
+    metrics.PROFILE_CHOICES.inc(profile=profile)
+    if profile != model_policy.DEFAULT_PROFILE and not settings.TWO_PASS:
+        print(f"Backlog over the latency SLO; job {job.id} uses the {profile} profile ({job.progress['model']})")
+    return profile
+
+
+def submit_checkpointed_job(audio_path: str, cost: Optional[float] = None, key=None,
+                            move: bool = True, **options):
+    """
+    Queue a processing job that survives restarts: the upload is moved to
+    JOB_SPOOL_DIR and the job recorded in the database, and decoded
+    segments are checkpointed while it runs (see resume_jobs)
+    move=False leaves audio that is already kept on disk (a resumable
+    upload, possibly still arriving) where it is
+    Returns the job ID; an identical job (same key) in flight in any server
+    worker is shared instead
+    """
+    job_id = str(uuid.uuid4())
+    spooled = audio_path
+    if move:
+        os.makedirs(settings.JOB_SPOOL_DIR, exist_ok=True)
+        spooled = os.path.join(settings.JOB_SPOOL_DIR, job_id + Path(audio_path).suffix)
+        shutil.move(audio_path, spooled)
+    shared_id = storage.save_job(job_id, "process", spooled, options, cost, key=_key_text(key))
+    if shared_id != job_id:
+        metrics.JOBS_COALESCED.inc(kind="process")
+        remove_file(spooled)
+        return shared_id
+    return _submit_checkpointed(job_id, spooled, cost, None, None, options).id
+
+
+def submit_transcribe_job(audio_path: str, cost: Optional[float] = None, key=None,
+                          preprocess: bool = True) -> str:
+    """
+    Queue transcription of audio kept on disk (a finalized upload)
+    Recorded in the database like checkpointed jobs, so every server worker
+    can report on it, cancel it or share it, but not resumed after a restart
+    Returns the job ID
+    """
+    job_id = str(uuid.uuid4())
+    shared_id = storage.save_job(job_id, "transcribe", audio_path, {"preprocess": preprocess}, cost,
+                                 key=_key_text(key))
+    if shared_id != job_id:
+        metrics.JOBS_COALESCED.inc(kind="transcribe")
+        remove_file(audio_path)
+        return shared_id
+    
+    def release():
+        _record_outcome(job_id)
+        remove_file(audio_path)
+    
+    return job_manager.submit(
+        "transcribe",
+        run_shared_transcribe_job,
+        audio_path,
+        preprocess=preprocess,
+        cleanup=release,
+        cost=cost,
+        job_id=job_id
+    ).id
+
+
+def run_shared_transcribe_job(job, audio_path: str, preprocess: bool = True) -> Dict:
+    """Job entry point for run_transcribe_job recorded by submit_transcribe_job"""
+    _start_shared(job)
+    return run_transcribe_job(job, audio_path, preprocess)
+
+
+def _key_text(key) -> Optional[str]:
+    """Single-flight key as stored in the database"""
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest() if key is not None else None
+
+
+def _start_shared(job):
+    """Mark a recorded job running, unless a server worker asked to cancel it while queued"""
+    if not storage.start_job(job.id):
+        job_manager.cancel(job.id)
+        raise JobCancelled("Job cancelled")
+
+
+def _record_outcome(job_id: str):
+    """Save a finished job's status and result where every server worker can read them"""
+    job = job_manager.get(job_id)
+    try:
+        if job is None or not job.finished:
+            storage.delete_job(job_id)
+            return
+        storage.finish_job(job_id, job.status, job.result if job.status == "completed" else None, job.error)
+    except Exception as e:
+        print(f"Could not record the outcome of job {job_id}: {e}")
+
+
+def resume_jobs() -> int:
+    """
+    Requeue checkpointed jobs left unfinished by a previous server process
+    (or a worker that died), keeping their job IDs
+    Returns the number of jobs resumed
+    """
+    for record in storage.claim_jobs("transcribe"):
+        # Not checkpointed, so there is nothing to resume from
+        storage.finish_job(record["id"], "failed", error="Server restarted before the job finished")
+        remove_file(record["audio_path"])
+    
+    resumed = 0
+    for record in storage.claim_jobs("process"):
+        if record["status"] == "cancelling":
+            storage.finish_job(record["id"], "cancelled")
+            remove_file(record["audio_path"])
+            continue
+        if not os.path.exists(record["audio_path"]):
+            print(f"Dropping checkpointed job {record['id']}: audio is gone")
+            storage.finish_job(record["id"], "failed", error="Audio is gone")
+            continue
+        segments = record["segments"]
+        print(f"Resuming job {record['id']} from {segments[-1]['end'] if segments else 0:.0f}s")
+        _submit_checkpointed(record["id"], record["audio_path"], record["cost"], None,
+                             {"segments": segments, "language": record["language"]},
+                             record["options"])
+        resumed += 1
+    return resumed
+
+
+def _submit_checkpointed(job_id: str, audio_path: str, cost: Optional[float], key,
+                         resume: Optional[Dict], options: Dict):
+    def release():
+        # Finished in any state: keep the outcome, the spooled audio is done with
+        _record_outcome(job_id)
+        remove_file(audio_path)
+    
+    return job_manager.submit(
+        "process",
+        run_checkpointed_job,
+        audio_path,
+        resume=resume,
+        cleanup=release,
+        key=key,
+        cost=cost,
+        job_id=job_id,
+        **options
+    )
+
+
+def run_checkpointed_job(job, audio_path: str, resume: Optional[Dict] = None, **options) -> Dict:
+    """
+    Job entry point for process_audio that saves its segments as it goes
+    and stops at a checkpoint once any server worker asked to cancel it
+    """
+    def on_checkpoint(segments, progress):
+        try:
+            storage.checkpoint_job(job.id, segments, progress.get("language"))
+            if storage.cancel_requested(job.id):
+                job_manager.cancel(job.id)
+        except Exception as e:
+            # A missed checkpoint only costs re-decoding after a restart
+            print(f"Checkpoint failed for job {job.id}: {e}")
+    
+    _start_shared(job)
+    profile = choose_profile(job)
+    result = process_audio(audio_path, progress=job.progress, cancel=job.cancel_event,
+                           resume=resume, on_checkpoint=on_checkpoint, profile=profile, **options)
+    result["refinement_id"] = _schedule_refinement(job, result, profile, audio_path, options)
+    return result
+
+
+def _schedule_refinement(job, result: Dict, profile: str, audio_path: str, options: Dict) -> Optional[str]:
+    """
+    Keep the audio of a recording transcribed with a degraded profile (a
+    two-pass draft, or a job degraded under load) so the refinement worker
+    can redo it with the accurate profile
+    Returns the refinement's job ID, None if nothing was scheduled
+    """
+    if profile == model_policy.DEFAULT_PROFILE or not result.get("transcript"):
+        return None
+    if not settings.TWO_PASS and not (settings.REFINE_WHEN_IDLE and result.get("session_id")):
+        return None
+    
+    size = os.path.getsize(audio_path)
+    if spool_bytes() + size > settings.REFINE_SPOOL_MAX_BYTES:
+        print(f"Refinement spool is full; keeping the draft of job {job.id}")
+        return None
+    
+    try:
+        refine_id = str(uuid.uuid4())
+        os.makedirs(settings.JOB_SPOOL_DIR, exist_ok=True)
+        spooled = os.path.join(settings.JOB_SPOOL_DIR, refine_id + Path(audio_path).suffix)
+        # The job's own cleanup then finds nothing left to delete
+        shutil.move(audio_path, spooled)
+        refine_options = {k: v for k, v in options.items() if k != "save_session"}
+        storage.save_job(refine_id, "refine", spooled,
+                         {"session_id": result.get("session_id"), **refine_options}, job.cost)
+    except Exception as e:
+        print(f"Could not keep audio for refinement: {e}")
+        return None
+    
+    _refine_wakeup.set()
+    return refine_id
+
+
+def spool_bytes() -> int:
+    """Disk used by spooled audio (queued jobs and pending refinements)"""
+    try:
+        with os.scandir(settings.JOB_SPOOL_DIR) as entries:
+            return sum(entry.stat().st_size for entry in entries if entry.is_file())
+    except FileNotFoundError:
+        return 0
+
+
+def attach_refinement(refinement_id: str, session_id: str) -> bool:
+    """
+    Link a saved session to a pending refinement (a two-pass draft from
+    /api/transcribe saved later through /api/summarize), so the refined
+    transcript replaces the draft in that session
+    Returns False if the refinement is unknown
+    """
+    record = storage.get_job(refinement_id)
+    if record and record["kind"] == "refine":
+        storage.update_job_options(refinement_id, {**record["options"], "session_id": session_id})
+    
+    # Already refined (possibly while the link was being written)
+    job = job_manager.get(refinement_id)
+    if job and job.kind == "refine" and job.status == "completed" and job.result:
+        if job.result.get("session_id") != session_id and job.result["transcript"]:
+            storage.update_session(session_id, job.result["transcript"], job.result["summary"],
+                                   model=job.result["model"])
+        return True
+    return record is not None
+
+
+def discard_refinement(refinement_id: str) -> bool:
+    """Drop a pending refinement and its audio; False if there is none"""
+    record = storage.get_job(refinement_id)
+    if not record or record["kind"] != "refine":
+        return False
+    job_manager.cancel(refinement_id)
+    storage.delete_job(refinement_id)
+    remove_file(record["audio_path"])
+    return True
+
+
+# Set when a refinement is scheduled, so the worker doesn't wait out its poll interval
+_refine_wakeup = threading.Event()
+
+
+def refine_when_idle():
+    """
+    Background refinement worker (TWO_PASS / REFINE_WHEN_IDLE): while no
+    other job is queued or running, re-transcribe drafts and degraded
+    sessions with the accurate profile. A refinement gives way as soon as
+    other work is queued and later resumes from its last checkpoint.
+    """
+    while True:
+        _refine_wakeup.wait(settings.REFINE_IDLE_SECONDS)
+        _refine_wakeup.clear()
+        try:
+            while _refine_next():
+                pass
+        except Exception as e:
+            print(f"Refinement failed: {e}")
+
+
+def _refine_next() -> bool:
+    """Run one pending refinement if the server is idle; True if one finished"""
+    if job_manager.queue_depth() or job_manager.running():
+        return False
+    records = storage.claim_jobs("refine")
+    if not records:
+        return False
+    
+    record = records[0]
+    options = dict(record["options"])
+    options.pop("session_id", None)
+    resume = {"segments": record["segments"], "language": record["language"]} if record["segments"] else None
+    job = job_manager.submit("refine", run_refine_job, record["audio_path"], resume=resume,
+                             cost=record["cost"], job_id=record["id"], **options)
+    while not job.finished:
+        # Other work queued (besides the refinement itself)
+        if job_manager.queue_depth() > (job.status == "queued"):
+            job_manager.cancel(job.id)
+        time.sleep(0.5)
+    
+    if job.status == "cancelled":
+        return False
+    storage.delete_job(record["id"])
+    remove_file(record["audio_path"])
+    return True
+
+
+def run_refine_job(job, audio_path: str, resume: Optional[Dict] = None, **options) -> Optional[Dict]:
+    """
+    Job entry point: re-transcribe a recording with the accurate profile and
+    replace the linked session's transcript and summary
+    Segments are checkpointed, so a preempted refinement resumes where it stopped
+    """
+    def on_checkpoint(segments, progress):
+        try:
+            storage.checkpoint_job(job.id, segments, progress.get("language"))
+        except Exception as e:
+            print(f"Checkpoint failed for job {job.id}: {e}")
+    
+    result = process_audio(audio_path, save_session=False, progress=job.progress,
+                           cancel=job.cancel_event, resume=resume,
+                           on_checkpoint=on_checkpoint, **options)
+    
+    # Read the link now: a draft may have been saved as a session meanwhile
+    record = storage.get_job(job.id)
+    session_id = record["options"].get("session_id") if record else None
+    if session_id and result["transcript"]:
+        if storage.update_session(session_id, result["transcript"], result["summary"], model=result["model"]):
+            print(f"Refined session {session_id} with {result['model']}")
+    
+    return {
+        "transcript": result["transcript"],
+        "summary": result["summary"],
+        "session_id": session_id,
+        "model": result["model"]
+    }
+
+
+def run_transcribe_job(job, audio_path: str, preprocess: bool = True) -> Dict:
+    """
+    Job entry point for transcription only (backs /api/transcribe)
+    """
+    def on_info(info):
+        job.progress["duration"] = round(info.duration, 2)
+        job.progress["language"] = info.language
+    
+    def on_trim(seconds):
+        job.progress["silence_skipped"] = seconds
+    
+    profile = choose_profile(job)
+    texts = []
+    for segment in iter_segments(audio_path, preprocess, on_info=on_info,
+                                 cancel=job.cancel_event, on_trim=on_trim, profile=profile):
+        texts.append(segment["text"])
+        job.progress["decoded"] = round(segment["end"], 2)
+    
+    result = {
+        "transcript": " ".join(t for t in texts if t).strip(),
+        "model": model_policy.label(profile),
+        "silence_skipped": job.progress.get("silence_skipped")
+    }
+    result["refinement_id"] = _schedule_refinement(job, result, profile, audio_path, {"preprocess": preprocess})
+    return result
+
+
+def remove_file(path: str):
+    """Delete an uploaded temp file; used as the job cleanup callback"""
+    if os.path.exists(path):
+        try:
+            os.unlink(path)
+        except OSError as e:
+            print(f"Could not delete temp file: {e}")
+
+
+def warm_up(state: Dict):
+    """
+    Pay the one-off startup costs in the background: open the database,
+    import the audio/numeric libraries and load the Whisper model
+    Per-step seconds are recorded in state["steps"]; state["status"] goes
+    running -> ready (or failed)
+    """
+    state["status"] = "running"
+    modules = ["numpy", "av"] if STREAM_DECODE_AVAILABLE else []
+    if settings.SUMMARIZER_ENGINE == "textrank":
+        modules.append("scipy.sparse")
+    steps = [("storage", lambda: storage.engine)]
+    steps += [(f"import {name}", lambda name=name: importlib.import_module(name)) for name in modules]
+    steps.append(("model", get_model))
+    
+    try:
+        for name, step in steps:
+            started = time.perf_counter()
+            step()
+            state["steps"][name] = round(time.perf_counter() - started, 3)
+        state["status"] = "ready"
+    except Exception as e:
+        print(f"Warm-up failed: {e}")
+        state["status"] = "failed"
+        state["error"] = str(e)
@@ -0,0 +1,180 @@
+"""
+Fast JSON responses and response compression
+- orjson (optional) serializes several times faster than the stdlib encoder
+- RawJSON embeds already-serialized JSON (a session's stored summary_json)
+  as-is, skipping a json.loads / json.dumps round trip
+- CompressionMiddleware gzips large bodies, or uses brotli when it is
+  installed and the client accepts it
+"""
+import importlib.util
+import json
+import zlib
+from typing import Any, Callable, Optional, Tuple, Union
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse as StarletteJSONResponse
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# brotli is imported when the first response is compressed with it
+BROTLI_AVAILABLE = importlib.util.find_spec("brotli") is not None
+
+# Stands in for RawJSON values until they are spliced into the output
+_RAW_MARKER = "\u0000verba-raw-json\u0000"
+
+# Already compressed (or streamed event by event) content is sent as-is
+UNCOMPRESSED_TYPES = ("text/event-stream", "application/zip", "application/gzip", "audio/", "image/", "video/")
+
+
+class RawJSON:
+    """Serialized JSON (str or UTF-8 bytes) that dumps() inserts verbatim"""
+    __slots__ = ("text",)
+    
+    def __init__(self, text: Union[str, bytes]):
+        self.text = text
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Serialize to compact UTF-8 JSON, with orjson when available
+    RawJSON values are serialized as placeholders and then replaced by their text
+    """
+    raw = []
+    
+    def default(value):
+        if isinstance(value, RawJSON):
+            raw.append(value.text)
+            return f"{_RAW_MARKER}{len(raw) - 1}"
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    
+    body = None
+    if ORJSON_AVAILABLE:
+        try:
+            body = orjson.dumps(content, default=default,
+                                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            # e.g. integers beyond 64 bits; the stdlib encoder handles those
+            raw.clear()
+    if body is None:
+        body = json.dumps(content, default=default, ensure_ascii=False, allow_nan=False,
+                          separators=(",", ":")).encode("utf-8")
+    
+    for i, text in enumerate(raw):
+        placeholder = json.dumps(f"{_RAW_MARKER}{i}").encode("utf-8")
+        body = body.replace(placeholder, text.encode("utf-8") if isinstance(text, str) else text, 1)
+    return body
+
+
+class JSONResponse(StarletteJSONResponse):
+    """Drop-in for fastapi.responses.JSONResponse that renders with dumps()"""
+    
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _gzip(level: int) -> Tuple[Callable[[bytes], bytes], Callable[[], bytes]]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress, compressor.flush
+
+
+def _brotli(quality: int) -> Tuple[Callable[[bytes], bytes], Callable[[], bytes]]:
+    import brotli
+    compressor = brotli.Compressor(quality=quality)
+    return compressor.process, compressor.finish
+
+
+class CompressionMiddleware:
+    """
+    Compress response bodies of at least minimum_size bytes (streamed
+    bodies always) with brotli or gzip, per the request's Accept-Encoding
+    """
+    
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+    
+    async def __call__(self, scope, receive, send):
+        encoding = None
+        if scope["type"] == "http":
+            encoding = self._choose(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponse(self, encoding, send).run(scope, receive)
+    
+    def _choose(self, accept_encoding: str) -> Optional[str]:
+        accepted = set()
+        for part in accept_encoding.lower().split(","):
+            name, _, params = part.partition(";")
+            if params.replace(" ", "") not in ("q=0", "q=0.0"):
+                accepted.add(name.strip())
+        if BROTLI_AVAILABLE and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+    
+    def encoder(self, encoding: str):
+        if encoding == "br":
+            return _brotli(self.brotli_quality)
+        return _gzip(self.gzip_level)
+
+
+class _CompressedResponse:
+    """Rewrites one response's messages; decides on its first body chunk"""
+    
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start = None
+        self.compress = None
+        self.finish = None
+        self.passthrough = False
+    
+    async def run(self, scope, receive):
+        await self.middleware.app(scope, receive, self.send_compressed)
+    
+    async def send_compressed(self, message):
+        if message["type"] == "http.response.start":
+            # Held back until the first body chunk shows whether to compress
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+        
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=start["headers"])
+            content_type = headers.get("content-type", "")
+            if ("content-encoding" in headers
+                    or content_type.startswith(UNCOMPRESSED_TYPES)
+                    or (not more_body and len(body) < self.middleware.minimum_size)):
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            
+            self.compress, self.finish = self.middleware.encoder(self.encoding)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            body = self.compress(body) + (b"" if more_body else self.finish())
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(body))
+            await self.send(start)
+        else:
+            body = self.compress(body) + (b"" if more_body else self.finish())
+        
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
@@ -0,0 +1,162 @@
+"""
+Retention: keeps the session database from growing forever
+A background task (retention_loop) deletes sessions older than
+RETENTION_MAX_AGE_DAYS, beyond the newest RETENTION_MAX_SESSIONS, and then
+the oldest ones while session data exceeds RETENTION_MAX_DB_BYTES. Each batch
+of RETENTION_BATCH_SIZE is its own short transaction, so requests keep
+writing in between. The database uses auto_vacuum=INCREMENTAL, and freed
+pages are returned to the filesystem VACUUM_PAGES_PER_STEP at a time instead
+of by a full VACUUM that would lock it for minutes.
+
+Run `python retention.py --convert` once (server stopped) to switch a large
+database created before incremental vacuum; `--once` runs a single pass.
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from typing import Dict
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    # Windows: no fork-based workers there, so no other process to defer to
+    FCNTL_AVAILABLE = False
+
+import metrics
+import settings
+from storage import storage
+
+# Free pages returned per incremental_vacuum step (4 MB with 4 KB pages)
+VACUUM_PAGES_PER_STEP = 1024
+# Pause between batches and vacuum steps, letting other writers in
+PAUSE_SECONDS = 0.05
+
+_lock_file = None
+
+
+def enforce() -> Dict[str, int]:
+    """
+    One retention pass: purge by age, count and size, then vacuum
+    Returns the number of sessions deleted per rule
+    """
+    purged = {"age": 0, "count": 0, "size": 0}
+    batch = settings.RETENTION_BATCH_SIZE
+    
+    if settings.RETENTION_MAX_AGE_DAYS > 0:
+        cutoff = datetime.utcnow() - timedelta(days=settings.RETENTION_MAX_AGE_DAYS)
+        purged["age"] = _purge(lambda: storage.oldest_session_ids(batch, before=cutoff))
+    
+    if settings.RETENTION_MAX_SESSIONS > 0:
+        purged["count"] = _purge(lambda: storage.oldest_session_ids(
+            batch, keep_newest=settings.RETENTION_MAX_SESSIONS))
+    
+    if settings.RETENTION_MAX_DB_BYTES > 0:
+        purged["size"] = _purge(_oversized(batch))
+    
+    for reason, count in purged.items():
+        if count:
+            metrics.SESSIONS_PURGED.inc(count, reason=reason)
+    if any(purged.values()):
+        print(f"Retention purged {purged['age']} by age, {purged['count']} by count, {purged['size']} by size")
+    
+    vacuum()
+    return purged
+
+
+def _purge(next_batch) -> int:
+    deleted = 0
+    while True:
+        ids = next_batch()
+        if not ids:
+            return deleted
+        deleted += storage.delete_sessions(ids)
+        time.sleep(PAUSE_SECONDS)
+
+
+def _oversized(batch):
+    """
+    Batches for the size rule: the oldest sessions while the bytes they own
+    exceed RETENTION_MAX_DB_BYTES. Jobs and other tables aren't counted, as
+    deleting sessions can't shrink them. Without dbstat the whole database is
+    measured, and purging stops once a batch didn't shrink it.
+    """
+    measured = []
+    
+    def next_batch():
+        size = storage.session_bytes()
+        if size is None:
+            size = storage.database_size()["used_bytes"]
+        if size <= settings.RETENTION_MAX_DB_BYTES:
+            return []
+        if measured and size >= measured[-1]:
+            print(f"Retention: {size} bytes left over RETENTION_MAX_DB_BYTES that deleting sessions doesn't free")
+            return []
+        measured.append(size)
+        return storage.oldest_session_ids(batch)
+    
+    return next_batch
+
+
+def vacuum():
+    """Return free pages to the filesystem a step at a time"""
+    free = storage.database_size()["free_bytes"]
+    while free:
+        left = storage.incremental_vacuum(VACUUM_PAGES_PER_STEP)
+        if left >= free:
+            # No progress: auto_vacuum isn't incremental (see --convert)
+            break
+        free = left
+        time.sleep(PAUSE_SECONDS)
+    
+    size = storage.database_size()
+    metrics.DB_BYTES.set(size["used_bytes"], kind="used")
+    metrics.DB_BYTES.set(size["free_bytes"], kind="free")
+
+
+def retention_loop():
+    """
+    Run enforce() every RETENTION_INTERVAL_SECONDS
+    With several server workers only the one holding <db>.retention.lock runs it
+    """
+    while True:
+        try:
+            if _is_leader():
+                enforce()
+        except Exception as e:
+            print(f"Retention pass failed: {e}")
+        time.sleep(settings.RETENTION_INTERVAL_SECONDS)
+
+
+def _is_leader() -> bool:
+    global _lock_file
+    if not FCNTL_AVAILABLE:
+        return True
+    if _lock_file is None:
+        _lock_file = open(f"{storage.db_path}.retention.lock", "a")
+    try:
+        # Kept once taken; released when the process exits
+        fcntl.flock(_lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+def convert():
+    """Switch an existing database to incremental vacuum (one full VACUUM)"""
+    with storage.writing(), storage.engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+        print(f"auto_vacuum is now {conn.exec_driver_sql('PRAGMA auto_vacuum').scalar()} (2 = incremental)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verba session retention")
+    parser.add_argument("--convert", action="store_true",
+                        help="Switch the database to incremental vacuum (full VACUUM; stop the server first)")
+    parser.add_argument("--once", action="store_true", help="Run one retention pass and exit")
+    args = parser.parse_args()
+    if args.convert:
+        convert()
+    if args.once or not args.convert:
+        print(enforce())
@@ -0,0 +1,615 @@
+"""
+Semantic search over session transcripts
+
+Transcripts are cut into segments of about SEMANTIC_SEGMENT_WORDS words and
+embedded with a sentence-transformers model from a local directory
+(SEMANTIC_MODEL) when that package is installed; nothing is downloaded.
+Otherwise hashed word, word pair and character trigram features are used: no
+model to load, but they match shared words and word forms (delay / delayed),
+not paraphrases, so this is closer to fuzzy keyword search.
+
+Vectors are unit length and stored as float16 rows of <db>.vectors, a matrix
+memory-mapped by every server worker; the search_segments table maps rows to
+sessions. A query is scored against every row with one vectorized dot
+product (cosine similarity), or, from SEMANTIC_IVF_MIN_ROWS segments on,
+against the rows of the SEMANTIC_IVF_PROBES k-means clusters (IVF lists)
+nearest to it.
+
+Created and updated sessions are indexed by a background thread (storage
+listener); deleting a session removes its segments in the same transaction,
+and their rows are reused. `python search.py --rebuild` re-embeds everything.
+"""
+import argparse
+import importlib.util
+import os
+import queue
+import re
+import threading
+import zlib
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    # Windows: no fork-based workers there, the thread lock is enough
+    FCNTL_AVAILABLE = False
+
+import metrics
+import settings
+from storage import storage, StorageManager
+from summarizer import STOP_WORDS, WORD_PATTERN
+
+# numpy is imported on first use; sentence-transformers only if installed
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+SENTENCE_TRANSFORMERS_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+
+# Rows converted to float32 and scored at a time (the copy stays in cache)
+SCORE_CHUNK_ROWS = 2048
+# Sessions indexed per batch: one embedding call and one transaction
+INDEX_BATCH_SESSIONS = 32
+# k-means training rows per IVF list, and iterations
+IVF_SAMPLE_PER_LIST = 64
+IVF_ITERATIONS = 10
+# Segments scored per requested result, so one session's many matching
+# segments don't crowd out other sessions
+CANDIDATES_PER_RESULT = 4
+
+TOKEN = re.compile(r"\S+")
+# Queued instead of a session ID: index every session not indexed yet
+_BACKFILL = object()
+
+
+def split_segments(text: str, words: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Cut a transcript into (start, end) character spans of about `words`
+    words, ending at a sentence end where possible (at twice that length if not)
+    """
+    words = words or settings.SEMANTIC_SEGMENT_WORDS
+    spans = []
+    start = None
+    count = 0
+    end = 0
+    for match in TOKEN.finditer(text):
+        if start is None:
+            start, count = match.start(), 0
+        count += 1
+        end = match.end()
+        if count >= 2 * words or (count >= words and text[end - 1] in ".!?"):
+            spans.append((start, end))
+            start = None
+    if start is not None:
+        if spans and count < words // 2:
+            # A short tail joins the previous segment
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((start, end))
+    return spans
+
+
+def _signed_hash(feature: str, dim: int) -> Tuple[int, float]:
+    # crc32 rather than hash(): the same in every process and run
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % dim, (1.0 if h & 0x80000000 else -1.0)
+
+
+def _stem(word: str) -> str:
+    for suffix in ("ing", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+@lru_cache(maxsize=65536)
+def _word_features(word: str, dim: int) -> Tuple[Tuple[int, ...], Tuple[float, ...]]:
+    """The stemmed word (weight 1) and its character trigrams (weight 1 together)"""
+    padded = f"<{word}>"
+    trigrams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+    features = [(_signed_hash(_stem(word), dim), 1.0)]
+    features += [(_signed_hash(f"#{gram}", dim), 1.0 / len(trigrams)) for gram in trigrams]
+    return (tuple(index for (index, _), _ in features),
+            tuple(sign * weight for (_, sign), weight in features))
+
+
+class HashingEmbedder:
+    """Signed feature hashing of words, word pairs and character trigrams"""
+    # Reported by /api/search/semantic: only shared words and word forms match
+    kind = "hashing"
+    
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.name = f"hash-{dim}"
+    
+    def encode(self, texts: List[str]):
+        import numpy as np
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            words = [w for w in WORD_PATTERN.findall(text.lower()) if w not in STOP_WORDS]
+            indexes, weights = [], []
+            for word in words:
+                word_indexes, word_weights = _word_features(word, self.dim)
+                indexes += word_indexes
+                weights += word_weights
+            for pair in zip(words, words[1:]):
+                index, sign = _signed_hash(" ".join(map(_stem, pair)), self.dim)
+                indexes.append(index)
+                weights.append(0.5 * sign)
+            if indexes:
+                vectors[i] = np.bincount(indexes, weights=weights, minlength=self.dim)
+        return _normalize(vectors)
+
+
+class ModelEmbedder:
+    """A sentence-transformers model, run on the CPU"""
+    kind = "model"
+    
+    def __init__(self, model_path: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_path, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"model-{os.path.basename(os.path.normpath(model_path))}"
+    
+    def encode(self, texts: List[str]):
+        import numpy as np
+        vectors = self.model.encode(texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=True)
+        return vectors.astype(np.float32)
+
+
+@lru_cache(maxsize=1)
+def _half_table():
+    """The float32 value of every float16 bit pattern"""
+    import numpy as np
+    return np.arange(65536, dtype=np.uint32).astype(np.uint16).view(np.float16).astype(np.float32)
+
+
+def _to_float32(half):
+    """
+    Convert float16 rows by table lookup: as fast as astype for dense
+    vectors, and several times faster for sparse (hashed) ones
+    """
+    import numpy as np
+    return np.take(_half_table(), half.view(np.uint16))
+
+
+def _dot(vectors, other, rows=None):
+    """vectors (or the given rows of it) @ other, converting a chunk at a time"""
+    import numpy as np
+    count = len(vectors) if rows is None else len(rows)
+    out = np.empty((count,) + other.shape[1:], dtype=np.float32)
+    for start in range(0, count, SCORE_CHUNK_ROWS):
+        stop = min(count, start + SCORE_CHUNK_ROWS)
+        chunk = vectors[start:stop] if rows is None else vectors[rows[start:stop]]
+        out[start:stop] = _to_float32(chunk) @ other
+    return out
+
+
+def _normalize(vectors):
+    import numpy as np
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder():
+    """The configured embedder, loaded on first use"""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                _embedder = _load_embedder()
+    return _embedder
+
+
+def _load_embedder():
+    if not settings.SEMANTIC_MODEL:
+        print("WARNING: No SEMANTIC_MODEL set; semantic search uses hashed word features "
+              "(fuzzy keyword search, no paraphrases). See README_BACKEND.md to set up a local model.")
+    elif not SENTENCE_TRANSFORMERS_AVAILABLE:
+        print("WARNING: SEMANTIC_MODEL is set but sentence-transformers is not installed "
+              "(pip install sentence-transformers). Using hashed word features.")
+    elif not os.path.isdir(settings.SEMANTIC_MODEL):
+        # A model name would make sentence-transformers download it
+        print(f"WARNING: SEMANTIC_MODEL must be a local model directory, not {settings.SEMANTIC_MODEL!r}. "
+              f"Using hashed word features.")
+    else:
+        try:
+            return ModelEmbedder(settings.SEMANTIC_MODEL)
+        except Exception as e:
+            print(f"WARNING: Could not load embedding model {settings.SEMANTIC_MODEL} ({e}). "
+                  f"Using hashed word features.")
+    return HashingEmbedder(settings.SEMANTIC_HASH_DIM)
+
+
+class SemanticIndex:
+    """
+    Segment vectors in a memory-mapped float16 matrix, plus which rows are
+    in use in this process, synced from the search_segments table before
+    each query (only rows newer than the last sync, unless rows were removed)
+    """
+    
+    def __init__(self, manager: StorageManager, embedder=None, ivf_min_rows: Optional[int] = None):
+        self.storage = manager
+        self.path = f"{manager.db_path}.vectors"
+        self._embedder = embedder
+        self.ivf_min_rows = settings.SEMANTIC_IVF_MIN_ROWS if ivf_min_rows is None else ivf_min_rows
+        # (version, epoch) of the index state last synced
+        self._loaded = None
+        self._vectors = None
+        # Per row: whether a segment uses it, and its IVF list (-1 = none)
+        self._live = None
+        self._assign = None
+        self._centroids = None
+        self._ivf_rows = 0
+        self._ivf_building = False
+        self._ivf_touched = []
+        self._init_process_state()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._init_process_state)
+    
+    def _init_process_state(self):
+        """Locks, lock file and indexing thread (recreated in forked workers)"""
+        # Guards the in-memory arrays
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._lock_file = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._ivf_building = False
+    
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            self._embedder = get_embedder()
+        return self._embedder
+    
+    # Queries
+    
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """
+        Sessions with the segments closest to the query, best first
+        Each result has the session ID, creation time, best segment and its score
+        """
+        if not query.strip() or not self.sync():
+            return []
+        vector = self.embedder.encode([query])[0]
+        ranked = self._top_rows(vector, limit * CANDIDATES_PER_RESULT)
+        hits = self.storage.search_hits([row for row, _ in ranked])
+        
+        results = []
+        seen = set()
+        for row, score in ranked:
+            hit = hits.get(row)
+            if hit is None or hit["session_id"] in seen:
+                continue
+            seen.add(hit["session_id"])
+            results.append({**hit, "score": round(score, 4)})
+            if len(results) == limit:
+                break
+        return results
+    
+    def _top_rows(self, vector, k: int) -> List[Tuple[int, float]]:
+        """Up to k (row, score) pairs scoring at least SEMANTIC_MIN_SCORE, best first"""
+        import numpy as np
+        with self._lock:
+            vectors, live, assign, centroids = self._vectors, self._live, self._assign, self._centroids
+        n = min(len(live), len(vectors)) if vectors is not None and live is not None else 0
+        if not n:
+            return []
+        vector = vector.astype(np.float32)
+        
+        if centroids is not None:
+            probes = np.argsort(centroids @ vector)[-settings.SEMANTIC_IVF_PROBES:]
+            # Rows added since training that aren't assigned yet are always scored
+            rows = np.flatnonzero(live[:n] & (np.isin(assign[:n], probes) | (assign[:n] < 0)))
+            scores = _dot(vectors, vector, rows)
+        else:
+            rows = None
+            scores = _dot(vectors[:n], vector)
+            scores[~live[:n]] = -np.inf
+        
+        k = min(k, len(scores))
+        if not k:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        found = rows[top] if rows is not None else top
+        return [(int(row), float(scores[i])) for row, i in zip(found, top)
+                if scores[i] >= settings.SEMANTIC_MIN_SCORE]
+    
+    def stats(self) -> Dict:
+        """Indexed segments, embedder and IVF lists (0 = exhaustive search)"""
+        with self._lock:
+            return {
+                "segments": int(self._live.sum()) if self._live is not None else 0,
+                "embedder": self._embedder.name if self._embedder else None,
+                "ivf_lists": 0 if self._centroids is None else len(self._centroids),
+                "pending": self._queue.qsize()
+            }
+    
+    # Loading index changes
+    
+    def sync(self) -> bool:
+        """
+        Load rows written by any process since the last sync
+        Returns False while there is no index for this embedder yet
+        """
+        import numpy as np
+        state = self.storage.search_index_state()
+        embedder = self.embedder
+        if state is None or state["embedder"] != embedder.name or state["dim"] != embedder.dim:
+            return False
+        
+        with self._lock:
+            if self._loaded == (state["version"], state["epoch"]):
+                return True
+            previous = self._loaded
+            full = previous is None or previous[1] != state["epoch"]
+            changes = self.storage.search_segment_rows(None if full else previous[0])
+            if full:
+                # Rows were removed (or the file replaced): start over
+                self._live = np.zeros(0, dtype=bool)
+                self._vectors = None
+                if self._assign is None:
+                    self._assign = np.zeros(0, dtype=np.int32)
+            
+            changed = np.zeros(0, dtype=np.int64)
+            if changes:
+                rows, versions = np.array(changes, dtype=np.int64).T
+                self._grow(int(rows.max()) + 1)
+                self._live[rows] = True
+                changed = rows if previous is None else rows[versions > previous[0]]
+            self._map(len(self._live), embedder.dim)
+            
+            if self._centroids is not None and len(changed):
+                self._assign[changed] = self._nearest_list(self._vectors, self._centroids, changed)
+            if self._ivf_building:
+                self._ivf_touched.append(changed)
+            self._loaded = (state["version"], state["epoch"])
+        
+        self._update_ivf()
+        return True
+    
+    def _grow(self, rows: int):
+        import numpy as np
+        if rows > len(self._live):
+            self._live = np.concatenate([self._live, np.zeros(rows - len(self._live), dtype=bool)])
+        if rows > len(self._assign):
+            self._assign = np.concatenate([self._assign, np.full(rows - len(self._assign), -1, dtype=np.int32)])
+    
+    def _map(self, rows: int, dim: int):
+        """(Re)map the vector file once it holds rows the mapping doesn't cover"""
+        import numpy as np
+        if not rows or not os.path.exists(self.path):
+            self._vectors = None
+        elif self._vectors is None or len(self._vectors) < rows:
+            file_rows = os.path.getsize(self.path) // (dim * 2)
+            self._vectors = np.memmap(self.path, dtype=np.float16, mode="r", shape=(file_rows, dim))
+    
+    # IVF
+    
+    def _update_ivf(self):
+        """Train IVF lists in the background when the index grows large (again)"""
+        with self._lock:
+            count = int(self._live.sum())
+            if count < self.ivf_min_rows:
+                self._centroids = None
+                return
+            if self._ivf_building or (self._centroids is not None and count < 2 * self._ivf_rows):
+                return
+            self._ivf_building = True
+            self._ivf_touched = []
+        threading.Thread(target=self._build_ivf, name="verba-ivf", daemon=True).start()
+    
+    def _build_ivf(self):
+        """
+        Spherical k-means on a sample of the rows (sqrt(n) lists), then
+        assign every row to its nearest centroid
+        """
+        import numpy as np
+        try:
+            with self._lock:
+                vectors, live = self._vectors, self._live.copy()
+            rows = np.flatnonzero(live[:len(vectors)])
+            lists = min(len(rows), max(16, int(np.sqrt(len(rows)))))
+            rng = np.random.default_rng(0)
+            sample = np.sort(rng.choice(rows, min(len(rows), lists * IVF_SAMPLE_PER_LIST), replace=False))
+            data = _to_float32(vectors[sample])
+            centroids = data[rng.choice(len(data), lists, replace=False)]
+            
+            for _ in range(IVF_ITERATIONS):
+                nearest = np.argmax(data @ centroids.T, axis=1)
+                order = np.argsort(nearest, kind="stable")
+                used = np.unique(nearest)
+                starts = np.searchsorted(nearest[order], used)
+                # Empty lists keep their previous centroid
+                centroids[used] = np.add.reduceat(data[order], starts)
+                centroids = _normalize(centroids)
+            
+            assign = np.full(len(live), -1, dtype=np.int32)
+            assign[rows] = self._nearest_list(vectors, centroids, rows)
+            
+            with self._lock:
+                # Rows written while training are assigned with the new lists
+                touched = [changed for changed in self._ivf_touched if len(changed)]
+                if len(assign) < len(self._assign):
+                    assign = np.concatenate([assign, np.full(len(self._assign) - len(assign), -1, dtype=np.int32)])
+                if touched:
+                    touched = np.unique(np.concatenate(touched))
+                    assign[touched] = self._nearest_list(self._vectors, centroids, touched)
+                self._assign = assign
+                self._centroids = centroids
+                self._ivf_rows = len(rows)
+        except Exception as e:
+            print(f"Semantic index IVF training failed: {e}")
+        finally:
+            with self._lock:
+                self._ivf_building = False
+                self._ivf_touched = []
+    
+    @staticmethod
+    def _nearest_list(vectors, centroids, rows):
+        import numpy as np
+        return np.argmax(_dot(vectors, centroids.T, rows), axis=1).astype(np.int32)
+    
+    # Writing
+    
+    def index_sessions(self, session_ids: List[str], only_missing: bool = False):
+        """
+        (Re)index the transcripts of the given sessions in one batch
+        only_missing: skip sessions that already have segments
+        """
+        with self._exclusive():
+            self._ensure_index()
+            if only_missing:
+                session_ids = self.storage.unindexed_session_ids(session_ids)
+            if not session_ids:
+                return
+            
+            transcripts = self.storage.get_transcripts(session_ids)
+            spans = {session_id: split_segments(transcripts.get(session_id, "")) for session_id in session_ids}
+            texts = [transcripts[session_id][start:end]
+                     for session_id in session_ids for start, end in spans[session_id]]
+            
+            self.sync()
+            rows = self._free_rows(len(texts))
+            if texts:
+                self._write_vectors(rows, self.embedder.encode(texts))
+            
+            segments = {}
+            rows = iter(rows)
+            for session_id in session_ids:
+                segments[session_id] = [(next(rows), start, end) for start, end in spans[session_id]]
+            self.storage.replace_search_segments(segments)
+            self.sync()
+    
+    def backfill(self) -> int:
+        """Index every session that has no segments yet; returns how many were missing"""
+        with self._exclusive():
+            self._ensure_index()
+        missing = self.storage.unindexed_session_ids()
+        for i in range(0, len(missing), INDEX_BATCH_SESSIONS):
+            self.index_sessions(missing[i:i + INDEX_BATCH_SESSIONS], only_missing=True)
+        return len(missing)
+    
+    def rebuild(self) -> int:
+        """Drop the index and embed every session again"""
+        with self._exclusive():
+            self._reset_index()
+        return self.backfill()
+    
+    def _ensure_index(self):
+        """Create the index, or start over if it was built with another embedder"""
+        state = self.storage.search_index_state()
+        embedder = self.embedder
+        if state is not None and state["embedder"] == embedder.name and state["dim"] == embedder.dim:
+            return
+        if state is not None:
+            print(f"Semantic index was built with {state['embedder']}; rebuilding it with {embedder.name}")
+        self._reset_index()
+    
+    def _reset_index(self):
+        with self._lock:
+            self._vectors = None
+            self._loaded = None
+        # Unlinked rather than truncated: other workers may still map it
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.storage.reset_search_index(self.embedder.name, self.embedder.dim)
+    
+    def _free_rows(self, count: int) -> List[int]:
+        """Rows for new segments: free ones first, then past the end"""
+        import numpy as np
+        with self._lock:
+            live = self._live if self._live is not None else np.zeros(0, dtype=bool)
+            free = np.flatnonzero(~live)[:count].tolist()
+            end = len(live)
+        return free + list(range(end, end + count - len(free)))
+    
+    def _write_vectors(self, rows: List[int], vectors):
+        """Written before their rows are committed, so readers never see missing vectors"""
+        import numpy as np
+        data = vectors.astype(np.float16)
+        row_bytes = data.shape[1] * data.itemsize
+        with open(self.path, "r+b" if os.path.exists(self.path) else "w+b") as f:
+            for row, vector in zip(rows, data):
+                f.seek(row * row_bytes)
+                f.write(vector.tobytes())
+    
+    @contextmanager
+    def _exclusive(self):
+        """Serialize index writes across threads and worker processes (<db>.vectors.lock)"""
+        with self._write_lock:
+            if not FCNTL_AVAILABLE:
+                yield
+                return
+            if self._lock_file is None:
+                self._lock_file = open(f"{self.path}.lock", "a")
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+    
+    # Background indexing
+    
+    def on_session_change(self, event: str, session_id: str):
+        """Storage listener: queue created and updated sessions for indexing"""
+        if event in ("created", "updated"):
+            self._submit(session_id)
+    
+    def start_backfill(self):
+        """Queue a backfill of sessions saved while indexing wasn't running"""
+        self._submit(_BACKFILL)
+    
+    def _submit(self, item):
+        self._queue.put(item)
+        if self._thread is None:
+            with self._thread_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="verba-semantic-index", daemon=True)
+                    self._thread.start()
+    
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            while len(items) < INDEX_BATCH_SESSIONS:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with metrics.stage("semantic_index"):
+                    if _BACKFILL in items:
+                        self.backfill()
+                    session_ids = list(dict.fromkeys(item for item in items if item is not _BACKFILL))
+                    if session_ids:
+                        self.index_sessions(session_ids)
+            except Exception as e:
+                print(f"Semantic index update failed: {e}")
+
+
+semantic_index = SemanticIndex(storage)
+
+if settings.SEMANTIC_SEARCH and NUMPY_AVAILABLE:
+    storage.add_listener(semantic_index.on_session_change)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verba semantic search index")
+    parser.add_argument("--rebuild", action="store_true", help="Re-embed every session (e.g. after changing SEMANTIC_MODEL)")
+    parser.add_argument("--query", help="Run a search and print the results")
+    args = parser.parse_args()
+    if args.rebuild:
+        print(f"Indexed {semantic_index.rebuild()} session(s)")
+    else:
+        print(f"Indexed {semantic_index.backfill()} new session(s)")
+    if args.query:
+        for result in semantic_index.search(args.query):
+            print(f"{result['score']:.3f}  {result['session_id']}  {result['snippet'][:100]}")
@@ -0,0 +1,170 @@
+"""
+Verba server entry point
+
+With one worker this is plain `uvicorn.run`. With SERVER_WORKERS > 1 (or
+--workers N) it runs a prefork server:
+- the master binds the listening socket and imports the app once, so the
+  Python modules are shared copy-on-write by every worker
+- one forked inference process loads the Whisper model and transcribes for
+  all workers over a Unix socket (inference.py), so RAM holds one model
+- N forked HTTP workers accept on the shared socket; request handling,
+  JSON encoding and summarization scale with cores instead of sharing a GIL
+- every child saves its metrics to a shared directory that /metrics merges,
+  and job state lives in the database, so any worker can answer for a job
+- the master supervises and restarts children that die
+
+The model itself is not loaded before forking: CTranslate2 runs its replicas
+on native threads, which don't survive fork().
+
+Usage:
+    python server.py --workers 4
+    SERVER_WORKERS=4 python app.py
+"""
+import argparse
+import logging
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+import metrics
+import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("verba.server")
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """Listening socket shared by all workers"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket):
+    """HTTP worker: uvicorn on the inherited socket"""
+    import uvicorn
+    from app import app
+    
+    server = uvicorn.Server(uvicorn.Config(app, log_level="info"))
+    server.run(sockets=[sock])
+
+
+def run_inference(socket_path: str):
+    """Inference process: owns the model and transcribes locally"""
+    import inference
+    
+    settings.INFERENCE_SOCKET = ""
+    inference.serve(socket_path)
+
+
+def _fork(target, *args) -> int:
+    """Fork a child running target(*args); the child never returns"""
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 0
+        try:
+            target(*args)
+        except Exception:
+            logger.exception("Worker crashed")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def serve(workers: int, host: str, port: int):
+    """Run the prefork server until SIGINT/SIGTERM"""
+    sock = bind_socket(host, port)
+    # Code that behaves differently with several workers (e.g. cache checks)
+    # reads SERVER_WORKERS, which --workers may have overridden
+    settings.SERVER_WORKERS = workers
+    os.environ["SERVER_WORKERS"] = str(workers)
+    metrics_dir = tempfile.mkdtemp(prefix=f"verba-metrics-{os.getpid()}-")
+    settings.METRICS_DIR = metrics_dir
+    socket_path = os.path.join(tempfile.gettempdir(), f"verba-inference-{os.getpid()}.sock")
+    
+    # Import everything the workers need once; no threads may be running
+    # in the master when it forks
+    started = time.perf_counter()
+    import app  # noqa: F401
+    logger.info(f"App preloaded in {time.perf_counter() - started:.2f}s")
+    
+    # Workers delegate transcription to the inference process
+    settings.INFERENCE_SOCKET = socket_path
+    
+    children = {_fork(run_inference, socket_path): "inference"}
+    for _ in range(workers):
+        children[_fork(run_worker, sock)] = "http"
+    logger.info(f"Serving on {host}:{port} with {workers} workers and 1 inference process")
+    
+    stopping = False
+    
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        role = children.pop(pid, None)
+        if role is None:
+            continue
+        metrics.retire_snapshot(metrics_dir, pid)
+        if stopping:
+            continue
+        logger.warning(f"{role} process {pid} exited with status {status}, restarting")
+        time.sleep(1)
+        if role == "inference":
+            children[_fork(run_inference, socket_path)] = role
+        else:
+            children[_fork(run_worker, sock)] = role
+    
+    sock.close()
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verba API server")
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS, help="HTTP worker processes")
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    args = parser.parse_args(argv)
+    
+    if args.workers > 1 and not hasattr(os, "fork"):
+        logger.warning("Multiple workers need fork(); running a single process")
+        args.workers = 1
+    
+    if args.workers <= 1:
+        import uvicorn
+        from app import app
+        
+        uvicorn.run(app, host=args.host, port=args.port, log_level="info")
+        return
+    
+    serve(args.workers, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -17,11 +17,164 @@ WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "base")
 WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "cpu")
 WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
 
+# Adaptive model selection: under load, jobs switch to greedy decoding and
+# then to FALLBACK_MODEL_SIZE so the queue drains within LATENCY_SLO_SECONDS
+ADAPTIVE_MODEL = os.getenv("ADAPTIVE_MODEL", "false").lower() == "true"
+LATENCY_SLO_SECONDS = float(os.getenv("LATENCY_SLO_SECONDS", "300"))
+FALLBACK_MODEL_SIZE = os.getenv("FALLBACK_MODEL_SIZE", "tiny")
+# Re-transcribe sessions from a degraded profile with the configured model
+# when no other jobs are queued or running (checked every REFINE_IDLE_SECONDS)
+REFINE_WHEN_IDLE = os.getenv("REFINE_WHEN_IDLE", "false").lower() == "true"
+REFINE_IDLE_SECONDS = float(os.getenv("REFINE_IDLE_SECONDS", "30"))
+# Two-pass mode: return a draft from DRAFT_PROFILE right away, then refine it
+# with the configured model in the background (same worker as above)
+TWO_PASS = os.getenv("TWO_PASS", "false").lower() == "true"
+DRAFT_PROFILE = os.getenv("DRAFT_PROFILE", "fallback")
+# Disk limit for audio kept for refinement; drafts beyond it are not refined
+REFINE_SPOOL_MAX_BYTES = int(os.getenv("REFINE_SPOOL_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+# Mock transcription (load testing) - used when faster-whisper is missing,
+# or always with MOCK_TRANSCRIBER=true
+MOCK_TRANSCRIBER = os.getenv("MOCK_TRANSCRIBER", "false").lower() == "true"
+# Simulated real-time factor: audio seconds per wall second (0 = instant)
+MOCK_RTF = float(os.getenv("MOCK_RTF", "0"))
+# Random +/- fraction applied to each mock job's simulated cost
+MOCK_RTF_JITTER = float(os.getenv("MOCK_RTF_JITTER", "0"))
+
+# Background jobs
+# Concurrent transcription jobs; each one runs a full Whisper inference
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "1"))
+# Finished jobs kept in memory for polling
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "200"))
+# Scheduling: shortest job first; each second waited counts as this many
+# audio seconds less work, so long recordings are not starved
+JOB_AGING_RATE = float(os.getenv("JOB_AGING_RATE", "10"))
+# Initial audio seconds per wall second for ETAs, refined as jobs finish
+ESTIMATED_RTF = float(os.getenv("ESTIMATED_RTF", "4"))
+# Reject uploads longer than this (seconds, 0 = no limit)
+MAX_AUDIO_SECONDS = float(os.getenv("MAX_AUDIO_SECONDS", "14400"))
+# Bitrate (bits/s) used to estimate duration when container headers lack it
+AUDIO_BITRATE_ESTIMATE = float(os.getenv("AUDIO_BITRATE_ESTIMATE", "32000"))
+# Size-estimated durations are only rejected beyond MAX_AUDIO_SECONDS times
+# this, as the real bitrate of a recording varies around the estimate
+AUDIO_ESTIMATE_MARGIN = float(os.getenv("AUDIO_ESTIMATE_MARGIN", "1.5"))
+# How often a waiting request checks whether its client has disconnected
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "0.5"))
+# Jobs queued with POST /api/jobs keep their audio in this directory and
+# checkpoint decoded segments to the database every CHECKPOINT_SECONDS, so
+# they resume where they left off after a restart
+JOB_SPOOL_DIR = os.getenv("JOB_SPOOL_DIR", "job_spool")
+CHECKPOINT_SECONDS = float(os.getenv("CHECKPOINT_SECONDS", "30"))
+# Resumable uploads (POST /api/uploads) append their chunks to files in this
+# directory; uploads not finalized within UPLOAD_EXPIRE_SECONDS are dropped
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", "upload_spool")
+UPLOAD_EXPIRE_SECONDS = float(os.getenv("UPLOAD_EXPIRE_SECONDS", "86400"))
+# A job decoding an upload that is still arriving fails when no new chunk
+# has arrived for this long
+UPLOAD_STALL_SECONDS = float(os.getenv("UPLOAD_STALL_SECONDS", "600"))
+
 # Database
 DATABASE_PATH = os.getenv("DATABASE_PATH", "verba_sessions.db")
+# Milliseconds a connection waits for another writer before failing
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# Group commit: session inserts arriving within this many milliseconds share
+# one transaction (one fsync); each request still returns only after its row
+# is committed (0 = one transaction per insert)
+GROUP_COMMIT_MS = float(os.getenv("GROUP_COMMIT_MS", "0"))
+GROUP_COMMIT_MAX_ROWS = int(os.getenv("GROUP_COMMIT_MAX_ROWS", "256"))
+# Retention (0 = no limit): sessions older than RETENTION_MAX_AGE_DAYS, beyond
+# the newest RETENTION_MAX_SESSIONS, or (oldest first) while session data
+# (transcripts, summaries, search segments) exceeds RETENTION_MAX_DB_BYTES
+# are deleted by a background task every
+# RETENTION_INTERVAL_SECONDS, RETENTION_BATCH_SIZE per transaction; freed
+# space is returned with incremental vacuum (0 interval = task disabled)
+RETENTION_MAX_AGE_DAYS = float(os.getenv("RETENTION_MAX_AGE_DAYS", "0"))
+RETENTION_MAX_SESSIONS = int(os.getenv("RETENTION_MAX_SESSIONS", "0"))
+RETENTION_MAX_DB_BYTES = int(os.getenv("RETENTION_MAX_DB_BYTES", "0"))
+RETENTION_INTERVAL_SECONDS = float(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "200"))
+
+# Server: with more than one worker, server.py preloads the app and forks
+# HTTP workers that share one inference process holding the model
+# (each worker runs up to TRANSCRIBE_WORKERS jobs at a time)
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+# Set by server.py in its workers: Unix socket of the shared inference process
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET", "")
+# Set by server.py with several workers: directory where every server
+# process saves its metrics, merged by /metrics
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+# How often (seconds) each process saves its metrics there
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+# Full sessions kept in memory as serialized JSON, keyed by session ID
+SESSION_CACHE_MAX_BYTES = int(os.getenv("SESSION_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# Exports - rendered Markdown kept in memory, keyed by session ID
+EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Rows fetched per round-trip when streaming bulk exports
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+# Sessions per transaction when restoring from NDJSON
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))
+
+# Semantic search (GET /api/search/semantic, off by default): transcripts are
+# cut into segments of about SEMANTIC_SEGMENT_WORDS words, embedded with the
+# sentence-transformers model in the local directory SEMANTIC_MODEL (never
+# downloaded) when that package is installed, else with SEMANTIC_HASH_DIM hashed
+# word features, which only match shared words, not paraphrases.
+# From SEMANTIC_IVF_MIN_ROWS segments on (where scoring every segment takes about
+# 15 ms), queries only score the SEMANTIC_IVF_PROBES nearest clusters of an IVF
+# index. Segments scoring below SEMANTIC_MIN_SCORE (cosine similarity) are not results
+SEMANTIC_SEARCH = os.getenv("SEMANTIC_SEARCH", "false").lower() == "true"
+SEMANTIC_MODEL = os.getenv("SEMANTIC_MODEL", "")
+SEMANTIC_HASH_DIM = int(os.getenv("SEMANTIC_HASH_DIM", "384"))
+SEMANTIC_SEGMENT_WORDS = int(os.getenv("SEMANTIC_SEGMENT_WORDS", "60"))
+SEMANTIC_IVF_MIN_ROWS = int(os.getenv("SEMANTIC_IVF_MIN_ROWS", "20000"))
+SEMANTIC_IVF_PROBES = int(os.getenv("SEMANTIC_IVF_PROBES", "32"))
+SEMANTIC_MIN_SCORE = float(os.getenv("SEMANTIC_MIN_SCORE", "0.1"))
+
+# Responses of at least COMPRESSION_MIN_BYTES are gzipped (or brotli-compressed
+# when brotli is installed and the client accepts it)
+RESPONSE_COMPRESSION = os.getenv("RESPONSE_COMPRESSION", "true").lower() == "true"
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+
+# Startup: load the database, libraries and model on a background thread
+# after the server starts (false = load lazily on first use)
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
 
 # Audio processing
 ENABLE_AUDIO_PREPROCESSING = os.getenv("ENABLE_AUDIO_PREPROCESSING", "true").lower() == "true"
+# Energy pre-check: skip Whisper on silent recordings and trim silent edges
+SILENCE_CHECK = os.getenv("SILENCE_CHECK", "true").lower() == "true"
+# Frames (30 ms) with RMS above this level (dB below the recording's peak,
+# i.e. after gain normalization) count as signal
+SILENCE_THRESHOLD_DB = float(os.getenv("SILENCE_THRESHOLD_DB", "-45"))
+# Frames must also rise this many dB above the recording's noise floor
+# (its quietest frames), so steady hiss or hum isn't mistaken for speech
+SILENCE_NOISE_MARGIN_DB = float(os.getenv("SILENCE_NOISE_MARGIN_DB", "12"))
+# Less signal than this (seconds) is treated as "No speech detected"
+MIN_SPEECH_SECONDS = float(os.getenv("MIN_SPEECH_SECONDS", "0.3"))
+# Silence kept around the detected speech when trimming
+SILENCE_PADDING_SECONDS = float(os.getenv("SILENCE_PADDING_SECONDS", "0.5"))
+# Recordings are decoded once to a temporary 16 kHz float32 file and fed to
+# Whisper in windows of about this many seconds, cut at the quietest point,
+# so memory doesn't grow with recording length (0 = one window)
+TRANSCRIBE_WINDOW_SECONDS = float(os.getenv("TRANSCRIBE_WINDOW_SECONDS", "600"))
+
+# Summarization
+# heuristic = first sentences + longest sentences (fast, no dependencies)
+# textrank = TF-IDF sentence vectors ranked by PageRank-style centrality (needs numpy)
+SUMMARIZER_ENGINE = os.getenv("SUMMARIZER_ENGINE", "heuristic").lower()
+# Sentences per similarity window for textrank; bounds the cost to O(n * window)
+SUMMARIZER_SENTENCE_WINDOW = int(os.getenv("SUMMARIZER_SENTENCE_WINDOW", "128"))
+# flat = whole transcript at once, hierarchical = map-reduce over windows (multi-hour meetings)
+SUMMARIZER_MODE = os.getenv("SUMMARIZER_MODE", "flat").lower()
+SUMMARIZER_WINDOW_SECONDS = float(os.getenv("SUMMARIZER_WINDOW_SECONDS", "600"))
+SUMMARIZER_WINDOW_SENTENCES = int(os.getenv("SUMMARIZER_WINDOW_SENTENCES", "80"))
+SUMMARIZER_WINDOW_CACHE_SIZE = int(os.getenv("SUMMARIZER_WINDOW_CACHE_SIZE", "1024"))
+SUMMARIZER_WORKERS = int(os.getenv("SUMMARIZER_WORKERS", str(os.cpu_count() or 2)))
+# Max key points / decisions / action items in a hierarchical summary
+SUMMARIZER_MAX_POINTS = int(os.getenv("SUMMARIZER_MAX_POINTS", "10"))
 
 # CORS - Allow localhost and local network access
 default_origins = "http://localhost:5173,http://localhost:3000,http://127.0.0.1:5173"
@@ -1,16 +1,51 @@
 """
 Storage layer for Verba - handles session persistence using SQLite
+
+Safe to share between forked server workers: connections use WAL with a
+busy timeout, writes are serialized across processes with a lock file, and
+the engine is discarded in child processes after fork.
 """
 import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Optional, Dict
-from sqlalchemy import create_engine, Column, String, Text, DateTime
+from typing import List, Optional, Dict, Callable, Iterator, Tuple
+from sqlalchemy import create_engine, event, func, Column, String, Text, DateTime, Float, Integer, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import uuid
 
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    # Windows: no fork-based workers there, the thread lock is enough
+    FCNTL_AVAILABLE = False
+
+import metrics
+import settings
+from responses import RawJSON, dumps
+
 Base = declarative_base()
 
+# How import_sessions treats rows whose ID already exists
+CONFLICT_POLICIES = ("skip", "replace", "new_id")
+
+# PRAGMA auto_vacuum value: freed pages are kept until incremental_vacuum
+AUTO_VACUUM_INCREMENTAL = 2
+
+# Win32 values for probing whether a job's owning process is still running
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+ERROR_ACCESS_DENIED = 5
+STILL_ACTIVE = 259
+
 
 class Session(Base):
     """
@@ -19,20 +54,27 @@ class Session(Base):
     __tablename__ = "sessions"
     
     id = Column(String, primary_key=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     transcript = Column(Text, nullable=False)
     summary_json = Column(Text, nullable=False)  # JSON string of summary dict
+    # Transcription profile label, e.g. "base" or "tiny-greedy" (see model_policy)
+    model = Column(String)
+    # Set when the transcript is replaced (e.g. by refinement)
+    updated_at = Column(DateTime)
     
-    def to_dict(self, include_full=False):
-        """Convert session to dictionary"""
-        summary = json.loads(self.summary_json)
-        
+    def to_dict(self, include_full=False, raw_summary=False):
+        """
+        Convert session to dictionary
+        raw_summary: keep the stored summary JSON as text (RawJSON) for
+        responses that embed it as-is instead of parsing it
+        """
         if include_full:
             return {
                 "id": self.id,
                 "created_at": self.created_at.isoformat(),
                 "transcript": self.transcript,
-                "summary": summary
+                "summary": RawJSON(self.summary_json) if raw_summary else json.loads(self.summary_json),
+                "model": self.model
             }
         else:
             # For list view, just return preview
@@ -43,36 +85,422 @@ class Session(Base):
             }
 
 
+class JobCheckpoint(Base):
+    """
+    A processing job: its spooled audio, options and the segments decoded
+    so far, so it can resume after a restart. Its status (and, once
+    finished, its result) is shared here, so every server worker can
+    report on it or ask its owner to cancel it
+    """
+    __tablename__ = "job_checkpoints"
+    
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)
+    audio_path = Column(String, nullable=False)
+    options_json = Column(Text, nullable=False)
+    cost = Column(Float)
+    # PID of the server process running the job
+    owner = Column(Integer, nullable=False)
+    segments_json = Column(Text, nullable=False, default="[]")
+    language = Column(String)
+    # queued, running, cancelling (asked by any worker), completed, failed, cancelled
+    status = Column(String, nullable=False, default="queued")
+    # Single-flight key, so identical uploads to different workers share the job
+    job_key = Column(String, index=True)
+    result_json = Column(Text)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+    
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "audio_path": self.audio_path,
+            "options": json.loads(self.options_json),
+            "cost": self.cost,
+            "segments": json.loads(self.segments_json),
+            "language": self.language,
+            "status": self.status,
+            "result": json.loads(self.result_json) if self.result_json else None,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class SearchSegment(Base):
+    """
+    A transcript segment in the semantic search index (see search.py)
+    Its vector is row `row` of the <db>.vectors file
+    """
+    __tablename__ = "search_segments"
+    
+    row = Column(Integer, primary_key=True, autoincrement=False)
+    session_id = Column(String, nullable=False, index=True)
+    # Character offsets of the segment in the session's transcript
+    start = Column(Integer, nullable=False)
+    end = Column(Integer, nullable=False)
+    # SearchIndexState.version that wrote it, so readers load only new rows
+    version = Column(Integer, nullable=False, index=True)
+
+
+class SearchIndexState(Base):
+    """The single row describing the semantic search index"""
+    __tablename__ = "search_index"
+    
+    id = Column(Integer, primary_key=True)
+    # Embedder the vectors were made with, e.g. "hash-384"
+    embedder = Column(String, nullable=False)
+    dim = Column(Integer, nullable=False)
+    # Bumped by every write; epoch is bumped when segments are removed,
+    # which makes readers reload all rows instead of only newer ones
+    version = Column(Integer, nullable=False, default=0)
+    epoch = Column(Integer, nullable=False, default=0)
+
+
+class SessionCache:
+    """
+    Size-bounded LRU cache of full sessions serialized as JSON, keyed by ID
+    Entries can carry the session version they were read at (see
+    StorageManager.get_session_json)
+    """
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[bytes, Optional[str]]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        # Bumped by every invalidation, so a read that raced an update
+        # doesn't put the old payload back
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, session_id: str, version: Optional[str] = None) -> Optional[bytes]:
+        """Cached payload, or None if missing or (when version is given) from another version"""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or (version is not None and entry[1] != version):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, session_id: str, payload: bytes, version: Optional[str], generation: int):
+        """Store a payload read while the cache was at `generation`"""
+        with self._lock:
+            if generation != self.generation or len(payload) > self.max_bytes:
+                return
+            self._discard(session_id)
+            self._entries[session_id] = (payload, version)
+            self._size += len(payload)
+            while self._size > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+    
+    def invalidate(self, session_id: str):
+        """Drop a session's cached payload"""
+        with self._lock:
+            self.generation += 1
+            self._discard(session_id)
+    
+    def _discard(self, session_id: str):
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._size -= len(entry[0])
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._size
+            }
+
+
+class InsertBatcher:
+    """
+    Group commit for session inserts: rows submitted within `window`
+    seconds of each other are written by one background thread in a single
+    transaction (one fsync), and each caller is released only once that
+    transaction has committed
+    """
+    
+    def __init__(self, manager: "StorageManager", window: float, max_rows: int):
+        self.manager = manager
+        self.window = window
+        self.max_rows = max_rows
+        self._queue: "queue.Queue[Tuple[Dict, Future]]" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+    
+    def insert(self, row: Dict):
+        """Queue a row and wait until it is committed (re-raises a failed commit)"""
+        future = Future()
+        self._queue.put((row, future))
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="verba-group-commit", daemon=True)
+                    self._thread.start()
+        future.result()
+    
+    def _run(self):
+        last_batch = 1
+        while True:
+            batch = [self._queue.get()]
+            # Take what is already queued, then wait (up to the window) only
+            # for as many rows as the previous transaction had: a lone
+            # writer is never held back
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_rows:
+                try:
+                    if len(batch) < last_batch:
+                        batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            last_batch = len(batch)
+            self._commit(batch)
+    
+    def _commit(self, batch: List[Tuple[Dict, Future]]):
+        try:
+            with self.manager.writing(), self.manager.engine.begin() as conn:
+                conn.execute(Session.__table__.insert(), [row for row, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        metrics.GROUP_COMMIT_ROWS.observe(len(batch))
+        for _, future in batch:
+            future.set_result(None)
+
+
 class StorageManager:
     """
     Manages all database operations for sessions
+    Full sessions are served from an in-process LRU cache of their JSON
+    (SESSION_CACHE_MAX_BYTES), invalidated when they are updated or deleted
     """
     
-    def __init__(self, db_path: str = "verba_sessions.db"):
-        """Initialize database connection"""
-        self.engine = create_engine(f"sqlite:///{db_path}")
-        Base.metadata.create_all(self.engine)
-        self.SessionLocal = sessionmaker(bind=self.engine)
+    def __init__(self, db_path: str = "verba_sessions.db", group_commit_ms: float = 0):
+        """
+        Remember the database path; the engine is created and the schema
+        checked on first use (or by the startup warm-up), not at import time
+        With group_commit_ms > 0, concurrent create_session calls are
+        batched into shared transactions (see InsertBatcher)
+        """
+        self.db_path = db_path
+        self.group_commit_ms = group_commit_ms
+        self._batcher = self._new_batcher()
+        self._engine = None
+        self._session_factory = None
+        self._init_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._lock_file = None
+        self._listeners: List[Callable[[str, str], None]] = []
+        self.session_cache = SessionCache(settings.SESSION_CACHE_MAX_BYTES)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+    
+    @property
+    def engine(self):
+        """SQLAlchemy engine, created with the schema on first access"""
+        if self._engine is None:
+            with self._init_lock:
+                if self._engine is None:
+                    engine = create_engine(f"sqlite:///{self.db_path}")
+                    event.listen(engine, "connect", _configure_connection)
+                    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+                    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+                    # Workers may start together; one creates the schema
+                    with self._exclusive():
+                        Base.metadata.create_all(engine)
+                        _migrate(engine)
+                    self._session_factory = sessionmaker(bind=engine)
+                    self._engine = engine
+        return self._engine
     
-    def create_session(self, transcript: str, summary: Dict) -> str:
+    @property
+    def SessionLocal(self):
+        """Session factory bound to the (lazily created) engine"""
+        if self._session_factory is None:
+            self.engine
+        return self._session_factory
+    
+    @contextmanager
+    def writing(self):
+        """
+        Serialize a write transaction across threads and worker processes
+        SQLite allows one writer at a time anyway; taking the lock up front
+        avoids SQLITE_BUSY when a read transaction upgrades to a write
+        """
+        # Creating the engine takes the same lock, so it can't happen inside
+        self.engine
+        with self._exclusive():
+            yield
+    
+    @contextmanager
+    def _exclusive(self):
+        """The writer lock: a thread lock plus a flock on <db>.lock"""
+        with self._write_lock:
+            if not FCNTL_AVAILABLE:
+                yield
+                return
+            if self._lock_file is None:
+                self._lock_file = open(f"{self.db_path}.lock", "a")
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+    
+    def _after_fork(self):
+        """
+        In a forked child: drop the parent's pooled connections (without
+        closing them under the parent) and reopen the lock file, since a
+        shared file description would share the flock with the parent
+        """
+        if self._engine is not None:
+            self._engine.dispose(close=False)
+        self._lock_file = None
+        self._write_lock = threading.Lock()
+        # The writer thread didn't survive the fork
+        self._batcher = self._new_batcher()
+    
+    def _new_batcher(self) -> Optional[InsertBatcher]:
+        if self.group_commit_ms <= 0:
+            return None
+        return InsertBatcher(self, self.group_commit_ms / 1000, settings.GROUP_COMMIT_MAX_ROWS)
+    
+    def add_listener(self, callback: Callable[[str, str], None]):
+        """
+        Register a callback for session changes
+        Called as callback(event, session_id) with event "created", "updated" or "deleted"
+        """
+        self._listeners.append(callback)
+    
+    def _notify(self, event: str, session_id: str):
+        """Notify listeners, never letting a listener break the write path"""
+        if event != "created":
+            self.session_cache.invalidate(session_id)
+        for callback in self._listeners:
+            try:
+                callback(event, session_id)
+            except Exception as e:
+                print(f"Storage listener failed for {event} {session_id}: {e}")
+    
+    def create_session(self, transcript: str, summary: Dict, model: Optional[str] = None) -> str:
         """
         Create a new session with transcript and summary
+        model records the transcription profile used (see model_policy.label)
         Returns the session ID
         """
         session_id = str(uuid.uuid4())
+        
+        if self._batcher is not None:
+            # Returns once the shared transaction holding the row has committed
+            with metrics.stage("db_write"):
+                self._batcher.insert({
+                    "id": session_id,
+                    "created_at": datetime.utcnow(),
+                    "transcript": transcript,
+                    "summary_json": json.dumps(summary),
+                    "model": model
+                })
+            self._notify("created", session_id)
+            return session_id
+        
         db_session = self.SessionLocal()
         
         try:
-            new_session = Session(
-                id=session_id,
-                transcript=transcript,
-                summary_json=json.dumps(summary)
-            )
-            db_session.add(new_session)
-            db_session.commit()
-            return session_id
+            with metrics.stage("db_write"), self.writing():
+                new_session = Session(
+                    id=session_id,
+                    transcript=transcript,
+                    summary_json=json.dumps(summary),
+                    model=model
+                )
+                db_session.add(new_session)
+                db_session.commit()
         finally:
             db_session.close()
+        
+        self._notify("created", session_id)
+        return session_id
+    
+    def import_sessions(self, rows: List[Dict], on_conflict: str = "skip") -> Dict[str, int]:
+        """
+        Insert a batch of exported sessions in a single transaction
+        
+        Args:
+            rows: Table rows built with import_row() from exported sessions
+            on_conflict: "skip" keeps existing rows, "replace" overwrites them,
+                         "new_id" imports the row under a fresh ID
+        
+        Returns:
+            Counts of imported, updated and skipped rows
+        """
+        if on_conflict not in CONFLICT_POLICIES:
+            raise ValueError(f"Unknown conflict policy: {on_conflict}")
+        
+        if not rows:
+            return {"imported": 0, "updated": 0, "skipped": 0}
+        
+        table = Session.__table__
+        
+        with metrics.stage("db_write"), self.writing(), self.engine.begin() as conn:
+            existing = set()
+            ids = [row["id"] for row in rows]
+            for i in range(0, len(ids), 900):  # Stay under SQLite's bound-parameter limit
+                existing.update(conn.execute(
+                    select(table.c.id).where(table.c.id.in_(ids[i:i + 900]))
+                ).scalars())
+            
+            if on_conflict == "new_id":
+                for row in rows:
+                    if row["id"] in existing:
+                        row["id"] = str(uuid.uuid4())
+                existing = set()
+            
+            stmt = sqlite_insert(table)
+            if on_conflict == "replace":
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[table.c.id],
+                    set_={
+                        "created_at": stmt.excluded.created_at,
+                        "transcript": stmt.excluded.transcript,
+                        "summary_json": stmt.excluded.summary_json,
+                        "model": stmt.excluded.model,
+                        # Changes the session's version, so other workers drop cached copies
+                        "updated_at": datetime.utcnow()
+                    }
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=[table.c.id])
+            
+            # executemany: one prepared statement, one commit for the whole batch
+            conn.execute(stmt, rows)
+        
+        # Rows repeated inside the batch only count once
+        new_ids = {row["id"] for row in rows} - existing
+        updated = existing if on_conflict == "replace" else set()
+        for session_id in new_ids:
+            self._notify("created", session_id)
+        for session_id in updated:
+            self._notify("updated", session_id)
+        
+        return {
+            "imported": len(new_ids),
+            "updated": len(updated),
+            "skipped": len(rows) - len(new_ids) - len(updated)
+        }
     
     def list_sessions(self, limit: int = 50) -> List[Dict]:
         """
@@ -90,11 +518,56 @@ class StorageManager:
         finally:
             db_session.close()
     
+    def iter_sessions(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                      batch_size: int = 500, raw_summary: bool = False) -> Iterator[Dict]:
+        """
+        Stream full sessions created in [start, end), oldest first
+        Rows are fetched in batches of batch_size through a server-side cursor,
+        so the full result set is never held in memory
+        raw_summary: summaries as RawJSON (see Session.to_dict)
+        """
+        db_session = self.SessionLocal()
+        
+        try:
+            query = db_session.query(Session)
+            if start:
+                query = query.filter(Session.created_at >= start)
+            if end:
+                query = query.filter(Session.created_at < end)
+            query = query.order_by(Session.created_at).yield_per(batch_size)
+            
+            for session in query:
+                yield session.to_dict(include_full=True, raw_summary=raw_summary)
+        finally:
+            db_session.close()
+    
     def get_session(self, session_id: str) -> Optional[Dict]:
         """
         Get full session data by ID
         Returns None if not found
         """
+        payload = self.get_session_json(session_id)
+        return json.loads(payload) if payload is not None else None
+    
+    def get_session_json(self, session_id: str) -> Optional[bytes]:
+        """
+        Full session serialized as JSON, None if not found
+        Hot sessions come from the cache without touching SQLite. With
+        several server workers, which can't invalidate each other's caches,
+        a hit first needs an indexed version lookup (no transcript load)
+        """
+        version = None
+        if settings.SERVER_WORKERS > 1:
+            version = self.session_version(session_id)
+            if version is None:
+                self.session_cache.invalidate(session_id)
+                return None
+        
+        payload = self.session_cache.get(session_id, version)
+        if payload is not None:
+            return payload
+        
+        generation = self.session_cache.generation
         db_session = self.SessionLocal()
         
         try:
@@ -102,11 +575,50 @@ class StorageManager:
                 Session.id == session_id
             ).first()
             
-            if session:
-                return session.to_dict(include_full=True)
-            return None
+            if not session:
+                return None
+            # The stored summary JSON goes into the payload as-is
+            payload = dumps(session.to_dict(include_full=True, raw_summary=True))
+            version = (session.updated_at or session.created_at).isoformat()
         finally:
             db_session.close()
+        
+        self.session_cache.put(session_id, payload, version, generation)
+        return payload
+    
+    def session_version(self, session_id: str) -> Optional[str]:
+        """
+        Cheap change stamp of a session (last update or creation time),
+        without loading the transcript; None if it doesn't exist
+        """
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(Session.created_at, Session.updated_at).where(Session.id == session_id)
+            ).first()
+        if row is None:
+            return None
+        return (row.updated_at or row.created_at).isoformat()
+    
+    def update_session(self, session_id: str, transcript: str, summary: Dict,
+                       model: Optional[str] = None) -> bool:
+        """
+        Replace a session's transcript and summary (e.g. after refinement)
+        Returns True if updated, False if not found
+        """
+        table = Session.__table__
+        with metrics.stage("db_write"), self.writing(), self.engine.begin() as conn:
+            updated = conn.execute(
+                table.update().where(table.c.id == session_id).values(
+                    transcript=transcript,
+                    summary_json=json.dumps(summary),
+                    model=model,
+                    updated_at=datetime.utcnow()
+                )
+            ).rowcount
+        
+        if updated:
+            self._notify("updated", session_id)
+        return bool(updated)
     
     def delete_session(self, session_id: str) -> bool:
         """
@@ -116,18 +628,460 @@ class StorageManager:
         db_session = self.SessionLocal()
         
         try:
-            session = db_session.query(Session).filter(
-                Session.id == session_id
-            ).first()
-            
-            if session:
+            with self.writing():
+                session = db_session.query(Session).filter(
+                    Session.id == session_id
+                ).first()
+                
+                if not session:
+                    return False
                 db_session.delete(session)
+                _drop_search_segments(db_session, [session_id])
+                db_session.commit()
+        finally:
+            db_session.close()
+        
+        self._notify("deleted", session_id)
+        return True
+    
+    def delete_sessions(self, session_ids: List[str]) -> int:
+        """
+        Delete a batch of sessions in one transaction (retention purges)
+        Returns the number deleted
+        """
+        if not session_ids:
+            return 0
+        table = Session.__table__
+        with metrics.stage("db_write"), self.writing(), self.engine.begin() as conn:
+            deleted = list(conn.execute(
+                select(table.c.id).where(table.c.id.in_(session_ids))
+            ).scalars())
+            conn.execute(table.delete().where(table.c.id.in_(deleted)))
+            _drop_search_segments(conn, deleted)
+        
+        for session_id in deleted:
+            self._notify("deleted", session_id)
+        return len(deleted)
+    
+    def oldest_session_ids(self, limit: int, before: Optional[datetime] = None,
+                           keep_newest: Optional[int] = None) -> List[str]:
+        """
+        IDs of up to `limit` sessions, oldest first: those created before
+        `before`, and/or those beyond the newest `keep_newest`
+        """
+        table = Session.__table__
+        with self.engine.connect() as conn:
+            if keep_newest is not None:
+                total = conn.execute(select(func.count()).select_from(table)).scalar()
+                limit = min(limit, max(0, total - keep_newest))
+                if not limit:
+                    return []
+            query = select(table.c.id).order_by(table.c.created_at).limit(limit)
+            if before is not None:
+                query = query.where(table.c.created_at < before)
+            return list(conn.execute(query).scalars())
+    
+    def database_size(self) -> Dict[str, int]:
+        """Bytes used by data and bytes in free pages not yet returned by vacuum"""
+        with self.engine.connect() as conn:
+            page_size = conn.exec_driver_sql("PRAGMA page_size").scalar()
+            pages = conn.exec_driver_sql("PRAGMA page_count").scalar()
+            free = conn.exec_driver_sql("PRAGMA freelist_count").scalar()
+        return {"used_bytes": (pages - free) * page_size, "free_bytes": free * page_size}
+    
+    def session_bytes(self) -> Optional[int]:
+        """
+        Bytes in the pages of sessions, their search segments and indexes
+        None when SQLite is built without the dbstat table
+        """
+        with self.engine.connect() as conn:
+            try:
+                return conn.exec_driver_sql(
+                    "SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name IN "
+                    "(SELECT name FROM sqlite_master WHERE tbl_name IN ('sessions', 'search_segments'))"
+                ).scalar()
+            except OperationalError:
+                return None
+    
+    def incremental_vacuum(self, pages: int) -> int:
+        """
+        Return up to `pages` free pages to the filesystem
+        Returns the bytes still in free pages
+        """
+        with self.writing(), self.engine.connect() as conn:
+            # The sqlite3 module steps a pragma only once (one page);
+            # executescript runs it to completion
+            conn.connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+        return self.database_size()["free_bytes"]
+    
+    def search_index_state(self) -> Optional[Dict]:
+        """Embedder, dim, version and epoch of the semantic search index, None before it exists"""
+        with self.engine.connect() as conn:
+            row = conn.execute(select(SearchIndexState.__table__)).first()
+        return dict(row._mapping) if row else None
+    
+    def reset_search_index(self, embedder: str, dim: int):
+        """Empty the semantic search index and record the embedder it is rebuilt with"""
+        state = SearchIndexState.__table__
+        with self.writing(), self.engine.begin() as conn:
+            conn.execute(SearchSegment.__table__.delete())
+            current = conn.execute(select(state)).first()
+            if current is None:
+                conn.execute(state.insert().values(id=1, embedder=embedder, dim=dim, version=1, epoch=1))
+            else:
+                conn.execute(state.update().values(embedder=embedder, dim=dim,
+                                                   version=current.version + 1, epoch=current.epoch + 1))
+    
+    def search_segment_rows(self, since_version: Optional[int] = None) -> List[Tuple[int, int]]:
+        """(row, version) of indexed segments, only those written after since_version if given"""
+        segments = SearchSegment.__table__
+        query = select(segments.c.row, segments.c.version)
+        if since_version is not None:
+            query = query.where(segments.c.version > since_version)
+        with self.engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(query)]
+    
+    def replace_search_segments(self, segments_by_session: Dict[str, List[Tuple[int, int, int]]]):
+        """
+        Replace the indexed segments, (row, start, end), of each given session
+        in one transaction; sessions deleted meanwhile are left out
+        """
+        sessions = Session.__table__
+        segments = SearchSegment.__table__
+        state = SearchIndexState.__table__
+        ids = list(segments_by_session)
+        with metrics.stage("db_write"), self.writing(), self.engine.begin() as conn:
+            existing = set()
+            removed = 0
+            for i in range(0, len(ids), 900):
+                chunk = ids[i:i + 900]
+                existing.update(conn.execute(select(sessions.c.id).where(sessions.c.id.in_(chunk))).scalars())
+                removed += conn.execute(segments.delete().where(segments.c.session_id.in_(chunk))).rowcount
+            
+            current = conn.execute(select(state)).first()
+            version = current.version + 1
+            conn.execute(state.update().values(version=version, epoch=current.epoch + (1 if removed else 0)))
+            rows = [
+                {"row": row, "session_id": session_id, "start": start, "end": end, "version": version}
+                for session_id in ids if session_id in existing
+                for row, start, end in segments_by_session[session_id]
+            ]
+            if rows:
+                conn.execute(segments.insert(), rows)
+    
+    def unindexed_session_ids(self, among: Optional[List[str]] = None) -> List[str]:
+        """IDs of sessions without segments in the semantic search index (of `among` if given)"""
+        sessions = Session.__table__
+        segments = SearchSegment.__table__
+        query = select(sessions.c.id).where(
+            sessions.c.id.not_in(select(segments.c.session_id))
+        ).order_by(sessions.c.created_at)
+        with self.engine.connect() as conn:
+            if among is None:
+                return list(conn.execute(query).scalars())
+            found = []
+            for i in range(0, len(among), 900):
+                found += conn.execute(query.where(sessions.c.id.in_(among[i:i + 900]))).scalars()
+            return found
+    
+    def get_transcripts(self, session_ids: List[str]) -> Dict[str, str]:
+        """Transcripts of the given sessions by ID (missing ones are left out)"""
+        sessions = Session.__table__
+        transcripts = {}
+        with self.engine.connect() as conn:
+            for i in range(0, len(session_ids), 900):
+                transcripts.update(conn.execute(
+                    select(sessions.c.id, sessions.c.transcript).where(sessions.c.id.in_(session_ids[i:i + 900]))
+                ).all())
+        return transcripts
+    
+    def search_hits(self, rows: List[int]) -> Dict[int, Dict]:
+        """Session ID, creation time and text of indexed segments, by row"""
+        sessions = Session.__table__
+        segments = SearchSegment.__table__
+        query = select(
+            segments.c.row, segments.c.session_id, sessions.c.created_at,
+            func.substr(sessions.c.transcript, segments.c.start + 1, segments.c.end - segments.c.start)
+        ).join(sessions, sessions.c.id == segments.c.session_id).where(segments.c.row.in_(rows))
+        with self.engine.connect() as conn:
+            return {
+                row: {"session_id": session_id, "created_at": created_at.isoformat(), "snippet": text}
+                for row, session_id, created_at, text in conn.execute(query)
+            }
+    
+    def save_job(self, job_id: str, kind: str, audio_path: str, options: Dict,
+                 cost: Optional[float] = None, key: Optional[str] = None) -> str:
+        """
+        Record a new checkpointed job, owned by this process
+        With a key, an unfinished job with the same key whose owner is alive
+        (possibly another server worker) is returned instead of recording one
+        Returns the ID of the job to use
+        """
+        db_session = self.SessionLocal()
+        
+        try:
+            with self.writing():
+                if key is not None:
+                    for existing in db_session.query(JobCheckpoint).filter(
+                        JobCheckpoint.job_key == key,
+                        JobCheckpoint.status.in_(("queued", "running"))
+                    ):
+                        if existing.owner == os.getpid() or _pid_alive(existing.owner):
+                            return existing.id
+                db_session.add(JobCheckpoint(
+                    id=job_id,
+                    kind=kind,
+                    audio_path=audio_path,
+                    options_json=json.dumps(options),
+                    cost=cost,
+                    owner=os.getpid(),
+                    job_key=key
+                ))
+                db_session.commit()
+                return job_id
+        finally:
+            db_session.close()
+    
+    def start_job(self, job_id: str) -> bool:
+        """
+        Mark a queued job as running
+        Returns False if a worker asked to cancel it in the meantime
+        """
+        table = JobCheckpoint.__table__
+        with self.writing(), self.engine.begin() as conn:
+            conn.execute(
+                table.update().where(table.c.id == job_id, table.c.status == "queued").values(status="running")
+            )
+            status = conn.execute(select(table.c.status).where(table.c.id == job_id)).scalar()
+        return status != "cancelling"
+    
+    def cancel_requested(self, job_id: str) -> bool:
+        """Whether any worker asked to cancel the job (see request_cancel)"""
+        table = JobCheckpoint.__table__
+        with self.engine.connect() as conn:
+            return conn.execute(select(table.c.status).where(table.c.id == job_id)).scalar() == "cancelling"
+    
+    def request_cancel(self, job_id: str) -> Optional[Dict]:
+        """
+        Ask the process running an unfinished job to cancel it; it notices
+        when the job starts or at its next checkpoint
+        Returns the job, None if unknown
+        """
+        table = JobCheckpoint.__table__
+        with self.writing(), self.engine.begin() as conn:
+            conn.execute(
+                table.update().where(
+                    table.c.id == job_id, table.c.status.in_(("queued", "running"))
+                ).values(status="cancelling")
+            )
+        return self.get_job(job_id)
+    
+    def finish_job(self, job_id: str, status: str, result: Optional[Dict] = None,
+                   error: Optional[str] = None):
+        """
+        Record how a job ended, so any worker can still report it; only the
+        newest JOB_HISTORY finished jobs are kept
+        """
+        table = JobCheckpoint.__table__
+        with self.writing(), self.engine.begin() as conn:
+            conn.execute(
+                table.update().where(table.c.id == job_id).values(
+                    status=status,
+                    result_json=dumps(result).decode("utf-8") if result is not None else None,
+                    error=error,
+                    segments_json="[]",
+                    finished_at=datetime.utcnow()
+                )
+            )
+            finished = table.c.finished_at.isnot(None)
+            keep = select(table.c.id).where(finished).order_by(table.c.finished_at.desc()).limit(settings.JOB_HISTORY)
+            conn.execute(table.delete().where(finished, table.c.id.notin_(keep)))
+    
+    def checkpoint_job(self, job_id: str, segments: List[Dict], language: Optional[str] = None):
+        """Replace a job's decoded segments with the current list"""
+        table = JobCheckpoint.__table__
+        with metrics.stage("db_write"), self.writing(), self.engine.begin() as conn:
+            conn.execute(
+                table.update().where(table.c.id == job_id).values(
+                    segments_json=json.dumps(segments),
+                    language=language,
+                    updated_at=datetime.utcnow()
+                )
+            )
+    
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Checkpointed job by ID (finished ones for a while), None if unknown"""
+        db_session = self.SessionLocal()
+        
+        try:
+            job = db_session.get(JobCheckpoint, job_id)
+            return job.to_dict() if job else None
+        finally:
+            db_session.close()
+    
+    def update_job_options(self, job_id: str, options: Dict):
+        """Replace a checkpointed job's options"""
+        table = JobCheckpoint.__table__
+        with self.writing(), self.engine.begin() as conn:
+            conn.execute(
+                table.update().where(table.c.id == job_id).values(options_json=json.dumps(options))
+            )
+    
+    def delete_job(self, job_id: str):
+        """Forget a job once it has finished (in any state)"""
+        table = JobCheckpoint.__table__
+        with self.writing(), self.engine.begin() as conn:
+            conn.execute(table.delete().where(table.c.id == job_id))
+    
+    def claim_jobs(self, kind: str) -> List[Dict]:
+        """
+        Jobs of a kind owned by this process, after taking over those whose
+        owning process is gone (a previous run of this server, or a worker
+        that died)
+        Returns them oldest first
+        """
+        db_session = self.SessionLocal()
+        
+        try:
+            with self.writing():
+                jobs = db_session.query(JobCheckpoint).filter(
+                    JobCheckpoint.kind == kind,
+                    JobCheckpoint.finished_at.is_(None)
+                ).order_by(JobCheckpoint.created_at).all()
+                claimed = [job for job in jobs if job.owner == os.getpid() or not _pid_alive(job.owner)]
+                for job in claimed:
+                    job.owner = os.getpid()
                 db_session.commit()
-                return True
-            return False
+                return [job.to_dict() for job in claimed]
         finally:
             db_session.close()
 
 
+def _migrate(engine):
+    """Add columns and indexes introduced after a database was created"""
+    with engine.begin() as conn:
+        columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(sessions)")}
+        if "model" not in columns:
+            conn.exec_driver_sql("ALTER TABLE sessions ADD COLUMN model VARCHAR")
+        if "updated_at" not in columns:
+            conn.exec_driver_sql("ALTER TABLE sessions ADD COLUMN updated_at DATETIME")
+        # Listing and retention go oldest/newest first
+        conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_sessions_created_at ON sessions (created_at)")
+        
+        columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(job_checkpoints)")}
+        for column, definition in (("status", "VARCHAR NOT NULL DEFAULT 'queued'"), ("job_key", "VARCHAR"),
+                                   ("result_json", "TEXT"), ("error", "TEXT"), ("finished_at", "DATETIME")):
+            if column not in columns:
+                conn.exec_driver_sql(f"ALTER TABLE job_checkpoints ADD COLUMN {column} {definition}")
+        conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_job_checkpoints_job_key ON job_checkpoints (job_key)")
+    
+    with engine.connect() as conn:
+        auto_vacuum = conn.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+    # Databases created before auto_vacuum=INCREMENTAL need one full VACUUM
+    # to switch, which locks out every writer; it is left to the operator
+    if auto_vacuum != AUTO_VACUUM_INCREMENTAL:
+        print("Database predates incremental vacuum; deleted sessions won't shrink it "
+              "until `python retention.py --convert` is run (server stopped)")
+
+
+def _drop_search_segments(conn, session_ids: List[str]):
+    """Remove deleted sessions from the search index, in the deleting transaction"""
+    segments = SearchSegment.__table__
+    removed = 0
+    for i in range(0, len(session_ids), 900):
+        removed += conn.execute(
+            segments.delete().where(segments.c.session_id.in_(session_ids[i:i + 900]))
+        ).rowcount
+    if removed:
+        state = SearchIndexState.__table__
+        conn.execute(state.update().values(version=state.c.version + 1, epoch=state.c.epoch + 1))
+
+
+def _pid_alive(pid: int) -> bool:
+    """Whether a process with this PID exists, without signalling it"""
+    if os.name == "nt":
+        return _pid_alive_windows(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _pid_alive_windows(pid: int) -> bool:
+    """
+    os.kill(pid, 0) terminates the process on Windows, so ask for its
+    exit code instead (STILL_ACTIVE while it runs)
+    """
+    import ctypes
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        # Access denied means it exists; invalid parameter means no such PID
+        return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+    try:
+        exit_code = ctypes.c_ulong()
+        if not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+            return True
+        return exit_code.value == STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def _configure_connection(dbapi_connection, connection_record):
+    """
+    WAL lets readers proceed during a write; busy_timeout waits out other writers
+    auto_vacuum only takes effect on a new database (see _migrate for old ones)
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    if operation not in ("SELECT", "INSERT", "UPDATE", "DELETE", "PRAGMA"):
+        operation = "OTHER"
+    metrics.SQLITE_QUERY_SECONDS.observe(elapsed, operation=operation)
+
+
+def import_row(record: Dict) -> Dict:
+    """
+    Validate one exported session (iter_sessions / NDJSON export format)
+    and convert it to a table row for import_sessions
+    Raises ValueError if the record is not a session
+    """
+    if not isinstance(record, dict) or not isinstance(record.get("transcript"), str):
+        raise ValueError("Session needs a 'transcript' string")
+    
+    summary = record.get("summary")
+    if isinstance(summary, dict):
+        summary_json = json.dumps(summary)
+    elif isinstance(record.get("summary_json"), str):
+        summary_json = record["summary_json"]
+    else:
+        raise ValueError("Session needs a 'summary' object")
+    
+    created_at = record.get("created_at")
+    created_at = datetime.fromisoformat(created_at) if created_at else datetime.utcnow()
+    
+    return {
+        "id": str(record.get("id") or uuid.uuid4()),
+        "created_at": created_at,
+        "transcript": record["transcript"],
+        "summary_json": summary_json,
+        "model": record["model"] if isinstance(record.get("model"), str) else None
+    }
+
+
 # Global storage instance
-storage = StorageManager()
+storage = StorageManager(settings.DATABASE_PATH, group_commit_ms=settings.GROUP_COMMIT_MS)
@@ -1,9 +1,35 @@
 """
 Transcript summarization logic - generates structured meeting notes
 Uses simple rule-based NLP (no external API calls)
+
+Key points can be picked by one of two engines:
+- heuristic: first sentences + longest sentences
+- textrank: TF-IDF sentence vectors ranked by PageRank-style centrality
+
+Long transcripts can be summarized hierarchically: the transcript is split
+into time windows (or content-anchored sentence windows without timestamps),
+each window is summarized in parallel and cached, then the window summaries
+are reduced into the final summary.
 """
 import re
-from typing import List, Dict
+import hashlib
+import importlib.util
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
+
+# numpy/scipy are only needed by the textrank engine; they are imported on
+# first use so they don't slow down server startup
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+SCIPY_AVAILABLE = importlib.util.find_spec("scipy") is not None
+
+import settings
+import metrics
+
+SUMMARIZER_ENGINES = ("heuristic", "textrank")
+SUMMARIZER_MODES = ("flat", "hierarchical")
 
 
 # Filler words to remove for cleaner summaries
@@ -13,17 +39,80 @@ FILLER_WORDS = [
     r'\bliterally\b', r'\byeah\b', r'\bmhm\b', r'\bhmm\b'
 ]
 
+# Common words ignored when building TF-IDF vectors
+STOP_WORDS = frozenset("""
+    a about above after again all also am an and any are as at be because been
+    before being below between both but by can could did do does doing down
+    during each few for from further had has have having he her here hers him
+    his how i if in into is it its just me more most my no nor not now of off
+    on once only or other our ours out over own same she so some such than that
+    the their them then there these they this those through to too under until
+    up very was we were what when where which while who whom why with would you
+    your yours okay ok so gonna got get going thing things really right well
+""".split())
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+# Key points returned when there is nothing to summarize
+PLACEHOLDER_POINTS = ("No content available", "No significant points captured")
+
+# Raw sentence boundaries used to cut windows (before filler cleanup)
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
 
-def summarize_transcript(transcript: str) -> Dict:
+# Sentence-final punctuation followed by whitespace (SentenceCollector cut points)
+SENTENCE_END = re.compile(r'[.!?](?=\s)')
+
+# Window summaries keyed by hash of (engine, window text), most recent last
+_window_cache: "OrderedDict[str, Dict]" = OrderedDict()
+_window_cache_lock = threading.Lock()
+_window_cache_stats = {"hits": 0, "misses": 0}
+
+
+def summarize_transcript(transcript: str, engine: Optional[str] = None,
+                         mode: Optional[str] = None,
+                         segments: Optional[List[Dict]] = None) -> Dict:
     """
     Convert a transcript into structured meeting notes
     
     Args:
         transcript: Full text transcript
+        engine: Key point engine ("heuristic" or "textrank"),
+                defaults to settings.SUMMARIZER_ENGINE
+        mode: "flat" or "hierarchical", defaults to settings.SUMMARIZER_MODE
+        segments: Optional timestamped segments ({"start", "end", "text"})
+                  used to cut hierarchical windows by time
     
     Returns:
         Dictionary with sections: key_points, decisions, action_items
+        (plus per-window "sections" in hierarchical mode)
+    """
+    engine, mode = resolve_options(engine, mode)
+    
+    with metrics.stage("summarization"):
+        if mode == "hierarchical":
+            return summarize_hierarchical(transcript, segments=segments, engine=engine)
+        
+        return _summarize_flat(transcript, engine)
+
+
+def resolve_options(engine: Optional[str] = None, mode: Optional[str] = None):
+    """
+    Apply configured defaults to engine/mode and validate them
+    Raises ValueError for unknown values
     """
+    engine = (engine or settings.SUMMARIZER_ENGINE).lower()
+    if engine not in SUMMARIZER_ENGINES:
+        raise ValueError(f"Unknown summarizer engine: {engine}")
+    
+    mode = (mode or settings.SUMMARIZER_MODE).lower()
+    if mode not in SUMMARIZER_MODES:
+        raise ValueError(f"Unknown summarizer mode: {mode}")
+    
+    return engine, mode
+
+
+def _summarize_flat(transcript: str, engine: str) -> Dict:
+    """Summarize a transcript as one flat list of sentences"""
     if not transcript or len(transcript.strip()) == 0:
         return {
             "key_points": ["No content available"],
@@ -35,10 +124,20 @@ def summarize_transcript(transcript: str) -> Dict:
     cleaned_text = clean_text(transcript)
     
     # Split into sentences
-    sentences = split_sentences(cleaned_text)
-    
-    # Extract key points (first few sentences + longer sentences)
-    key_points = extract_key_points(sentences)
+    return summarize_sentences(split_sentences(cleaned_text), engine)
+
+
+def summarize_sentences(sentences: List[str], engine: str) -> Dict:
+    """
+    Flat summary of sentences that are already cleaned and split
+    (split_sentences(clean_text(...)), or a SentenceCollector)
+    """
+    # Extract key points
+    if engine == "textrank" and NUMPY_AVAILABLE:
+        key_points = rank_key_points(sentences)
+    else:
+        # First few sentences + longer sentences
+        key_points = extract_key_points(sentences)
     
     # Extract decisions (sentences with decision keywords)
     decisions = extract_decisions(sentences)
@@ -53,6 +152,239 @@ def summarize_transcript(transcript: str) -> Dict:
     }
 
 
+def summarize_hierarchical(transcript: str, segments: Optional[List[Dict]] = None,
+                           engine: Optional[str] = None) -> Dict:
+    """
+    Map-reduce summarization for multi-hour transcripts
+    
+    Map: every window is summarized on its own (in parallel, cached by content).
+    Reduce: window key points are re-ranked into the final key points, decisions
+    and action items are merged in order. Per-window summaries are attached
+    as "sections".
+    """
+    engine = (engine or settings.SUMMARIZER_ENGINE).lower()
+    windows = split_windows(transcript, segments)
+    
+    if not windows:
+        return _summarize_flat("", engine)
+    
+    workers = max(1, min(settings.SUMMARIZER_WORKERS, len(windows)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        partials = list(pool.map(lambda w: summarize_window(w["text"], engine), windows))
+    
+    max_items = settings.SUMMARIZER_MAX_POINTS
+    sections = []
+    for window, partial in zip(windows, partials):
+        sections.append({
+            "start": window["start"],
+            "end": window["end"],
+            "key_points": partial["key_points"],
+            "decisions": partial["decisions"],
+            "action_items": partial["action_items"]
+        })
+    
+    # Reduce key points across windows
+    section_points = [[p for p in s["key_points"] if p not in PLACEHOLDER_POINTS] for s in sections]
+    if engine == "textrank" and NUMPY_AVAILABLE:
+        candidates = [p for points in section_points for p in points]
+        key_points = rank_key_points(candidates, max_points=max_items)
+    else:
+        key_points = _round_robin(section_points, max_items)
+    
+    return {
+        "key_points": key_points if key_points else ["No significant points captured"],
+        "decisions": _merge_unique([s["decisions"] for s in sections], max_items),
+        "action_items": _merge_unique([s["action_items"] for s in sections], max_items),
+        "sections": sections
+    }
+
+
+def split_windows(transcript: str, segments: Optional[List[Dict]] = None) -> List[Dict]:
+    """
+    Split a transcript into summarization windows
+    
+    With timestamped segments, windows cover SUMMARIZER_WINDOW_SECONDS of audio.
+    Otherwise windows hold about SUMMARIZER_WINDOW_SENTENCES raw sentences and
+    end after a sentence whose hash picks it as an anchor, so inserting or
+    deleting text only moves the boundaries next to the edit; the other
+    windows (and their cache entries) stay the same.
+    
+    Returns:
+        List of {"start", "end", "text"} (start/end are None without timestamps)
+    """
+    windows = []
+    
+    if segments:
+        builder = WindowBuilder()
+        for segment in segments:
+            window = builder.add(segment)
+            if window:
+                windows.append(window)
+        window = builder.finish()
+        if window:
+            windows.append(window)
+        return [w for w in windows if w["text"].strip()]
+    
+    if not transcript or not transcript.strip():
+        return []
+    
+    sentences = SENTENCE_BOUNDARY.split(transcript.strip())
+    size = max(1, settings.SUMMARIZER_WINDOW_SENTENCES)
+    # A window has at least size/2 sentences, then ends at the next anchor
+    # (one sentence in size/2 on average), or at 2*size sentences at most
+    min_size = max(1, size // 2)
+    spacing = max(1, size - min_size)
+    current = []
+    for sentence in sentences:
+        current.append(sentence)
+        if len(current) >= 2 * size or (len(current) >= min_size and _is_anchor(sentence, spacing)):
+            windows.append({"start": None, "end": None, "text": " ".join(current)})
+            current = []
+    if current:
+        windows.append({"start": None, "end": None, "text": " ".join(current)})
+    return windows
+
+
+def _is_anchor(sentence: str, spacing: int) -> bool:
+    """Whether a window may end after this sentence (about one in `spacing`)"""
+    return zlib.crc32(" ".join(sentence.split()).encode("utf-8")) % spacing == 0
+
+
+class SentenceCollector:
+    """
+    Cleans and splits a transcript into sentences one segment at a time, so
+    a flat summary can be prepared while transcription is still running
+    finish() returns split_sentences(clean_text(transcript)) for the
+    transcript " ".join(texts) of the added segment texts
+    """
+    
+    def __init__(self):
+        self.sentences: List[str] = []
+        self._buffer = ""
+        self._started = False
+    
+    def add(self, text: str):
+        """Add a segment's text; complete sentences are cleaned right away"""
+        if not text:
+            return
+        scan_from = max(0, len(self._buffer) - 1)
+        self._buffer = f"{self._buffer} {text}" if self._started else text
+        self._started = True
+        
+        # Cut after the last sentence end: no filler pattern or sentence spans it
+        cut = None
+        for cut in SENTENCE_END.finditer(self._buffer, scan_from):
+            pass
+        if cut:
+            self.sentences.extend(split_sentences(clean_text(self._buffer[:cut.end()])))
+            self._buffer = self._buffer[cut.end():]
+    
+    def finish(self) -> List[str]:
+        """Clean the unfinished last sentence and return all sentences"""
+        self.sentences.extend(split_sentences(clean_text(self._buffer)))
+        self._buffer = ""
+        return self.sentences
+
+
+class WindowBuilder:
+    """
+    Groups timestamped segments into time windows one segment at a time,
+    so windows can be summarized while transcription is still running
+    """
+    
+    def __init__(self, window_seconds: Optional[float] = None):
+        self.window_seconds = window_seconds or settings.SUMMARIZER_WINDOW_SECONDS
+        self._texts: List[str] = []
+        self._start = None
+        self._end = None
+    
+    def add(self, segment: Dict) -> Optional[Dict]:
+        """Add a segment; returns the previous window once it is complete"""
+        try:
+            start, end, text = float(segment["start"]), float(segment["end"]), str(segment["text"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Segments need numeric 'start', 'end' and a 'text' field")
+        
+        completed = None
+        if self._texts and start - self._start >= self.window_seconds:
+            completed = self.finish()
+        
+        if not self._texts:
+            self._start = start
+        self._texts.append(text.strip())
+        self._end = end
+        return completed
+    
+    def finish(self) -> Optional[Dict]:
+        """Close the current window and return it (None if empty)"""
+        if not self._texts:
+            return None
+        window = {"start": self._start, "end": self._end, "text": " ".join(self._texts)}
+        self._texts = []
+        return window
+
+
+def summarize_window(text: str, engine: str) -> Dict:
+    """
+    Summarize one window, memoized by content hash
+    Unchanged windows are served from the cache when a transcript is edited.
+    """
+    key = hashlib.sha1(f"{engine}\0{text}".encode("utf-8")).hexdigest()
+    
+    with _window_cache_lock:
+        cached = _window_cache.get(key)
+        if cached is not None:
+            _window_cache.move_to_end(key)
+            _window_cache_stats["hits"] += 1
+            return cached
+        _window_cache_stats["misses"] += 1
+    
+    summary = _summarize_flat(text, engine)
+    
+    with _window_cache_lock:
+        _window_cache[key] = summary
+        while len(_window_cache) > settings.SUMMARIZER_WINDOW_CACHE_SIZE:
+            _window_cache.popitem(last=False)
+    
+    return summary
+
+
+def clear_window_cache():
+    """Drop all cached window summaries (stats are kept)"""
+    with _window_cache_lock:
+        _window_cache.clear()
+
+
+def window_cache_stats() -> Dict:
+    """Hit/miss counters and current size of the window cache"""
+    with _window_cache_lock:
+        return {**_window_cache_stats, "size": len(_window_cache)}
+
+
+def _round_robin(groups: List[List[str]], limit: int) -> List[str]:
+    """Take items from each group in turn so every window is represented"""
+    picked = []
+    depth = 0
+    while len(picked) < limit and any(depth < len(g) for g in groups):
+        for group in groups:
+            if depth < len(group) and group[depth] not in picked:
+                picked.append(group[depth])
+                if len(picked) >= limit:
+                    break
+        depth += 1
+    return picked
+
+
+def _merge_unique(groups: List[List[str]], limit: int) -> List[str]:
+    """Concatenate groups in order, dropping duplicates"""
+    merged = []
+    for group in groups:
+        for item in group:
+            if item not in merged:
+                merged.append(item)
+    return merged[:limit]
+
+
 def clean_text(text: str) -> str:
     """
     Clean filler words and normalize text for better summarization
@@ -130,6 +462,164 @@ def extract_key_points(sentences: List[str], max_points: int = 5) -> List[str]:
     return key_points[:max_points]
 
 
+def rank_key_points(sentences: List[str], max_points: int = 5,
+                    window: Optional[int] = None) -> List[str]:
+    """
+    Extract key points with an extractive TextRank ranker
+    
+    Sentences become TF-IDF vectors. Centrality is computed with PageRank over
+    the cosine-similarity graph inside fixed windows of consecutive sentences,
+    so the cost is O(n * window) instead of O(n^2) for long meetings. Local
+    centrality is blended with similarity to the whole-meeting centroid so
+    globally relevant sentences win across windows.
+    
+    Points are returned in transcript order.
+    """
+    if not sentences:
+        return []
+    
+    import numpy as np
+    
+    window = max(2, window or settings.SUMMARIZER_SENTENCE_WINDOW)
+    rows, cols, vals = _tfidf_coo(sentences)
+    n = len(sentences)
+    
+    if len(vals) == 0:
+        return extract_key_points(sentences, max_points)
+    
+    centrality = _windowed_pagerank(rows, cols, vals, n, window)
+    
+    # Similarity to the centroid of the whole meeting
+    vocab_size = int(cols.max()) + 1
+    centroid = np.bincount(cols, weights=vals, minlength=vocab_size)
+    centroid /= np.linalg.norm(centroid) or 1.0
+    coverage = np.bincount(rows, weights=vals * centroid[cols], minlength=n)
+    
+    scores = 0.5 * centrality / (centrality.max() or 1.0) + 0.5 * coverage / (coverage.max() or 1.0)
+    
+    # Pick the best sentences, skipping near-duplicates of ones already chosen
+    starts = np.searchsorted(rows, np.arange(n + 1))
+    
+    def vector(idx: int) -> Dict[int, float]:
+        lo, hi = starts[idx], starts[idx + 1]
+        return dict(zip(cols[lo:hi].tolist(), vals[lo:hi].tolist()))
+    
+    chosen = {}
+    for idx in np.argsort(-scores, kind="stable"):
+        if len(chosen) >= max_points:
+            break
+        candidate = vector(int(idx))
+        if any(_cosine(candidate, other) > 0.7 for other in chosen.values()):
+            continue
+        chosen[int(idx)] = candidate
+    
+    key_points = []
+    for idx in sorted(chosen):
+        formatted = format_bullet(sentences[idx])
+        if formatted not in key_points:
+            key_points.append(formatted)
+    
+    return key_points
+
+
+def _tfidf_coo(sentences: List[str]):
+    """
+    Build L2-normalised TF-IDF sentence vectors in COO form (rows, cols, vals)
+    Rows are sorted, so each sentence occupies a contiguous slice.
+    """
+    import numpy as np
+    
+    vocab = {}
+    doc_freq = Counter()
+    counts = []
+    for sentence in sentences:
+        terms = Counter(
+            w for w in WORD_PATTERN.findall(sentence.lower())
+            if len(w) > 2 and w not in STOP_WORDS
+        )
+        counts.append(terms)
+        doc_freq.update(terms.keys())
+    
+    rows, cols, tfs = [], [], []
+    for i, terms in enumerate(counts):
+        for term, count in terms.items():
+            rows.append(i)
+            cols.append(vocab.setdefault(term, len(vocab)))
+            tfs.append(count)
+    
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    if len(rows) == 0:
+        return rows, cols, np.zeros(0)
+    
+    df = np.zeros(len(vocab))
+    for term, idx in vocab.items():
+        df[idx] = doc_freq[term]
+    idf = np.log((1 + len(sentences)) / (1 + df)) + 1.0
+    
+    vals = (1.0 + np.log(np.asarray(tfs, dtype=np.float64))) * idf[cols]
+    norms = np.sqrt(np.bincount(rows, weights=vals ** 2, minlength=len(sentences)))
+    vals /= norms[rows]
+    return rows, cols, vals
+
+
+def _windowed_pagerank(rows, cols, vals, n: int, window: int,
+                       damping: float = 0.85, iterations: int = 30):
+    """
+    PageRank centrality over the sentence similarity graph, computed
+    independently inside consecutive windows of `window` sentences.
+    Scores are scaled so every window has mean 1.
+    """
+    import numpy as np
+    
+    bounds = np.searchsorted(rows, np.arange(0, n + window, window))
+    if SCIPY_AVAILABLE:
+        from scipy import sparse
+        matrix = sparse.csr_matrix((vals, (rows, cols)), shape=(n, int(cols.max()) + 1))
+    
+    scores = np.ones(n)
+    for start in range(0, n, window):
+        stop = min(start + window, n)
+        size = stop - start
+        if size < 2:
+            continue
+        
+        if SCIPY_AVAILABLE:
+            block = matrix[start:stop]
+            sim = (block @ block.T).toarray()
+        else:
+            lo, hi = bounds[start // window], bounds[start // window + 1]
+            local_cols, inverse = np.unique(cols[lo:hi], return_inverse=True)
+            block = np.zeros((size, len(local_cols)))
+            block[rows[lo:hi] - start, inverse] = vals[lo:hi]
+            sim = block @ block.T
+        
+        np.fill_diagonal(sim, 0.0)
+        out_weight = sim.sum(axis=1, keepdims=True)
+        transition = np.divide(sim, out_weight, out=np.full_like(sim, 1.0 / size), where=out_weight > 0)
+        
+        rank = np.full(size, 1.0 / size)
+        for _ in range(iterations):
+            updated = (1 - damping) / size + damping * (rank @ transition)
+            if np.abs(updated - rank).sum() < 1e-6:
+                rank = updated
+                break
+            rank = updated
+        
+        scores[start:stop] = rank * size
+    
+    return scores
+
+
+def _cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    """Cosine similarity of two L2-normalised sparse vectors"""
+    if not a or not b:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
 def extract_decisions(sentences: List[str]) -> List[str]:
     """
     Extract sentences that look like decisions
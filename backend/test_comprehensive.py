@@ -280,6 +280,17 @@ def test_7_export_session(session_id):
         assert "Generated by Verba" in markdown
         print_test("Has Verba attribution", True)
         
+        etag = response.headers.get("ETag")
+        assert etag
+        print_test("Has ETag header", True, etag)
+        
+        cached = requests.get(
+            f"{API_URL}/api/sessions/{session_id}/export",
+            headers={"If-None-Match": etag}
+        )
+        assert cached.status_code == 304
+        print_test("Repeat export returns 304", True)
+        
         return True
     except Exception as e:
         print_test("Export session", False, str(e))
@@ -315,6 +326,37 @@ def test_8_delete_session(session_id):
         print_test("Delete session", False, str(e))
         return False
 
+def test_9_process_endpoint():
+    """Line-by-line: Test /api/process (transcribe + summarize + save)"""
+    print("\n📝 TEST 9: Process Endpoint")
+    try:
+        audio_data = b'RIFF' + b'\\x00' * 100  # Minimal mock audio
+        files = {'audio': ('test.webm', BytesIO(audio_data), 'audio/webm')}
+        
+        response = requests.post(f"{API_URL}/api/process", files=files)
+        
+        assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+        print_test("Status code 200", True)
+        
+        data = response.json()
+        
+        assert len(data["transcript"]) > 0
+        print_test("Transcript not empty", True, f"{len(data['transcript'])} chars")
+        
+        assert "key_points" in data["summary"]
+        print_test("Has summary", True)
+        
+        assert data["session_id"]
+        print_test("Session saved", True, f"ID={data['session_id'][:8]}...")
+        
+        # Clean up the session created by this test
+        requests.delete(f"{API_URL}/api/sessions/{data['session_id']}")
+        
+        return True
+    except Exception as e:
+        print_test("Process endpoint", False, str(e))
+        return False
+
 def main():
     print("=" * 70)
     print("🔬 COMPREHENSIVE LINE-BY-LINE VERIFICATION TEST")
@@ -352,6 +394,8 @@ def main():
             results.append(("Export Session", test_7_export_session(session_id)))
             results.append(("Delete Session", test_8_delete_session(session_id)))
     
+    results.append(("Process Endpoint", test_9_process_endpoint()))
+    
     # Summary
     print("\n" + "=" * 70)
     print("📊 FINAL SUMMARY")
@@ -0,0 +1,98 @@
+"""
+Unit tests for the job queue (no server needed)
+Run with: python -m pytest -q test_jobs.py
+"""
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from jobs import JobManager, JobCancelled
+
+
+def test_cancelling_a_running_job_twice_keeps_it_cancelling():
+    started, release = threading.Event(), threading.Event()
+    
+    def decode(job):
+        started.set()
+        release.wait(5)
+        if job.cancel_event.is_set():
+            raise RuntimeError("stopped at checkpoint")
+        return {"ok": True}
+    
+    manager = JobManager(1)
+    job = manager.submit("process", decode)
+    assert started.wait(5)
+    
+    assert manager.cancel(job.id).status == "cancelling"
+    assert manager.cancel(job.id).status == "cancelling"
+    assert manager.detach(job.id).status == "cancelling"
+    
+    release.set()
+    with pytest.raises(JobCancelled):
+        job.future.result(5)
+    assert job.status == "cancelled"
+    assert manager.cancel(job.id).status == "cancelled"
+
+
+def test_cancelling_a_queued_job_twice():
+    started, release = threading.Event(), threading.Event()
+    manager = JobManager(1)
+    blocker = manager.submit("process", lambda job: started.set() or release.wait(5))
+    assert started.wait(5)
+    queued = manager.submit("process", lambda job: None)
+    
+    assert manager.cancel(queued.id).status == "cancelled"
+    assert manager.cancel(queued.id).status == "cancelled"
+    assert manager.queue_depth() == 0
+    with pytest.raises(JobCancelled):
+        queued.future.result(0)
+    
+    release.set()
+    assert blocker.future.result(5) is True
+
+
+@pytest.fixture
+def workers(tmp_path, monkeypatch):
+    """This worker's storage and another worker's, on one database"""
+    import app as app_module
+    import pipeline
+    from storage import StorageManager
+    
+    path = str(tmp_path / "sessions.db")
+    mine, other = StorageManager(path), StorageManager(path)
+    monkeypatch.setattr(app_module, "storage", mine)
+    monkeypatch.setattr(pipeline, "storage", mine)
+    yield TestClient(app_module.app), other
+    mine.engine.dispose()
+    other.engine.dispose()
+
+
+def test_any_worker_reports_and_cancels_a_job_it_doesnt_hold(workers):
+    client, other = workers
+    other.save_job("remote-job", "process", "/tmp/remote.wav", {}, cost=12.0)
+    
+    assert client.get("/api/jobs/remote-job").json()["status"] == "queued"
+    assert other.start_job("remote-job")
+    assert client.get("/api/jobs/remote-job").json()["status"] == "running"
+    
+    response = client.delete("/api/jobs/remote-job")
+    assert response.status_code == 200 and response.json()["status"] == "cancelling"
+    assert other.cancel_requested("remote-job")
+    
+    other.finish_job("remote-job", "cancelled")
+    assert client.get("/api/jobs/remote-job").json()["status"] == "cancelled"
+    assert client.get("/api/jobs/unknown-job").status_code == 404
+
+
+def test_any_worker_returns_a_finished_jobs_result(workers):
+    client, other = workers
+    other.save_job("done-job", "transcribe", "/tmp/done.wav", {})
+    other.finish_job("done-job", "completed", {"transcript": "Ship it on Friday."})
+    other.save_job("failed-job", "process", "/tmp/failed.wav", {})
+    other.finish_job("failed-job", "failed", error="Decoding failed")
+    
+    state = client.get("/api/jobs/done-job").json()
+    assert state["status"] == "completed" and state["result"] == {"transcript": "Ship it on Friday."}
+    assert client.get("/api/jobs/failed-job").json()["error"] == "Decoding failed"
+    assert client.delete("/api/jobs/done-job").status_code == 409
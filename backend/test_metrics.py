@@ -0,0 +1,56 @@
+"""
+Unit tests for merging metrics across server processes (no server needed)
+Run with: python -m pytest -q test_metrics.py
+"""
+import json
+import os
+
+import metrics
+
+
+def sample(text, line_start):
+    return [line for line in text.splitlines() if line.startswith(line_start)]
+
+
+def test_render_directory_merges_every_process(tmp_path, monkeypatch):
+    registry = []
+    monkeypatch.setattr(metrics, "_registry", registry)
+    requests = metrics.Counter("test_requests_total", "Requests", labels=("route",))
+    depth = metrics.Gauge("test_queue_depth", "Queued jobs", aggregate="sum")
+    loaded = metrics.Gauge("test_model_load_seconds", "Model load time")
+    latency = metrics.Histogram("test_latency_seconds", "Latency", buckets=(0.1, 1))
+    
+    requests.inc(2, route="jobs")
+    depth.set(1)
+    loaded.set(3.0)
+    latency.observe(0.05)
+    
+    other = {
+        "test_requests_total": [[["jobs"], 5], [["search"], 1]],
+        "test_queue_depth": [[[], 4]],
+        "test_model_load_seconds": [[[], 2.0]],
+        "test_latency_seconds": [[[], [[0, 1, 0], 0.5, 1]]]
+    }
+    (tmp_path / "999999001.json").write_text(json.dumps(other))
+    # An exited worker still counts towards totals, not towards gauges
+    (tmp_path / "dead-999999002.json").write_text(json.dumps(other))
+    
+    text = metrics.render_directory(str(tmp_path))
+    
+    assert os.path.exists(tmp_path / f"{os.getpid()}.json")
+    assert sample(text, "test_requests_total{") == ['test_requests_total{route="jobs"} 12',
+                                                    'test_requests_total{route="search"} 2']
+    assert sample(text, "test_queue_depth ") == ["test_queue_depth 5"]
+    assert sample(text, "test_model_load_seconds ") == ["test_model_load_seconds 3"]
+    assert 'test_latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{le="1"} 3' in text
+    assert "test_latency_seconds_count 3" in text
+
+
+def test_retired_snapshot_keeps_counters(tmp_path):
+    (tmp_path / "4242.json").write_text("{}")
+    
+    metrics.retire_snapshot(str(tmp_path), 4242)
+    metrics.retire_snapshot(str(tmp_path), 4343)
+    
+    assert sorted(os.listdir(tmp_path)) == ["dead-4242.json"]
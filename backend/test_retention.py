@@ -0,0 +1,141 @@
+"""
+Unit tests for retention: batched purges and incremental vacuum
+Run with: python -m pytest -q test_retention.py
+"""
+import sqlite3
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+import retention
+import settings
+from storage import StorageManager, import_row
+
+SESSIONS = 25
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    """A database of SESSIONS sessions, the i-th created SESSIONS - i days ago"""
+    manager = StorageManager(str(tmp_path / "sessions.db"))
+    now = datetime.utcnow()
+    manager.import_sessions([import_row({
+        "id": str(uuid.uuid4()),
+        "created_at": (now - timedelta(days=SESSIONS - i)).isoformat(),
+        "transcript": f"Session {i}. " + "Words spoken in the meeting. " * 700,
+        "summary": {"key_points": [], "decisions": [], "action_items": []}
+    }) for i in range(SESSIONS)])
+    
+    monkeypatch.setattr(retention, "storage", manager)
+    monkeypatch.setattr(retention, "PAUSE_SECONDS", 0)
+    for name in ("RETENTION_MAX_AGE_DAYS", "RETENTION_MAX_SESSIONS", "RETENTION_MAX_DB_BYTES"):
+        monkeypatch.setattr(settings, name, 0)
+    monkeypatch.setattr(settings, "RETENTION_BATCH_SIZE", 4)
+    yield manager
+    manager.engine.dispose()
+
+
+@pytest.fixture
+def batches(manager, monkeypatch):
+    """Sizes of the delete_sessions calls made by retention"""
+    sizes = []
+    delete_sessions = manager.delete_sessions
+    
+    def record(ids):
+        sizes.append(len(ids))
+        return delete_sessions(ids)
+    
+    monkeypatch.setattr(manager, "delete_sessions", record)
+    return sizes
+
+
+def remaining(manager):
+    return sorted(int(s["transcript"].split(".")[0].split()[1]) for s in manager.iter_sessions())
+
+
+def test_purge_by_age_runs_in_batches(manager, batches, monkeypatch):
+    monkeypatch.setattr(settings, "RETENTION_MAX_AGE_DAYS", 10.5)
+    
+    purged = retention.enforce()
+    
+    assert purged == {"age": 15, "count": 0, "size": 0}
+    assert batches == [4, 4, 4, 3]
+    assert remaining(manager) == list(range(15, SESSIONS))
+
+
+def test_purge_by_count_keeps_the_newest(manager, batches, monkeypatch):
+    monkeypatch.setattr(settings, "RETENTION_MAX_SESSIONS", 5)
+    
+    purged = retention.enforce()
+    
+    assert purged["count"] == 20
+    assert max(batches) <= 4
+    assert remaining(manager) == list(range(20, SESSIONS))
+
+
+def test_purge_by_size_drops_the_oldest_and_vacuums(manager, monkeypatch):
+    used = manager.database_size()["used_bytes"]
+    monkeypatch.setattr(settings, "RETENTION_MAX_DB_BYTES", manager.session_bytes() // 2)
+    
+    purged = retention.enforce()
+    
+    assert purged["size"] > 0
+    assert manager.session_bytes() <= settings.RETENTION_MAX_DB_BYTES
+    assert remaining(manager) == list(range(purged["size"], SESSIONS))
+    # Freed pages went back to the filesystem: the file holds no free pages
+    size = manager.database_size()
+    assert size["free_bytes"] == 0
+    assert size["used_bytes"] < used
+
+
+def fill_job_checkpoints(manager, count=40):
+    """Data that deleting sessions doesn't free"""
+    for i in range(count):
+        manager.save_job(f"job-{i}", "process", "/tmp/audio.wav", {"segments": ["Words spoken. " * 700]})
+
+
+def test_purge_by_size_ignores_data_sessions_dont_own(manager, batches, monkeypatch):
+    fill_job_checkpoints(manager)
+    # The database is over the cap, the sessions in it are not
+    monkeypatch.setattr(settings, "RETENTION_MAX_DB_BYTES", manager.session_bytes())
+    assert manager.database_size()["used_bytes"] > settings.RETENTION_MAX_DB_BYTES + 100_000
+    
+    assert retention.enforce()["size"] == 0
+    assert batches == []
+    assert len(remaining(manager)) == SESSIONS
+
+
+def test_purge_by_size_without_dbstat_stops_when_nothing_is_freed(manager, batches, monkeypatch):
+    fill_job_checkpoints(manager)
+    monkeypatch.setattr(manager, "session_bytes", lambda: None)
+    monkeypatch.setattr(settings, "RETENTION_MAX_DB_BYTES", 1)
+    database_size = manager.database_size
+    sizes = iter([10_000_000, 9_000_000, 9_000_000])
+    monkeypatch.setattr(manager, "database_size", lambda: {**database_size(), "used_bytes": next(sizes, 0)})
+    
+    assert retention.enforce()["size"] == 8
+    assert batches == [4, 4]
+    assert len(remaining(manager)) == SESSIONS - 8
+
+
+def test_no_limits_purge_nothing(manager, batches):
+    assert retention.enforce() == {"age": 0, "count": 0, "size": 0}
+    assert batches == []
+
+
+def test_old_database_is_only_converted_on_request(tmp_path, monkeypatch):
+    """Opening a database without incremental vacuum doesn't run a full VACUUM"""
+    path = str(tmp_path / "old.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE notes (text TEXT)")
+    manager = StorageManager(path)
+    monkeypatch.setattr(retention, "storage", manager)
+    
+    with manager.engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 0
+    
+    retention.convert()
+    with manager.engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
+    manager.engine.dispose()
@@ -0,0 +1,37 @@
+"""
+Unit tests for semantic search configuration (no model needed)
+Run with: python -m pytest -q test_search.py
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+pytest.importorskip("numpy")
+
+import app as app_module
+import search
+import settings
+from search import HashingEmbedder, SemanticIndex
+from storage import StorageManager
+
+
+@pytest.mark.parametrize("model, installed", [("", True), ("models/missing", False),
+                                              ("sentence-transformers/all-MiniLM-L6-v2", True)])
+def test_without_a_local_model_the_hashing_embedder_is_used(model, installed, monkeypatch, capsys):
+    monkeypatch.setattr(settings, "SEMANTIC_MODEL", model)
+    monkeypatch.setattr(search, "SENTENCE_TRANSFORMERS_AVAILABLE", installed)
+    
+    assert search._load_embedder().kind == "hashing"
+    assert "WARNING" in capsys.readouterr().out
+
+
+def test_search_response_names_the_embedder(tmp_path, monkeypatch):
+    manager = StorageManager(str(tmp_path / "sessions.db"))
+    index = SemanticIndex(manager, embedder=HashingEmbedder(64))
+    monkeypatch.setattr(app_module, "semantic_index", index)
+    monkeypatch.setattr(settings, "SEMANTIC_SEARCH", True)
+    
+    body = TestClient(app_module.app).get("/api/search/semantic", params={"q": "delay the release"}).json()
+    
+    assert body["embedder"] == "hashing"
+    assert "paraphrases" in body["warning"]
+    manager.engine.dispose()
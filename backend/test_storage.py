@@ -0,0 +1,317 @@
+"""
+Unit tests for the storage layer (no server needed)
+Each test works on its own SQLite file.
+Run with: python -m pytest -q test_storage.py
+"""
+import os
+import threading
+import uuid
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+import settings
+from storage import StorageManager, import_row
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = StorageManager(str(tmp_path / "sessions.db"))
+    yield manager
+    manager.engine.dispose()
+
+
+def exported(session_id=None, transcript="We agreed to ship on Friday.", **summary):
+    """A session in the export format"""
+    return {
+        "id": session_id or str(uuid.uuid4()),
+        "created_at": "2024-05-01T10:00:00",
+        "transcript": transcript,
+        "summary": {"key_points": [], "decisions": [], "action_items": [], **summary}
+    }
+
+
+def test_import_row_rejects_invalid_records():
+    for record in [None, [], {}, {"transcript": 42, "summary": {}},
+                   {"transcript": "text"}, {"transcript": "text", "summary": "not an object"}]:
+        with pytest.raises(ValueError):
+            import_row(record)
+    
+    with pytest.raises(ValueError):
+        import_row({"transcript": "text", "summary": {}, "created_at": "not a date"})
+    
+    row = import_row({"transcript": "text", "summary_json": "{}"})
+    assert row["summary_json"] == "{}"
+    assert row["model"] is None and row["id"]
+
+
+def test_import_skip_keeps_existing_sessions(manager):
+    session_id = str(uuid.uuid4())
+    assert manager.import_sessions([import_row(exported(session_id))]) == {"imported": 1, "updated": 0, "skipped": 0}
+    
+    counts = manager.import_sessions([import_row(exported(session_id, "Changed")),
+                                      import_row(exported())])
+    
+    assert counts == {"imported": 1, "updated": 0, "skipped": 1}
+    assert manager.get_session(session_id)["transcript"] == "We agreed to ship on Friday."
+
+
+def test_import_replace_overwrites_and_bumps_version(manager):
+    session_id = str(uuid.uuid4())
+    manager.import_sessions([import_row(exported(session_id))])
+    version = manager.session_version(session_id)
+    
+    counts = manager.import_sessions([import_row(exported(session_id, "Changed", key_points=["New"]))],
+                                     on_conflict="replace")
+    
+    assert counts == {"imported": 0, "updated": 1, "skipped": 0}
+    session = manager.get_session(session_id)
+    assert session["transcript"] == "Changed"
+    assert session["summary"]["key_points"] == ["New"]
+    assert manager.session_version(session_id) != version
+
+
+def test_import_new_id_copies_conflicting_sessions(manager):
+    session_id = str(uuid.uuid4())
+    manager.import_sessions([import_row(exported(session_id))])
+    
+    counts = manager.import_sessions([import_row(exported(session_id, "Copy"))], on_conflict="new_id")
+    
+    assert counts == {"imported": 1, "updated": 0, "skipped": 0}
+    assert manager.get_session(session_id)["transcript"] == "We agreed to ship on Friday."
+    assert sorted(s["transcript"] for s in manager.iter_sessions()) == ["Copy", "We agreed to ship on Friday."]
+
+
+def test_import_rejects_unknown_conflict_policy(manager):
+    with pytest.raises(ValueError):
+        manager.import_sessions([import_row(exported())], on_conflict="merge")
+
+
+def test_cached_session_is_served_without_a_query(manager):
+    session_id = str(uuid.uuid4())
+    manager.import_sessions([import_row(exported(session_id))])
+    assert manager.get_session(session_id) is not None
+    
+    queries = count_events(manager, "before_cursor_execute")
+    assert manager.get_session(session_id)["transcript"] == "We agreed to ship on Friday."
+    assert queries["count"] == 0
+    
+    manager.update_session(session_id, "Refined", {"key_points": []})
+    assert manager.get_session(session_id)["transcript"] == "Refined"
+    manager.delete_session(session_id)
+    assert manager.get_session(session_id) is None
+
+
+def test_cached_session_follows_changes_from_another_worker(tmp_path, monkeypatch):
+    """Two managers on one file stand in for two server workers with their own caches"""
+    monkeypatch.setattr(settings, "SERVER_WORKERS", 2)
+    path = str(tmp_path / "sessions.db")
+    worker, other = StorageManager(path), StorageManager(path)
+    session_id = str(uuid.uuid4())
+    worker.import_sessions([import_row(exported(session_id))])
+    
+    assert worker.get_session(session_id)["transcript"] == "We agreed to ship on Friday."
+    assert worker.get_session(session_id) is not None
+    assert worker.session_cache.stats()["hits"] == 1
+    
+    other.update_session(session_id, "Refined", {"key_points": ["Refined"]})
+    assert worker.get_session(session_id)["transcript"] == "Refined"
+    
+    other.import_sessions([import_row(exported(session_id, "Restored"))], on_conflict="replace")
+    assert worker.get_session(session_id)["transcript"] == "Restored"
+    
+    other.delete_session(session_id)
+    assert worker.get_session(session_id) is None
+    
+    worker.engine.dispose()
+    other.engine.dispose()
+
+
+def test_cached_export_follows_changes_from_another_worker(tmp_path, monkeypatch):
+    import exporter
+    
+    monkeypatch.setattr(settings, "SERVER_WORKERS", 2)
+    path = str(tmp_path / "sessions.db")
+    worker, other = StorageManager(path), StorageManager(path)
+    monkeypatch.setattr(exporter, "storage", worker)
+    monkeypatch.setattr(exporter, "export_cache", exporter.ExportCache(1 << 20))
+    session_id = str(uuid.uuid4())
+    worker.import_sessions([import_row(exported(session_id))])
+    
+    etag, _ = exporter.get_export(session_id)
+    assert exporter.get_export(session_id)[0] == etag
+    
+    other.update_session(session_id, "Refined", {"key_points": ["Refined point"], "decisions": [], "action_items": []})
+    etag_after, body = exporter.get_export(session_id)
+    assert etag_after != etag and b"Refined point" in body
+    
+    other.delete_session(session_id)
+    assert exporter.get_export(session_id) is None
+    
+    worker.engine.dispose()
+    other.engine.dispose()
+
+
+def count_events(manager, name):
+    counter = {"count": 0}
+    
+    def on_event(*args):
+        counter["count"] += 1
+    
+    event.listen(manager.engine, name, on_event)
+    return counter
+
+
+def insert_concurrently(manager, count):
+    """create_session from `count` threads at once; returns (session IDs, errors)"""
+    barrier = threading.Barrier(count)
+    ids, errors = [], []
+    
+    def insert(i):
+        barrier.wait()
+        try:
+            ids.append(manager.create_session(f"Transcript {i}", {"key_points": []}))
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=insert, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return ids, errors
+
+
+def test_without_group_commit_every_insert_commits_alone(manager):
+    commits = count_events(manager, "commit")
+    
+    ids, errors = insert_concurrently(manager, 8)
+    
+    assert manager._batcher is None
+    assert not errors and len(ids) == 8
+    assert commits["count"] == 8
+
+
+def test_group_commit_shares_transactions(tmp_path):
+    manager = StorageManager(str(tmp_path / "sessions.db"), group_commit_ms=50)
+    commits = count_events(manager, "commit")
+    
+    ids, errors = insert_concurrently(manager, 16)
+    
+    assert not errors
+    assert all(manager.get_session(session_id) for session_id in ids) and len(ids) == 16
+    assert commits["count"] < 16
+    manager.engine.dispose()
+
+
+def test_group_commit_failure_reaches_every_caller(tmp_path):
+    manager = StorageManager(str(tmp_path / "sessions.db"), group_commit_ms=50)
+    rollbacks = count_events(manager, "rollback")
+    with manager.engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE sessions")
+    
+    ids, errors = insert_concurrently(manager, 8)
+    
+    assert not ids
+    assert len(errors) == 8 and all(isinstance(e, OperationalError) for e in errors)
+    # Callers that shared a failed transaction all got its error
+    assert rollbacks["count"] < 8
+    manager.engine.dispose()
+
+
+def test_pid_probe_never_signals_on_windows(monkeypatch):
+    import storage
+    probed = []
+    monkeypatch.setattr(storage.os, "name", "nt")
+    monkeypatch.setattr(storage, "_pid_alive_windows", lambda pid: probed.append(pid) or False)
+    monkeypatch.setattr(storage.os, "kill", lambda *args: pytest.fail("os.kill terminates processes on Windows"))
+    
+    assert storage._pid_alive(4242) is False
+    assert probed == [4242]
+
+
+def test_claim_jobs_takes_over_dead_owners_only(manager, monkeypatch):
+    import storage
+    manager.save_job("mine", "process", "/tmp/a.wav", {})
+    manager.save_job("dead", "process", "/tmp/b.wav", {})
+    manager.save_job("alive", "process", "/tmp/c.wav", {})
+    table = storage.JobCheckpoint.__table__
+    with manager.engine.begin() as conn:
+        conn.execute(table.update().where(table.c.id == "dead").values(owner=999999001))
+        conn.execute(table.update().where(table.c.id == "alive").values(owner=999999002))
+    monkeypatch.setattr(storage, "_pid_alive", lambda pid: pid == 999999002)
+    
+    assert sorted(job["id"] for job in manager.claim_jobs("process")) == ["dead", "mine"]
+
+
+def test_cached_export_is_served_without_a_query(manager, monkeypatch):
+    import exporter
+    
+    monkeypatch.setattr(exporter, "storage", manager)
+    monkeypatch.setattr(exporter, "export_cache", exporter.ExportCache(1 << 20))
+    session_id = str(uuid.uuid4())
+    manager.import_sessions([import_row(exported(session_id))])
+    etag, _ = exporter.get_export(session_id)
+    
+    queries = count_events(manager, "before_cursor_execute")
+    assert exporter.get_export(session_id)[0] == etag
+    assert queries["count"] == 0
+
+
+def test_identical_jobs_are_shared_while_their_owner_lives(manager, monkeypatch):
+    import storage
+    alive = {os.getpid()}
+    monkeypatch.setattr(storage, "_pid_alive", lambda pid: pid in alive)
+    
+    assert manager.save_job("first", "process", "/tmp/a.wav", {}, key="same audio") == "first"
+    assert manager.save_job("second", "process", "/tmp/b.wav", {}, key="same audio") == "first"
+    assert manager.save_job("third", "process", "/tmp/c.wav", {}, key="other audio") == "third"
+    
+    # Owned by a worker that died: not shared (it is resumed by claim_jobs instead)
+    table = storage.JobCheckpoint.__table__
+    with manager.engine.begin() as conn:
+        conn.execute(table.update().where(table.c.id == "first").values(owner=999999001))
+    assert manager.save_job("fourth", "process", "/tmp/d.wav", {}, key="same audio") == "fourth"
+    
+    manager.finish_job("fourth", "completed", {"transcript": ""})
+    assert manager.save_job("fifth", "process", "/tmp/e.wav", {}, key="same audio") == "fifth"
+
+
+def test_cancel_requested_before_a_job_starts(manager):
+    manager.save_job("job", "process", "/tmp/a.wav", {})
+    
+    assert manager.request_cancel("job")["status"] == "cancelling"
+    assert manager.start_job("job") is False
+    assert manager.request_cancel("missing") is None
+
+
+def test_finished_jobs_are_kept_up_to_the_history_limit(manager, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_HISTORY", 2)
+    for i in range(4):
+        manager.save_job(f"job-{i}", "process", "/tmp/a.wav", {})
+        manager.finish_job(f"job-{i}", "completed", {"index": i})
+    manager.save_job("running", "process", "/tmp/a.wav", {})
+    
+    assert [manager.get_job(f"job-{i}") is not None for i in range(4)] == [False, False, True, True]
+    assert manager.get_job("job-3")["result"] == {"index": 3}
+    assert manager.get_job("running")["status"] == "queued"
+    assert [job["id"] for job in manager.claim_jobs("process")] == ["running"]
+
+
+def test_import_rejects_a_corrupt_line_and_keeps_the_rest(manager, monkeypatch):
+    import json
+    import app as app_module
+    from fastapi.testclient import TestClient
+    
+    monkeypatch.setattr(app_module, "storage", manager)
+    lines = [json.dumps(exported(transcript=text)).encode() for text in ("First", "Third")]
+    body = b"\n".join([lines[0], b'{"transcript": "caf\xe9"}', lines[1]])
+    
+    response = TestClient(app_module.app).post("/api/sessions/import", content=body)
+    
+    assert response.status_code == 200
+    result = response.json()
+    assert result["imported"] == 2 and result["invalid"] == 1
+    assert result["errors"][0].startswith("line 2:")
+    assert sorted(s["transcript"] for s in manager.iter_sessions()) == ["First", "Third"]
@@ -0,0 +1,109 @@
+"""
+Unit tests for the summarizer (no server needed)
+Run with: python -m pytest -q test_summarizer.py
+"""
+import pytest
+
+import summarizer
+from summarizer import (rank_key_points, extract_key_points, split_sentences, clean_text,
+                        SentenceCollector, _tfidf_coo, _windowed_pagerank)
+
+needs_numpy = pytest.mark.skipif(not summarizer.NUMPY_AVAILABLE, reason="textrank needs numpy")
+
+BUDGET_MEETING = [
+    "The budget review covers marketing budget and hiring budget for next quarter",
+    "We need to cut the marketing budget by ten percent next quarter",
+    "The hiring budget stays flat for next quarter",
+    "My cat knocked the coffee over this morning",
+    "Finance will send the revised budget numbers for marketing and hiring",
+]
+
+
+@needs_numpy
+def test_rank_key_points_prefers_central_sentences():
+    """The off-topic sentence loses to ones sharing the meeting's vocabulary"""
+    points = rank_key_points(BUDGET_MEETING, max_points=3)
+    
+    assert len(points) == 3
+    assert not any("cat" in p for p in points)
+    assert points[0].startswith("The budget review")
+
+
+@needs_numpy
+def test_rank_key_points_keeps_transcript_order_and_is_deterministic():
+    points = rank_key_points(BUDGET_MEETING, max_points=4)
+    
+    positions = [next(i for i, s in enumerate(BUDGET_MEETING) if s.startswith(p)) for p in points]
+    assert positions == sorted(positions)
+    assert rank_key_points(BUDGET_MEETING, max_points=4) == points
+
+
+@needs_numpy
+def test_rank_key_points_drops_near_duplicates():
+    sentences = [
+        "Deploy the billing service on friday afternoon",
+        "Deploy the billing service on friday afternoon please",
+        "Security audit finished for the payments database",
+        "Friday billing deploy needs a rollback plan",
+    ]
+    points = rank_key_points(sentences, max_points=4)
+    
+    assert sum(p.startswith("Deploy the billing service") for p in points) == 1
+    assert len(points) == 3
+
+
+@needs_numpy
+def test_rank_key_points_short_transcript_fallback():
+    """Without any content words there is no graph; the heuristic picks instead"""
+    sentences = ["It was the one that we did", "And so it is what it was"]
+    
+    assert rank_key_points([]) == []
+    assert rank_key_points(sentences) == extract_key_points(sentences)
+    assert rank_key_points(["Only one sentence about the roadmap"]) == ["Only one sentence about the roadmap"]
+
+
+@needs_numpy
+def test_windowed_pagerank_scales_each_window_to_mean_one():
+    rows, cols, vals = _tfidf_coo(BUDGET_MEETING)
+    
+    scores = _windowed_pagerank(rows, cols, vals, len(BUDGET_MEETING), window=5)
+    assert scores.mean() == pytest.approx(1.0)
+    assert scores.argmin() == 3  # the off-topic sentence
+    
+    # Windows of two: each pair is ranked on its own, the leftover sentence keeps 1
+    scores = _windowed_pagerank(rows, cols, vals, len(BUDGET_MEETING), window=2)
+    assert scores[:4].reshape(2, 2).mean(axis=1) == pytest.approx([1.0, 1.0])
+    assert scores[4] == 1.0
+
+
+def test_split_windows_keeps_boundaries_after_an_edit_near_the_start(monkeypatch):
+    """Inserting a sentence at the start only changes the first window"""
+    monkeypatch.setattr(summarizer.settings, "SUMMARIZER_WINDOW_SENTENCES", 20)
+    transcript = " ".join(f"Item number {i} on the agenda was discussed by the team." for i in range(600))
+    
+    before = [w["text"] for w in summarizer.split_windows(transcript)]
+    after = [w["text"] for w in summarizer.split_windows("A new opening remark was made. " + transcript)]
+    
+    assert len(before) > 10
+    assert len(set(before) & set(after)) >= len(before) - 2
+    
+    summarizer.clear_window_cache()
+    start = summarizer.window_cache_stats()
+    summarizer.summarize_hierarchical(transcript, engine="heuristic")
+    summarizer.summarize_hierarchical("A new opening remark was made. " + transcript, engine="heuristic")
+    stats = summarizer.window_cache_stats()
+    assert stats["hits"] - start["hits"] >= len(before) - 2
+
+
+def test_sentence_collector_matches_whole_transcript_cleanup():
+    """Cleaning segment by segment gives the same sentences as cleaning the joined transcript"""
+    texts = [" So um we start.", "The budget, you", "know, is", "", " fixed at 3.5 million! Next", "item?! Yeah the",
+             "launch like moves to May. And", " um that is all"]
+    collector = SentenceCollector()
+    for text in texts:
+        collector.add(text)
+    
+    transcript = " ".join(t for t in texts if t)
+    assert collector.finish() == split_sentences(clean_text(transcript))
+    assert summarizer.summarize_sentences(split_sentences(clean_text(transcript)), "heuristic") == \
+        summarizer._summarize_flat(transcript, "heuristic")
@@ -0,0 +1,66 @@
+"""
+Unit tests for the transcriber's silence pre-check (no model needed)
+Run with: python -m pytest -q test_transcriber.py
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from transcriber import find_speech, SAMPLE_RATE, SILENCE_FRAME_SECONDS
+
+
+def levels_and_peak(pcm):
+    """Per-frame RMS levels (dBFS) and peak, as decode_pcm reports them"""
+    frame = int(SAMPLE_RATE * SILENCE_FRAME_SECONDS)
+    count = len(pcm) // frame
+    rms = np.sqrt(np.mean(np.square(pcm[:count * frame].reshape(count, frame)), axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10)), float(np.max(np.abs(pcm)))
+
+
+def tone(seconds, dbfs):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (10 ** (dbfs / 20) * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+
+def test_quiet_recording_is_not_silence():
+    """A -50 dBFS signal is speech once normalized, as the baseline transcribed it"""
+    silence = np.zeros(2 * SAMPLE_RATE, dtype=np.float32)
+    pcm = np.concatenate([silence, tone(3, -50), silence])
+    levels, peak = levels_and_peak(pcm)
+    
+    span = find_speech(levels, len(pcm), peak)
+    
+    assert span is not None
+    start, end = span
+    assert 1.4 * SAMPLE_RATE <= start <= 2 * SAMPLE_RATE
+    assert 5 * SAMPLE_RATE <= end <= 5.6 * SAMPLE_RATE
+
+
+def test_digital_silence_is_skipped():
+    for pcm in [np.zeros(3 * SAMPLE_RATE, dtype=np.float32),
+                (np.random.default_rng(0).integers(-1, 2, 3 * SAMPLE_RATE) / 32768).astype(np.float32)]:
+        levels, peak = levels_and_peak(pcm)
+        assert find_speech(levels, len(pcm), peak) is None
+
+
+def noise(seconds, dbfs, seed=0):
+    pcm = np.random.default_rng(seed).standard_normal(int(seconds * SAMPLE_RATE))
+    return (10 ** (dbfs / 20) * pcm).astype(np.float32)
+
+
+@pytest.mark.parametrize("dbfs", [-70, -60, -50])
+def test_steady_noise_is_skipped(dbfs):
+    pcm = noise(30, dbfs)
+    levels, peak = levels_and_peak(pcm)
+    
+    assert find_speech(levels, len(pcm), peak) is None
+
+
+def test_speech_over_hiss_is_trimmed_to_the_speech():
+    pcm = noise(10, -60)
+    pcm[4 * SAMPLE_RATE:6 * SAMPLE_RATE] += tone(2, -30)
+    levels, peak = levels_and_peak(pcm)
+    
+    start, end = find_speech(levels, len(pcm), peak)
+    assert 3.4 * SAMPLE_RATE <= start <= 4 * SAMPLE_RATE
+    assert 6 * SAMPLE_RATE <= end <= 6.6 * SAMPLE_RATE
@@ -0,0 +1,189 @@
+"""
+Unit tests for resumable uploads: the spool and the /api/uploads endpoints
+Uploads go to a temporary spool directory; nothing is transcribed.
+Run with: python -m pytest -q test_uploads.py
+"""
+import os
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+import settings
+import uploads
+from uploads import UploadSpool, UploadConflict, UploadStalled
+
+
+@pytest.fixture
+def spool(tmp_path, monkeypatch):
+    spool = UploadSpool(str(tmp_path / "uploads"))
+    monkeypatch.setattr(app_module, "upload_spool", spool)
+    return spool
+
+
+@pytest.fixture
+def client(spool):
+    # Not used as a context manager: startup tasks (warm-up, retention) don't run
+    return TestClient(app_module.app)
+
+
+@pytest.fixture
+def quick_stall(monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_STALL_SECONDS", 0.3)
+    monkeypatch.setattr(uploads, "POLL_SECONDS", 0.02)
+
+
+def put(client, upload_id, data: bytes, content_range):
+    headers = {"Content-Range": content_range} if content_range else {}
+    return client.put(f"/api/uploads/{upload_id}", content=data, headers=headers)
+
+
+@pytest.mark.parametrize("content_range", [
+    None, "bytes 0-9", "items 0-9/10", "bytes 5-2/10", "bytes 0-10/10", "bytes -1-3/10", "bytes a-b/10"
+])
+def test_invalid_content_range_is_rejected(client, content_range):
+    upload_id = client.post("/api/uploads", json={"filename": "talk.webm", "length": 10}).json()["upload_id"]
+    
+    response = put(client, upload_id, b"0123456789", content_range)
+    
+    assert response.status_code == 400
+    assert client.get(f"/api/uploads/{upload_id}").json()["offset"] == 0
+
+
+def test_chunks_must_continue_at_the_offset(client):
+    upload_id = client.post("/api/uploads", json={"filename": "talk.webm", "length": 10}).json()["upload_id"]
+    
+    assert put(client, upload_id, b"01234", "bytes 0-4/10").json()["offset"] == 5
+    
+    # A repeated chunk and one from further ahead both conflict and report the offset
+    for data, content_range in [(b"01234", "bytes 0-4/10"), (b"789", "bytes 7-9/10")]:
+        response = put(client, upload_id, data, content_range)
+        assert response.status_code == 409
+        assert response.json()["offset"] == 5
+    
+    state = put(client, upload_id, b"56789", "bytes 5-9/*").json()
+    assert state["offset"] == 10 and state["complete"]
+
+
+def test_chunk_must_match_its_range_and_the_upload_length(client):
+    upload_id = client.post("/api/uploads", json={"filename": "talk.webm", "length": 10}).json()["upload_id"]
+    
+    assert put(client, upload_id, b"0123456", "bytes 0-4/10").status_code == 400
+    assert put(client, upload_id, b"01234", "bytes 0-4/12").status_code == 400
+    assert put(client, "not-an-upload", b"01234", "bytes 0-4/10").status_code == 404
+    assert client.get(f"/api/uploads/{upload_id}").json()["offset"] == 0
+
+
+def test_resume_after_a_dropped_connection(client, spool):
+    upload_id = client.post("/api/uploads", json={"filename": "talk.webm"}).json()["upload_id"]
+    
+    # The client drops mid-chunk: what was written stays
+    with pytest.raises(ConnectionError):
+        with spool.writer(upload_id, 0) as out:
+            out.write(b"hello ")
+            raise ConnectionError("client went away")
+    
+    offset = client.get(f"/api/uploads/{upload_id}").json()["offset"]
+    assert offset == 6
+    state = put(client, upload_id, b"world", f"bytes {offset}-{offset + 4}/11").json()
+    assert state["complete"]
+    with open(spool.path(upload_id), "rb") as f:
+        assert f.read() == b"hello world"
+
+
+def test_concurrent_chunk_is_a_conflict(spool):
+    upload_id = spool.create("talk.webm", 10)["upload_id"]
+    
+    with spool.writer(upload_id, 0) as out:
+        out.write(b"01")
+        with pytest.raises(UploadConflict):
+            with spool.writer(upload_id, 2):
+                pass
+
+
+def test_finalize_before_the_last_chunk(spool):
+    upload_id = spool.create("talk.webm", 10)["upload_id"]
+    with spool.writer(upload_id, 0) as out:
+        out.write(b"01234")
+    
+    state = spool.finalize(upload_id)
+    assert state["offset"] == 5 and not state["complete"]
+    with pytest.raises(ValueError):
+        spool.finalize(upload_id)
+    
+    def finish_upload():
+        time.sleep(0.1)
+        with spool.writer(upload_id, 5) as out:
+            out.write(b"56789")
+    
+    writer = threading.Thread(target=finish_upload)
+    writer.start()
+    with spool.open_source(spool.path(upload_id)) as source:
+        assert source.read(5) == b"01234"
+        # Waits for the rest instead of returning EOF
+        assert source.read() == b"56789"
+        assert source.seek(0, os.SEEK_END) == 10
+    writer.join()
+
+
+def test_finalize_without_length_takes_the_bytes_received(spool):
+    upload_id = spool.create("talk.webm")["upload_id"]
+    with pytest.raises(ValueError):
+        spool.finalize(upload_id)
+    
+    with spool.writer(upload_id, 0) as out:
+        out.write(b"0123")
+    assert spool.finalize(upload_id)["length"] == 4
+
+
+def test_abandoned_upload_stalls_readers(spool, quick_stall):
+    upload_id = spool.create("talk.webm", 10)["upload_id"]
+    with spool.writer(upload_id, 0) as out:
+        out.write(b"01234")
+    spool.finalize(upload_id)
+    path = spool.path(upload_id)
+    
+    with spool.open_source(path) as source:
+        assert source.read(5) == b"01234"
+        with pytest.raises(UploadStalled):
+            source.read()
+        with pytest.raises(UploadStalled):
+            source.seek(0, os.SEEK_END)
+    with pytest.raises(UploadStalled):
+        spool.wait_complete(path)
+
+
+def test_cancel_ends_a_waiting_reader(spool):
+    upload_id = spool.create("talk.webm", 10)["upload_id"]
+    cancel = threading.Event()
+    cancel.set()
+    
+    with spool.open_source(spool.path(upload_id), cancel) as source:
+        assert source.read() == b""
+        assert source.seek(0, os.SEEK_END) == 0
+
+
+def test_length_limit_applies_to_size_estimates(tmp_path, monkeypatch):
+    """MediaRecorder webm has no duration header; the size estimate is checked instead"""
+    import asyncio
+    
+    probes = []
+    monkeypatch.setattr(app_module, "probe_duration", lambda path: probes.append(path))
+    monkeypatch.setattr(settings, "MAX_AUDIO_SECONDS", 10)
+    monkeypatch.setattr(settings, "AUDIO_BITRATE_ESTIMATE", 32000)
+    monkeypatch.setattr(settings, "AUDIO_ESTIMATE_MARGIN", 1.5)
+    short, long = tmp_path / "short.webm", tmp_path / "long.webm"
+    short.write_bytes(b"\0" * 56000)  # 14 s at 4000 bytes/s, within the margin
+    long.write_bytes(b"\0" * 64000)   # 16 s
+    
+    assert asyncio.run(app_module._admit_upload(str(short))) == pytest.approx(14)
+    with pytest.raises(ValueError, match="Audio is about"):
+        asyncio.run(app_module._admit_upload(str(long)))
+    assert not long.exists()
+    assert len(probes) == 2
+    
+    # A resumable upload is judged by its announced length
+    with pytest.raises(ValueError):
+        asyncio.run(app_module._admit_upload(str(short), size=64000))
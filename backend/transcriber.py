@@ -2,40 +2,98 @@
 Audio transcription using faster-whisper (Whisper tiny model)
 Includes audio preprocessing for better transcription quality
 Falls back to mock transcription if faster-whisper is not available
+
+Heavy dependencies (faster-whisper pulls in ctranslate2, onnxruntime and av)
+are only checked for at import time and imported on first use, so the server
+can answer requests before they are loaded.
 """
-try:
-    from faster_whisper import WhisperModel
-    WHISPER_AVAILABLE = True
-except ImportError:
-    WHISPER_AVAILABLE = False
+import importlib.util
+
+WHISPER_AVAILABLE = importlib.util.find_spec("faster_whisper") is not None
+if not WHISPER_AVAILABLE:
     print("WARNING: faster-whisper not available. Using mock transcription for testing.")
 
-try:
-    from pydub import AudioSegment
-    from pydub.effects import normalize
-    PYDUB_AVAILABLE = True
-except ImportError:
-    PYDUB_AVAILABLE = False
+STREAM_DECODE_AVAILABLE = all(importlib.util.find_spec(name) for name in ("av", "numpy"))
+if not STREAM_DECODE_AVAILABLE:
+    print("WARNING: av/numpy not available. Streaming decode and silence pre-check disabled.")
+
+PYDUB_AVAILABLE = importlib.util.find_spec("pydub") is not None
+if not PYDUB_AVAILABLE:
     print("WARNING: pydub not available. Audio preprocessing disabled.")
 
 import os
 import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterator, List, Optional
+
+import metrics
+import model_policy
+import transcriber_mock
+from uploads import upload_spool, UploadStalled
 
 # Initialize model globally (loaded once)
 # Import settings to use configured model size
 import settings
 MODEL_SIZE = settings.WHISPER_MODEL_SIZE
-MODEL = None
+# Loaded models by size (the adaptive policy may use more than one)
+MODELS: Dict[str, object] = {}
+_model_lock = threading.Lock()
 
+# Whisper's input format; recordings are decoded straight to it
+SAMPLE_RATE = 16000
+# RMS is measured over frames of this length
+SILENCE_FRAME_SECONDS = 0.03
+# Recordings peaking below 16-bit quantization noise are silent at any gain
+SILENCE_FLOOR_DB = -90
+# The noise floor is this percentile of the frame levels
+NOISE_FLOOR_PERCENTILE = 10
+# Decoded PCM is written out in blocks of this many seconds
+DECODE_BLOCK_SECONDS = 10
+# Window cuts move to the quietest frame within this many seconds before them
+WINDOW_CUT_SEARCH_SECONDS = 20
+# Tail of the previous window's text passed as the next window's prompt
+PROMPT_CHARS = 500
 
-def get_model():
-    """Lazy load the Whisper model"""
-    global MODEL
-    if not WHISPER_AVAILABLE:
+# faster-whisper options (beam_size/best_of are overridden per profile,
+# see model_policy.PROFILES)
+# Enhanced settings for long recordings and better accent handling:
+# - vad_filter: Remove silent parts for better performance on long recordings
+# - beam_size=5: Good balance between speed and accuracy
+# - best_of=5: Generate 5 candidates and pick the best
+# - temperature=0: Deterministic output (no randomness)
+# - condition_on_previous_text: Use context from previous segments for better accuracy
+# The language is auto-detected (language=None) for multi-accent support
+TRANSCRIBE_OPTIONS = dict(
+    beam_size=5,
+    best_of=5,
+    temperature=0,
+    vad_filter=True,
+    condition_on_previous_text=True,
+    word_timestamps=False
+)
+
+
+class TranscriptionCancelled(Exception):
+    """Raised by iter_segments when its cancel event is set"""
+
+
+def get_model(model_size: Optional[str] = None):
+    """
+    Lazy load a Whisper model, the configured size by default
+    (safe to call from the warm-up thread)
+    """
+    model_size = model_size or MODEL_SIZE
+    if not WHISPER_AVAILABLE or settings.MOCK_TRANSCRIBER or settings.INFERENCE_SOCKET:
         return None
-    if MODEL is None:
-        MODEL = WhisperModel(MODEL_SIZE, device="cpu", compute_type="int8")
-    return MODEL
+    with _model_lock:
+        if model_size not in MODELS:
+            start = time.perf_counter()
+            from faster_whisper import WhisperModel
+            MODELS[model_size] = WhisperModel(model_size, device="cpu", compute_type="int8")
+            metrics.MODEL_LOAD_SECONDS.set(time.perf_counter() - start, model=model_size)
+    return MODELS[model_size]
 
 
 def preprocess_audio(audio_path: str) -> str:
@@ -52,7 +110,10 @@ def preprocess_audio(audio_path: str) -> str:
     """
     if not PYDUB_AVAILABLE:
         return audio_path
-        
+    
+    from pydub import AudioSegment
+    from pydub.effects import normalize
+    
     try:
         # Load audio
         audio = AudioSegment.from_file(audio_path)
@@ -78,6 +139,124 @@ def preprocess_audio(audio_path: str) -> str:
         return audio_path
 
 
+def decode_pcm(source, out) -> tuple:
+    """
+    Stream-decode any container (a path or readable file object) to 16 kHz
+    mono float32 PCM written to `out`
+    Only DECODE_BLOCK_SECONDS of audio is held in memory at a time
+    
+    Returns:
+        (sample count, peak amplitude, RMS level in dB of each 30 ms frame)
+    """
+    import av
+    import numpy as np
+    
+    frame = int(SAMPLE_RATE * SILENCE_FRAME_SECONDS)
+    block = SAMPLE_RATE * DECODE_BLOCK_SECONDS
+    resampler = av.AudioResampler(format="flt", layout="mono", rate=SAMPLE_RATE)
+    pending: List["np.ndarray"] = []
+    pending_samples = 0
+    levels = []
+    samples = 0
+    peak = 0.0
+    
+    def flush(final: bool = False):
+        # Write whole frames; a partial frame stays pending unless final
+        nonlocal pending, pending_samples, samples, peak
+        pcm = np.concatenate(pending) if pending else np.zeros(0, dtype=np.float32)
+        count = len(pcm) // frame
+        keep = len(pcm) if final else count * frame
+        if keep:
+            out.write(pcm[:keep].tobytes())
+            samples += keep
+            peak = max(peak, float(np.max(np.abs(pcm[:keep]))))
+        if count:
+            frames = pcm[:count * frame].reshape(count, frame)
+            levels.append(np.sqrt(np.mean(np.square(frames), axis=1)))
+        pending = [] if final else [pcm[keep:]]
+        pending_samples = len(pcm) - keep
+    
+    def add(resampled):
+        nonlocal pending_samples
+        pcm = resampled.to_ndarray().reshape(-1)
+        pending.append(pcm)
+        pending_samples += len(pcm)
+        if pending_samples >= block:
+            flush()
+    
+    with av.open(source) as container:
+        for decoded in container.decode(audio=0):
+            for resampled in resampler.resample(decoded):
+                add(resampled)
+        for resampled in resampler.resample(None):
+            add(resampled)
+    flush(final=True)
+    
+    rms = np.concatenate(levels) if levels else np.zeros(0, dtype=np.float32)
+    return samples, peak, 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def find_speech(levels: "np.ndarray", samples: int, peak: float) -> Optional[tuple]:
+    """
+    Speech span from the per-frame RMS levels and peak of decode_pcm
+    A frame is signal when it is within SILENCE_THRESHOLD_DB of the peak
+    (levels as after gain normalization, so quiet recordings still count)
+    and SILENCE_NOISE_MARGIN_DB above the noise floor, so a recording of
+    steady hiss has no signal however loud the hiss is.
+    Returns the (start, end) sample range from the first to the last signal
+    frame (plus padding), or None when there is less than
+    MIN_SPEECH_SECONDS of signal
+    """
+    import numpy as np
+    
+    peak_db = 20 * np.log10(peak) if peak > 0 else -np.inf
+    if peak_db < SILENCE_FLOOR_DB:
+        return None
+    
+    frame = int(SAMPLE_RATE * SILENCE_FRAME_SECONDS)
+    noise_floor = np.percentile(levels, NOISE_FLOOR_PERCENTILE) if levels.size else -np.inf
+    active = np.flatnonzero((levels - peak_db > settings.SILENCE_THRESHOLD_DB) &
+                            (levels - noise_floor > settings.SILENCE_NOISE_MARGIN_DB))
+    if active.size == 0 or active.size * SILENCE_FRAME_SECONDS < settings.MIN_SPEECH_SECONDS:
+        return None
+    
+    padding = int(settings.SILENCE_PADDING_SECONDS * SAMPLE_RATE)
+    start = max(0, int(active[0]) * frame - padding)
+    end = min(samples, (int(active[-1]) + 1) * frame + padding)
+    return start, end
+
+
+def plan_windows(levels: "np.ndarray", start: int, end: int) -> List[tuple]:
+    """
+    Split the sample range [start, end) into windows of about
+    TRANSCRIBE_WINDOW_SECONDS, each cut at the quietest 30 ms frame in the
+    WINDOW_CUT_SEARCH_SECONDS before the nominal cut so words aren't split
+    """
+    import numpy as np
+    
+    window = int(settings.TRANSCRIBE_WINDOW_SECONDS * SAMPLE_RATE)
+    frame = int(SAMPLE_RATE * SILENCE_FRAME_SECONDS)
+    search = int(WINDOW_CUT_SEARCH_SECONDS / SILENCE_FRAME_SECONDS)
+    windows = []
+    while window > 0 and end - start > window:
+        nominal = (start + window) // frame
+        lowest = max(start // frame + 1, nominal - search)
+        cut = nominal
+        if nominal > lowest and nominal <= len(levels):
+            cut = lowest + int(np.argmin(levels[lowest:nominal]))
+        windows.append((start, cut * frame))
+        start = cut * frame
+    windows.append((start, end))
+    return windows
+
+
+def normalize_gain(peak: float, headroom_db: float = 0.1) -> float:
+    """Gain that puts the peak headroom_db below full scale (as pydub's normalize)"""
+    if peak == 0:
+        return 1.0
+    return 10 ** (-headroom_db / 20) / peak
+
+
 def transcribe_audio(audio_path: str, preprocess: bool = True) -> str:
     """
     Transcribe audio file to text using Whisper tiny model
@@ -90,65 +269,252 @@ def transcribe_audio(audio_path: str, preprocess: bool = True) -> str:
     Returns:
         Transcribed text as a single string
     """
+    transcript = " ".join(segment["text"] for segment in iter_segments(audio_path, preprocess))
+    
+    if not transcript or len(transcript.strip()) == 0:
+        print("Warning: Empty transcript generated")
+        return ""
+    
+    print(f"Transcription complete: {len(transcript)} characters")
+    return transcript
+
+
+def iter_segments(audio_path: str, preprocess: bool = True,
+                  on_info: Optional[Callable] = None,
+                  cancel: Optional[threading.Event] = None,
+                  on_trim: Optional[Callable[[float], None]] = None,
+                  start_at: float = 0.0, prompt: Optional[str] = None,
+                  language: Optional[str] = None,
+                  profile: str = model_policy.DEFAULT_PROFILE) -> Iterator[Dict]:
+    """
+    Transcribe audio file, yielding segments as soon as they are decoded
+    Lets callers start downstream work (summarization) before decoding ends
+    
+    Args:
+        audio_path: Path to audio file
+        preprocess: Whether to preprocess audio before transcription
+        on_info: Optional callback receiving the faster-whisper TranscriptionInfo
+                 (language, duration) before the first segment
+        cancel: Optional event checked between segments; when set, decoding
+                stops and TranscriptionCancelled is raised
+        on_trim: Optional callback receiving the seconds of leading/trailing
+                 silence skipped by the pre-check (all of it if nothing is yielded)
+        start_at: Resume from this many seconds into the recording
+        prompt: Decoder context for resuming (the tail of the text so far)
+        language: Skip language detection and use this language
+        profile: Model and decoding options to use (model_policy.PROFILES)
+    
+    Yields:
+        Dicts with "start" and "end" (seconds) and "text"
+    """
     if not os.path.exists(audio_path):
         raise FileNotFoundError(f"Audio file not found: {audio_path}")
     
-    # Fallback to mock transcription if Whisper not available
-    if not WHISPER_AVAILABLE:
+    # Forked server workers share one model in the inference process
+    if settings.INFERENCE_SOCKET:
+        import inference
+        yield from inference.remote_segments(
+            settings.INFERENCE_SOCKET, audio_path, preprocess,
+            on_info=on_info, on_trim=on_trim, check_cancel=lambda: _check_cancel(cancel),
+            start_at=start_at, prompt=prompt, language=language, profile=profile
+        )
+        return
+    
+    # Fallback to mock transcription if Whisper not available (or forced for load tests)
+    if not WHISPER_AVAILABLE or settings.MOCK_TRANSCRIBER:
+        upload_spool.wait_complete(audio_path, cancel)
+        _check_cancel(cancel)
         print(f"Using mock transcription for: {audio_path}")
-        return "This is a mock transcription for testing purposes. The meeting discussed project timelines and resource allocation. We need to complete the documentation by next Friday. John will be responsible for the technical specifications."
+        for segment in transcriber_mock.iter_segments(audio_path, preprocess, on_info, start_at, profile):
+            _check_cancel(cancel)
+            yield segment
+        return
+    
+    # Decode once to a temporary 16 kHz float32 file and transcribe it in
+    # windows; containers av can't read go through pydub below. An upload
+    # still arriving is decoded as its chunks come in
+    if STREAM_DECODE_AVAILABLE:
+        pcm_file = tempfile.NamedTemporaryFile(delete=False, suffix=".f32")
+        try:
+            try:
+                with metrics.stage("decode"), pcm_file, upload_spool.open_source(audio_path, cancel) as source:
+                    samples, peak, levels = decode_pcm(source, pcm_file)
+            except UploadStalled:
+                raise
+            except Exception as e:
+                _check_cancel(cancel)
+                print(f"Streaming decode failed: {e}. Transcribing the whole file.")
+            else:
+                yield from _transcribe_windows(pcm_file.name, samples, peak, levels,
+                                               preprocess, on_info, cancel, on_trim,
+                                               start_at, prompt, language, profile)
+                return
+        finally:
+            _remove(pcm_file.name)
     
+    upload_spool.wait_complete(audio_path, cancel)
+    _check_cancel(cancel)
     processed_path = audio_path
-    temp_file_created = False
     
     try:
         # Preprocess audio if enabled
         if preprocess:
-            processed_path = preprocess_audio(audio_path)
-            temp_file_created = (processed_path != audio_path)
+            with metrics.stage("preprocess"):
+                processed_path = preprocess_audio(audio_path)
         
-        model = get_model()
+        _check_cancel(cancel)
+        options = _profile_options(profile)
+        model = get_model(options.pop("model"))
         
-        # Transcribe with faster-whisper
-        # Enhanced settings for long recordings and better accent handling:
-        # - vad_filter: Remove silent parts for better performance on long recordings
-        # - language: Auto-detect for multi-accent support
-        # - beam_size=5: Good balance between speed and accuracy
-        # - best_of=5: Generate 5 candidates and pick the best
-        # - temperature=0: Deterministic output (no randomness)
-        # - condition_on_previous_text: Use context from previous segments for better accuracy
-        segments, info = model.transcribe(
-            processed_path,
-            beam_size=5,
-            best_of=5,
-            temperature=0,
-            vad_filter=True,
-            condition_on_previous_text=True,
-            word_timestamps=False,
-            language=None  # Auto-detect language for multi-accent support
-        )
+        # transcribe() runs VAD and language detection up front and
+        # returns a lazy generator; decoding happens while iterating it
+        detect_start = time.perf_counter()
+        segments, info = model.transcribe(processed_path, language=language, **options)
+        detect_seconds = time.perf_counter() - detect_start
+        metrics.STAGE_SECONDS.observe(detect_seconds, stage="language_detection")
         
         print(f"Detected language: {info.language} (probability: {info.language_probability:.2f})")
         print(f"Audio duration: {info.duration:.2f}s")
+        if on_info:
+            on_info(info)
         
-        # Combine all segments into a single transcript
-        transcript_parts = []
-        for segment in segments:
-            transcript_parts.append(segment.text.strip())
-        
-        transcript = " ".join(transcript_parts)
+        inference_seconds = 0.0
+        for segment, seconds in _timed(segments):
+            inference_seconds += seconds
+            # Abandoning the generator here stops faster-whisper decoding
+            _check_cancel(cancel)
+            # This path can't seek; a resumed job skips what it already has
+            if segment["end"] > start_at:
+                yield segment
         
-        if not transcript or len(transcript.strip()) == 0:
-            print("Warning: Empty transcript generated")
-            return ""
-        
-        print(f"Transcription complete: {len(transcript)} characters")
-        return transcript
+        _record_inference(info.duration, detect_seconds, inference_seconds)
     
     finally:
         # Clean up temporary preprocessed file
-        if temp_file_created and os.path.exists(processed_path):
-            try:
-                os.unlink(processed_path)
-            except:
-                pass
+        if processed_path != audio_path:
+            _remove(processed_path)
+
+
+def _transcribe_windows(pcm_path: str, samples: int, peak: float, levels: "np.ndarray",
+                        preprocess: bool, on_info: Optional[Callable],
+                        cancel: Optional[threading.Event],
+                        on_trim: Optional[Callable[[float], None]],
+                        start_at: float = 0.0, prompt: Optional[str] = None,
+                        language: Optional[str] = None,
+                        profile: str = model_policy.DEFAULT_PROFILE) -> Iterator[Dict]:
+    """
+    Transcribe the decoded PCM file window by window (see plan_windows)
+    The file is memory-mapped, so only the current window is held in memory;
+    each window is prompted with the end of the previous window's text.
+    A resumed job starts its first window at start_at with the saved prompt.
+    """
+    import numpy as np
+    
+    # Silence pre-check: empty recordings stop here, before loading the
+    # model; otherwise only the span from the first to the last speech is
+    # transcribed
+    start, end = 0, samples
+    if settings.SILENCE_CHECK:
+        total = samples / SAMPLE_RATE
+        span = find_speech(levels, samples, peak)
+        if span is None:
+            print(f"No speech detected by silence pre-check ({total:.2f}s skipped)")
+            if on_trim:
+                on_trim(round(total, 2))
+            return
+        start, end = span
+        skipped = total - (end - start) / SAMPLE_RATE
+        print(f"Trimmed {skipped:.2f}s of leading/trailing silence")
+        if on_trim:
+            on_trim(round(skipped, 2))
+    duration = (end - start) / SAMPLE_RATE
+    start = max(start, int(start_at * SAMPLE_RATE))
+    if end <= start:
+        return
+    
+    _check_cancel(cancel)
+    options = _profile_options(profile)
+    model = get_model(options.pop("model"))
+    
+    gain = normalize_gain(peak) if preprocess else 1.0
+    audio = np.memmap(pcm_path, dtype=np.float32, mode="r", shape=(samples,))
+    first = True
+    detect_seconds = 0.0
+    inference_seconds = 0.0
+    
+    for window_start, window_end in plan_windows(levels, start, end):
+        # Pages in and copies only this window
+        window = np.multiply(audio[window_start:window_end], gain, dtype=np.float32)
+        offset = window_start / SAMPLE_RATE
+        
+        detect_start = time.perf_counter()
+        # Later windows reuse the first window's language
+        segments, info = model.transcribe(window, language=language, initial_prompt=prompt, **options)
+        detect_seconds += time.perf_counter() - detect_start
+        
+        if first:
+            first = False
+            language = info.language
+            print(f"Detected language: {info.language} (probability: {info.language_probability:.2f})")
+            print(f"Audio duration: {duration:.2f}s")
+            if on_info:
+                on_info(SimpleNamespace(language=info.language,
+                                        language_probability=info.language_probability,
+                                        duration=duration))
+        
+        texts = []
+        for segment, seconds in _timed(segments):
+            inference_seconds += seconds
+            _check_cancel(cancel)
+            segment["start"] += offset
+            segment["end"] += offset
+            texts.append(segment["text"])
+            yield segment
+        prompt = " ".join(texts)[-PROMPT_CHARS:] or None
+        del window
+    
+    metrics.STAGE_SECONDS.observe(detect_seconds, stage="language_detection")
+    _record_inference((end - start) / SAMPLE_RATE, detect_seconds, inference_seconds)
+
+
+def _profile_options(profile: str) -> Dict:
+    """transcribe() options for a profile, plus its "model" size"""
+    return {**TRANSCRIBE_OPTIONS, **model_policy.PROFILES[profile]}
+
+
+def _timed(segments) -> Iterator[tuple]:
+    """
+    Yield (segment dict, seconds spent decoding it) from faster-whisper's
+    lazy generator; only time spent decoding counts as inference, not the
+    consumer's
+    """
+    segments = iter(segments)
+    while True:
+        step_start = time.perf_counter()
+        segment = next(segments, None)
+        seconds = time.perf_counter() - step_start
+        if segment is None:
+            return
+        yield {"start": segment.start, "end": segment.end, "text": segment.text.strip()}, seconds
+
+
+def _record_inference(duration: float, detect_seconds: float, inference_seconds: float):
+    metrics.STAGE_SECONDS.observe(inference_seconds, stage="inference")
+    metrics.AUDIO_SECONDS.inc(duration)
+    elapsed = detect_seconds + inference_seconds
+    if elapsed > 0:
+        metrics.REALTIME_FACTOR.observe(duration / elapsed)
+
+
+def _remove(path: str):
+    if os.path.exists(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _check_cancel(cancel: Optional[threading.Event]):
+    if cancel is not None and cancel.is_set():
+        print("Transcription cancelled")
+        raise TranscriptionCancelled("Transcription cancelled")
@@ -1,11 +1,87 @@
 """
 Mock transcriber for testing - simulates Whisper without dependencies
+
+Inference cost is simulated in proportion to the audio duration, so load
+tests see realistic queueing without burning CPU on Whisper:
+- MOCK_RTF: audio seconds "transcribed" per wall second (0 = instant)
+- MOCK_RTF_JITTER: random +/- fraction applied to each job's cost
+Transcripts are synthesized to match the audio length.
 """
 import os
+import random
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterator, Optional
+
+import metrics
+import model_policy
+import settings
+from audio_probe import estimate_duration
+
+# First sentences match the original fixed mock transcript
+MOCK_SENTENCES = [
+    "This is a mock transcription for testing purposes.",
+    "The meeting discussed project timelines and resource allocation.",
+    "We need to complete the documentation by next Friday.",
+    "John will be responsible for the technical specifications.",
+    "The team agreed to move the release review to Thursday.",
+    "Priya will follow up with the vendor about pricing.",
+    "We decided to postpone the database migration until after launch.",
+    "Customer feedback on the new onboarding flow was mostly positive.",
+    "Action item: Wei needs to update the security audit checklist.",
+    "We should revisit the hiring plan at the next quarterly planning session.",
+]
+
+# Seconds of speech per mock segment
+SEGMENT_SECONDS = 5.0
+
+
+def iter_segments(audio_path: str, preprocess: bool = True,
+                  on_info: Optional[Callable] = None, start_at: float = 0.0,
+                  profile: str = model_policy.DEFAULT_PROFILE) -> Iterator[Dict]:
+    """
+    Mock of transcriber.iter_segments - yields synthetic segments,
+    sleeping between them to simulate decoding at MOCK_RTF (faster for
+    degraded profiles, by their estimated speedup)
+    Segments ending before start_at (a resumed job) are skipped for free
+    """
+    if not os.path.exists(audio_path):
+        raise FileNotFoundError(f"Audio file not found: {audio_path}")
+    
+    duration = estimate_duration(audio_path)
+    if on_info:
+        on_info(SimpleNamespace(language="en", language_probability=1.0, duration=duration))
+    
+    rtf = settings.MOCK_RTF * model_policy.speedup(profile)
+    jitter = 1.0 + random.uniform(-settings.MOCK_RTF_JITTER, settings.MOCK_RTF_JITTER)
+    
+    # Short clips still produce the classic one-segment mock transcript
+    count = max(1, int(duration // SEGMENT_SECONDS))
+    inference_seconds = 0.0
+    for i in range(count):
+        start = i * SEGMENT_SECONDS
+        end = duration if i == count - 1 else start + SEGMENT_SECONDS
+        if end <= start_at:
+            continue
+        if rtf > 0:
+            cost = max(0.0, (end - start) / rtf * jitter)
+            time.sleep(cost)
+            inference_seconds += cost
+        if count == 1:
+            text = " ".join(MOCK_SENTENCES[:4])
+        else:
+            text = MOCK_SENTENCES[i % len(MOCK_SENTENCES)]
+        yield {"start": start, "end": end, "text": text}
+    
+    metrics.STAGE_SECONDS.observe(inference_seconds, stage="inference")
+    metrics.AUDIO_SECONDS.inc(duration)
+    if inference_seconds > 0:
+        metrics.REALTIME_FACTOR.observe(duration / inference_seconds)
+
 
 def transcribe_audio(audio_path: str, preprocess: bool = True) -> str:
     """
-    Mock transcription - returns a sample transcript
+    Mock transcription - returns a synthetic transcript scaled to the audio length
     
     Args:
         audio_path: Path to audio file
@@ -14,8 +90,4 @@ def transcribe_audio(audio_path: str, preprocess: bool = True) -> str:
     Returns:
         Mock transcribed text
     """
-    if not os.path.exists(audio_path):
-        raise FileNotFoundError(f"Audio file not found: {audio_path}")
-    
-    # Return a mock transcript
-    return "This is a mock transcription for testing purposes. The meeting discussed project timelines and resource allocation. We need to complete the documentation by next Friday. John will be responsible for the technical specifications."
+    return " ".join(segment["text"] for segment in iter_segments(audio_path, preprocess))
@@ -0,0 +1,394 @@
+"""
+Resumable uploads for long recordings
+A client creates an upload, PUTs byte ranges that are appended straight to
+a file in UPLOAD_SPOOL_DIR, asks for the offset after a dropped connection
+and sends only the missing bytes. State lives next to the data (a small
+JSON file), so every server worker sees the same uploads and they survive
+restarts.
+
+An upload can be finalized before its last chunk: the job then decodes the
+file as it grows (open_source), so transcription trails the upload instead
+of waiting for it.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    # Windows: no fork-based workers there, the thread lock is enough
+    FCNTL_AVAILABLE = False
+
+import settings
+
+# How often a reader waiting for more bytes checks the file
+POLL_SECONDS = 0.2
+
+
+class UploadConflict(Exception):
+    """A chunk doesn't start at the upload's offset, or another one is being written"""
+    
+    def __init__(self, message: str, offset: int):
+        super().__init__(message)
+        self.offset = offset
+
+
+class UploadStalled(Exception):
+    """No new bytes arrived for UPLOAD_STALL_SECONDS while a job was reading the upload"""
+
+
+class UploadSpool:
+    """
+    Uploads stored as <id><suffix> (the bytes received so far) plus
+    <id>.json (file name, expected length, finalized job)
+    The offset is the data file's size, so it is always what is on disk
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._writing = set()
+        self._lock = threading.Lock()
+    
+    def create(self, filename: str, length: Optional[int] = None) -> Dict:
+        """Start an upload; length may be left open until finalize"""
+        if length is not None and length <= 0:
+            raise ValueError("Upload length must be positive")
+        self.purge_expired()
+        
+        os.makedirs(self.directory, exist_ok=True)
+        upload_id = str(uuid.uuid4())
+        meta = {
+            "id": upload_id,
+            "filename": filename,
+            "suffix": Path(filename).suffix or ".webm",
+            "length": length,
+            "created_at": time.time(),
+            "job_id": None
+        }
+        open(self._data_path(meta), "wb").close()
+        self._save(meta)
+        return self._state(meta)
+    
+    def get(self, upload_id: str) -> Optional[Dict]:
+        """Upload state for the API, None if unknown"""
+        meta = self._load(upload_id)
+        return self._state(meta) if meta else None
+    
+    @contextmanager
+    def writer(self, upload_id: str, offset: int, total: Optional[int] = None):
+        """
+        Append a chunk starting at `offset`
+        Yields a file whose write() refuses bytes past the upload's length;
+        whatever was written stays even if the client drops mid-chunk
+        Raises KeyError for unknown uploads, UploadConflict when the offset
+        doesn't match (or another chunk is in flight) and ValueError when
+        the declared total contradicts the upload's length
+        """
+        meta = self._load(upload_id)
+        if meta is None:
+            raise KeyError(upload_id)
+        path = self._data_path(meta)
+        
+        with self._exclusive(upload_id, path) as data:
+            meta = self._load(upload_id)
+            if meta is None:
+                raise KeyError(upload_id)
+            
+            if total is not None and meta["length"] != total:
+                if meta["length"] is not None or meta["job_id"]:
+                    raise ValueError(f"Upload length is {meta['length']}, not {total}")
+                meta["length"] = total
+                self._save(meta)
+            
+            current = os.fstat(data.fileno()).st_size
+            if offset != current:
+                raise UploadConflict(f"Upload is at offset {current}, not {offset}", current)
+            
+            remaining = None if meta["length"] is None else meta["length"] - current
+            data.seek(0, os.SEEK_END)
+            yield _ChunkWriter(data, remaining)
+    
+    def finalize(self, upload_id: str) -> Dict:
+        """
+        Close the upload to further length changes and hand it to a job
+        Without a declared length, the bytes received so far are the whole
+        recording. Raises KeyError, or ValueError if empty or already finalized
+        """
+        meta = self._load(upload_id)
+        if meta is None:
+            raise KeyError(upload_id)
+        with self._exclusive(upload_id, self._data_path(meta), wait=True):
+            meta = self._load(upload_id)
+            if meta is None:
+                raise KeyError(upload_id)
+            if meta["job_id"]:
+                raise ValueError(f"Upload was already finalized (job {meta['job_id']})")
+            
+            offset = self._offset(meta)
+            if meta["length"] is None:
+                meta["length"] = offset
+            if not meta["length"]:
+                raise ValueError("Upload is empty")
+            # Reserved now, so a racing finalize fails; set to the real ID by attach_job
+            meta["job_id"] = "pending"
+            self._save(meta)
+        return self._state(meta)
+    
+    def attach_job(self, upload_id: str, job_id: str):
+        """Record the job reading a finalized upload"""
+        meta = self._load(upload_id)
+        if meta is not None:
+            meta["job_id"] = job_id
+            self._save(meta)
+    
+    def path(self, upload_id: str) -> Optional[str]:
+        """Data file of an upload"""
+        meta = self._load(upload_id)
+        return self._data_path(meta) if meta else None
+    
+    def delete(self, upload_id: str) -> bool:
+        """Abort an upload that wasn't finalized; False if unknown or finalized"""
+        meta = self._load(upload_id)
+        if meta is None or meta["job_id"]:
+            return False
+        self._remove(meta)
+        return True
+    
+    def purge_expired(self):
+        """
+        Drop uploads never finalized within UPLOAD_EXPIRE_SECONDS, and the
+        state of finalized ones whose job is done with the data
+        """
+        now = time.time()
+        try:
+            with os.scandir(self.directory) as entries:
+                names = [entry.name for entry in entries if entry.name.endswith(".json")]
+        except FileNotFoundError:
+            return
+        
+        for name in names:
+            meta = self._load(name[:-len(".json")])
+            if meta is None:
+                continue
+            if meta["job_id"]:
+                # Finalized: the job owns the data and deletes it when done
+                if not os.path.exists(self._data_path(meta)):
+                    self._remove(meta)
+            elif now - meta["created_at"] > settings.UPLOAD_EXPIRE_SECONDS:
+                print(f"Dropping expired upload {meta['id']} ({self._offset(meta)} bytes)")
+                self._remove(meta)
+    
+    @contextmanager
+    def open_source(self, audio_path: str, cancel: Optional[threading.Event] = None) -> Iterator:
+        """
+        What to hand a decoder for `audio_path`: the path itself, or a
+        reader that waits for more bytes when it is an upload still arriving
+        """
+        meta = self._meta_for(audio_path)
+        if meta is None or self._is_complete(meta):
+            yield audio_path
+            return
+        
+        reader = GrowingFile(audio_path, lambda: self._arrived(meta["id"]), cancel)
+        try:
+            yield reader
+        finally:
+            reader.close()
+    
+    def wait_complete(self, audio_path: str, cancel: Optional[threading.Event] = None):
+        """
+        Block until an upload being decoded has all its bytes (returns right
+        away for other files, or when `cancel` is set); raises UploadStalled
+        """
+        meta = self._meta_for(audio_path)
+        if meta is None:
+            return
+        last_size, last_change = -1, time.monotonic()
+        while not (cancel and cancel.is_set()):
+            done, size = self._arrived(meta["id"])
+            if done:
+                return
+            if size != last_size:
+                last_size, last_change = size, time.monotonic()
+            elif time.monotonic() - last_change > settings.UPLOAD_STALL_SECONDS:
+                raise UploadStalled(f"Upload {meta['id']} stalled at {size} bytes")
+            time.sleep(POLL_SECONDS)
+    
+    def _arrived(self, upload_id: str) -> tuple:
+        # (all bytes received, bytes received); a vanished upload is treated as done
+        meta = self._load(upload_id)
+        if meta is None:
+            return True, 0
+        return self._is_complete(meta), self._offset(meta)
+    
+    def _is_complete(self, meta: Dict) -> bool:
+        return meta["length"] is not None and self._offset(meta) >= meta["length"]
+    
+    def _meta_for(self, audio_path: str) -> Optional[Dict]:
+        path = Path(audio_path)
+        if path.parent.resolve() != Path(self.directory).resolve():
+            return None
+        meta = self._load(path.stem)
+        return meta if meta and meta["suffix"] == path.suffix else None
+    
+    def _state(self, meta: Dict) -> Dict:
+        offset = self._offset(meta)
+        return {
+            "upload_id": meta["id"],
+            "filename": meta["filename"],
+            "offset": offset,
+            "length": meta["length"],
+            "complete": meta["length"] is not None and offset >= meta["length"],
+            "job_id": meta["job_id"]
+        }
+    
+    def _offset(self, meta: Dict) -> int:
+        try:
+            return os.path.getsize(self._data_path(meta))
+        except OSError:
+            return 0
+    
+    def _data_path(self, meta: Dict) -> str:
+        return os.path.join(self.directory, meta["id"] + meta["suffix"])
+    
+    def _meta_path(self, upload_id: str) -> str:
+        return os.path.join(self.directory, upload_id + ".json")
+    
+    def _load(self, upload_id: str) -> Optional[Dict]:
+        try:
+            uuid.UUID(upload_id)
+            with open(self._meta_path(upload_id)) as f:
+                return json.load(f)
+        except (ValueError, OSError):
+            return None
+    
+    def _save(self, meta: Dict):
+        # Written to a temp file and renamed, so readers never see half of it
+        path = self._meta_path(meta["id"])
+        with open(path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+    
+    def _remove(self, meta: Dict):
+        for path in (self._data_path(meta), self._meta_path(meta["id"])):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+    
+    @contextmanager
+    def _exclusive(self, upload_id: str, path: str, wait: bool = False):
+        """
+        Open the data file for appending, held by one writer at a time
+        across threads and (with fcntl) server processes
+        """
+        with self._lock:
+            if upload_id in self._writing:
+                raise UploadConflict("Another chunk of this upload is being written",
+                                     os.path.getsize(path))
+            self._writing.add(upload_id)
+        try:
+            try:
+                # Not "ab": a job that finished with the upload deleted it
+                data = open(path, "r+b")
+            except FileNotFoundError:
+                raise KeyError(upload_id)
+            with data:
+                if FCNTL_AVAILABLE:
+                    try:
+                        fcntl.flock(data.fileno(), fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+                    except BlockingIOError:
+                        raise UploadConflict("Another chunk of this upload is being written",
+                                             os.fstat(data.fileno()).st_size)
+                yield data
+        finally:
+            with self._lock:
+                self._writing.discard(upload_id)
+
+
+class _ChunkWriter:
+    """Appends to an upload's data file, up to its declared length"""
+    
+    def __init__(self, data, remaining: Optional[int]):
+        self._data = data
+        self.remaining = remaining
+        self.written = 0
+    
+    def write(self, chunk: bytes):
+        if self.remaining is not None and len(chunk) > self.remaining:
+            raise ValueError("Chunk extends past the upload's length")
+        self._data.write(chunk)
+        self.written += len(chunk)
+        if self.remaining is not None:
+            self.remaining -= len(chunk)
+
+
+class GrowingFile:
+    """
+    Read-only file object over an upload that is still being written:
+    reads at the current end wait for more bytes instead of returning EOF
+    Gives up with UploadStalled after UPLOAD_STALL_SECONDS without growth;
+    when `cancel` is set, reads return EOF
+    """
+    
+    def __init__(self, path: str, arrived, cancel: Optional[threading.Event] = None):
+        self._file = open(path, "rb")
+        self._arrived = arrived
+        self._cancel = cancel
+    
+    def read(self, size: int = -1) -> bytes:
+        last_change = time.monotonic()
+        while True:
+            data = self._file.read(size)
+            if data or self._wait(last_change):
+                return data
+    
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+    
+    def _wait(self, last_change: float) -> bool:
+        # True when there is nothing more to wait for (EOF is real)
+        done, _ = self._arrived()
+        if done or (self._cancel and self._cancel.is_set()):
+            return True
+        if time.monotonic() - last_change > settings.UPLOAD_STALL_SECONDS:
+            raise UploadStalled(f"No upload data for {settings.UPLOAD_STALL_SECONDS:.0f}s")
+        time.sleep(POLL_SECONDS)
+        return False
+    
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_END:
+            # The end isn't known until everything has arrived; the stall
+            # timeout counts from the last time the file grew
+            size, last_change = self._size(), time.monotonic()
+            while not self._wait(last_change):
+                if self._size() != size:
+                    size, last_change = self._size(), time.monotonic()
+        return self._file.seek(offset, whence)
+    
+    def _size(self) -> int:
+        return os.fstat(self._file.fileno()).st_size
+    
+    def tell(self) -> int:
+        return self._file.tell()
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def readable(self) -> bool:
+        return True
+    
+    def close(self):
+        self._file.close()
+
+
+upload_spool = UploadSpool(settings.UPLOAD_SPOOL_DIR)
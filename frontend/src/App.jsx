@@ -9,37 +9,24 @@ import TranscriptBox from './components/TranscriptBox'
 import SummaryBox from './components/SummaryBox'
 import SessionHistory from './components/SessionHistory'
 import Toast from './components/Toast'
-import { summarizeTranscript, exportSession } from './api'
+import { exportSession } from './api'
 
 function App() {
   const [transcript, setTranscript] = useState('')
   const [summary, setSummary] = useState(null)
-  const [isTranscribing, setIsTranscribing] = useState(false)
-  const [isSummarizing, setIsSummarizing] = useState(false)
+  const [isProcessing, setIsProcessing] = useState(false)
   const [sidebarOpen, setSidebarOpen] = useState(false)
   const [toast, setToast] = useState(null)
   const [currentSessionId, setCurrentSessionId] = useState(null)
 
-  const handleTranscriptComplete = (text) => {
-    setTranscript(text)
-    setIsTranscribing(false)
-    setSummary(null) // Clear old summary
-    setCurrentSessionId(null)
-  }
-
-  const handleSummarize = async () => {
-    if (!transcript) return
-
-    setIsSummarizing(true)
-    try {
-      const data = await summarizeTranscript(transcript, true)
-      setSummary(data.summary)
-      setCurrentSessionId(data.session_id)
+  // The server transcribes, summarizes and saves in one request
+  const handleProcessComplete = (data) => {
+    setTranscript(data.transcript)
+    setSummary(data.summary)
+    setCurrentSessionId(data.session_id)
+    setIsProcessing(false)
+    if (data.summary) {
       showToast('Summary generated successfully!', 'success')
-    } catch (error) {
-      showToast(error.message || 'Failed to generate summary. Please try again.')
-    } finally {
-      setIsSummarizing(false)
     }
   }
 
@@ -118,8 +105,8 @@ function App() {
             <div className="space-y-8">
               <div className="transform transition-all duration-500 hover:scale-[1.02]">
                 <Recorder
-                  onTranscriptComplete={handleTranscriptComplete}
-                  onTranscribing={setIsTranscribing}
+                  onProcessComplete={handleProcessComplete}
+                  onProcessing={setIsProcessing}
                   onError={handleError}
                 />
               </div>
@@ -128,10 +115,8 @@ function App() {
                 <div className="transform transition-all duration-500 animate-slide-up">
                   <TranscriptBox
                     transcript={transcript}
-                    onSummarize={handleSummarize}
                     onReset={handleReset}
-                    isSummarizing={isSummarizing}
-                    isTranscribing={isTranscribing}
+                    isProcessing={isProcessing}
                   />
                 </div>
               )}
@@ -16,15 +16,18 @@ export async function getStatus() {
 }
 
 /**
- * Transcribe audio file
- * @param {Blob} audioBlob - Audio file to transcribe
- * @returns {Promise<{transcript: string, status: string}>}
+ * Transcribe, summarize and save a recording in one request
+ * Avoids sending the transcript back to the server for summarization
+ * @param {Blob} audioBlob - Audio file to process
+ * @param {boolean} saveSession - Whether to save as session
+ * @returns {Promise<{transcript: string, summary: object, session_id?: string, status: string}>}
  */
-export async function transcribeAudio(audioBlob) {
+export async function processAudio(audioBlob, saveSession = true) {
   const formData = new FormData()
   formData.append('audio', audioBlob, 'recording.webm')
+  formData.append('save_session', saveSession)
 
-  const response = await fetch(`${API_URL}/api/transcribe`, {
+  const response = await fetch(`${API_URL}/api/process`, {
     method: 'POST',
     body: formData,
   })
@@ -32,31 +35,7 @@ export async function transcribeAudio(audioBlob) {
   const data = await response.json()
 
   if (!response.ok) {
-    throw new Error(data.error || 'Transcription failed')
-  }
-
-  return data
-}
-
-/**
- * Summarize transcript
- * @param {string} transcript - Transcript text
- * @param {boolean} saveSession - Whether to save as session
- * @returns {Promise<{summary: object, session_id?: string, status: string}>}
- */
-export async function summarizeTranscript(transcript, saveSession = true) {
-  const response = await fetch(`${API_URL}/api/summarize`, {
-    method: 'POST',
-    headers: {
-      'Content-Type': 'application/json',
-    },
-    body: JSON.stringify({ transcript, save_session: saveSession }),
-  })
-
-  const data = await response.json()
-
-  if (!response.ok) {
-    throw new Error(data.error || 'Summarization failed')
+    throw new Error(data.error || 'Processing failed')
   }
 
   return data
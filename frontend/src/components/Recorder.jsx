@@ -1,10 +1,11 @@
 /**
- * Recorder component - handles audio recording and transcription
+ * Recorder component - handles audio recording and processing
+ * (transcription, summary and saving happen in one request)
  */
 import { useState, useRef } from 'react'
-import { transcribeAudio } from '../api'
+import { processAudio } from '../api'
 
-function Recorder({ onTranscriptComplete, onTranscribing, onError }) {
+function Recorder({ onProcessComplete, onProcessing, onError }) {
   const [isRecording, setIsRecording] = useState(false)
   const [isProcessing, setIsProcessing] = useState(false)
   const [showSourceDialog, setShowSourceDialog] = useState(false)
@@ -26,7 +27,9 @@ function Recorder({ onTranscriptComplete, onTranscribing, onError }) {
       const stream = await navigator.mediaDevices.getUserMedia(constraints)
 
       // Use better options for MediaRecorder to ensure quality
-      let options = { mimeType: 'audio/webm' }
+      // 32 kbps matches the server's AUDIO_BITRATE_ESTIMATE: webm has no
+      // duration header, so the length limit is checked from the file size
+      let options = { mimeType: 'audio/webm', audioBitsPerSecond: 32000 }
       if (MediaRecorder.isTypeSupported('audio/webm;codecs=opus')) {
         options.mimeType = 'audio/webm;codecs=opus'
       }
@@ -54,7 +57,7 @@ function Recorder({ onTranscriptComplete, onTranscribing, onError }) {
           return
         }
 
-        await handleTranscribe(audioBlob)
+        await handleProcess(audioBlob)
 
         // Stop all tracks
         stream.getTracks().forEach(track => track.stop())
@@ -99,22 +102,22 @@ function Recorder({ onTranscriptComplete, onTranscribing, onError }) {
     await startRecording(deviceId)
   }
 
-  const handleTranscribe = async (audioBlob) => {
+  const handleProcess = async (audioBlob) => {
     setIsProcessing(true)
     setIsRecording(false) // Reset recording state immediately
-    onTranscribing(true)
+    onProcessing(true)
 
     try {
-      const data = await transcribeAudio(audioBlob)
+      const data = await processAudio(audioBlob, true)
 
       if (data.warning) {
         onError(data.warning, 'info')
       }
 
-      onTranscriptComplete(data.transcript)
+      onProcessComplete(data)
     } catch (error) {
-      onError(error.message || 'Failed to transcribe audio. Please try again.')
-      onTranscribing(false)
+      onError(error.message || 'Failed to process audio. Please try again.')
+      onProcessing(false)
     } finally {
       setIsProcessing(false)
     }
@@ -316,7 +319,7 @@ function Recorder({ onTranscriptComplete, onTranscribing, onError }) {
                   <circle className="opacity-25" cx="12" cy="12" r="10" stroke="currentColor" strokeWidth="4" fill="none"></circle>
                   <path className="opacity-75" fill="currentColor" d="M4 12a8 8 0 018-8V0C5.373 0 0 5.373 0 12h4zm2 5.291A7.962 7.962 0 014 12H0c0 3.042 1.135 5.824 3 7.938l3-2.647z"></path>
                 </svg>
-                <span className="font-semibold">Transcribing with Whisper AI...</span>
+                <span className="font-semibold">Transcribing and summarizing...</span>
               </div>
             )}
 
@@ -1,4 +1,4 @@
-function TranscriptBox({ transcript, onSummarize, onReset, isSummarizing, isTranscribing }) {
+function TranscriptBox({ transcript, onReset, isProcessing }) {
   const wordCount = transcript.split(' ').filter(w => w).length
   const charCount = transcript.length
   
@@ -19,37 +19,9 @@ function TranscriptBox({ transcript, onSummarize, onReset, isSummarizing, isTran
           </div>
           
           <div className="flex space-x-3">
-            <button
-              onClick={onSummarize}
-              disabled={isSummarizing || isTranscribing}
-              className="group/btn relative px-6 py-3 bg-gradient-to-r from-purple-500 to-pink-500 text-white rounded-xl font-semibold
-                       hover:from-purple-600 hover:to-pink-600 disabled:opacity-50 disabled:cursor-not-allowed
-                       transition-all duration-300 shadow-lg hover:shadow-xl hover:scale-105 disabled:hover:scale-100"
-            >
-              <span className="relative z-10 flex items-center gap-2">
-                {isSummarizing ? (
-                  <>
-                    <svg className="animate-spin h-4 w-4" viewBox="0 0 24 24">
-                      <circle className="opacity-25" cx="12" cy="12" r="10" stroke="currentColor" strokeWidth="4" fill="none"></circle>
-                      <path className="opacity-75" fill="currentColor" d="M4 12a8 8 0 018-8V0C5.373 0 0 5.373 0 12h4zm2 5.291A7.962 7.962 0 014 12H0c0 3.042 1.135 5.824 3 7.938l3-2.647z"></path>
-                    </svg>
-                    Summarizing...
-                  </>
-                ) : (
-                  <>
-                    <svg className="w-4 h-4" fill="none" stroke="currentColor" viewBox="0 0 24 24">
-                      <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M13 10V3L4 14h7v7l9-11h-7z" />
-                    </svg>
-                    Summarize
-                  </>
-                )}
-              </span>
-              <div className="absolute inset-0 bg-gradient-to-r from-purple-600 to-pink-600 rounded-xl blur opacity-0 group-hover/btn:opacity-50 transition-opacity"></div>
-            </button>
-            
             <button
               onClick={onReset}
-              disabled={isSummarizing || isTranscribing}
+              disabled={isProcessing}
               className="px-6 py-3 bg-white/10 hover:bg-white/20 text-white rounded-xl font-semibold
                        border border-white/30 disabled:opacity-50 disabled:cursor-not-allowed
                        transition-all duration-300 hover:scale-105 disabled:hover:scale-100"